@@ -1,32 +1,245 @@
-"""Main dash app to display VCE result info."""
+"""Main dash app to display VCE result info.
 
+The app is built by `create_app`. The dataset & its indexes are loaded once per
+process, the first time they're needed, so importing this module is cheap.
+Each results year of the dataset is only read when a callback first asks for
+it (see `partitioned_dataset`).
+`app` & `server` are only created when first accessed, so
+`gunicorn --preload app:server` loads the data once in the master process &
+forks workers that share it.
+"""
+
+import argparse
+import gc
+import itertools
+import json
 import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List
 
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
-import plotly.express as px
-from dash import Dash, Input, Output, callback, dcc, html
-from dash_bootstrap_templates import load_figure_template
+from dash import (
+    ALL,
+    ClientsideFunction,
+    Dash,
+    Input,
+    Output,
+    State,
+    ctx,
+    dcc,
+    html,
+    no_update,
+)
+from flask import Response, jsonify, request
 
-load_figure_template("bootstrap")
-px.set_mapbox_access_token(os.getenv("MAPBOX_TOKEN"))
+from clientside import build_clientside_payload
+from figure_cache import figure_cache_from_env
+from figure_patch import figure_update
+from http_cache import ResponseCaching, response_compression_from_env
+from instrumentation import StartupTimer, callback_metrics_from_env
+from json_api import JsonApi, NotFoundError, QueryArgs, QueryError, paginated
+from partitioned_dataset import PartitionedDataset, partitioned_dataset_from_env
+from ranking import (
+    ALL_YEARS,
+    COMPOSITE_SCORE,
+    COMPOSITE_STATISTICS,
+    CompositeRanking,
+    RankingCube,
+)
+from schema import TREND_STATISTICS, to_plot_frame, trend_column, widen
+from school_search import SchoolSearch
+from snapshots import snapshot_store_from_env
+from spatial import (
+    NearbySchools,
+    SpatialIndex,
+    rank_nearby,
+    viewport_from_relayout,
+)
+from trends import movers
 
-analysis_df = pd.read_csv("vce_school_results_analysis_dataset.csv")
-analysis_df["School"].fillna("Not Yet Known", inplace=True)
-analysis_df["School Sector"].fillna("Not Yet Known", inplace=True)
-analysis_df["School Type"].fillna("Not Yet Known", inplace=True)
+startup_timer = StartupTimer()
+# Everything up to here happens before anything can be timed
+startup_timer.record("interpreter & imports (CPU time)", time.process_time())
 
+# Filter & draw the Top Schools and Schools Map tabs in the browser
+CLIENTSIDE_FILTERING = os.getenv("CLIENTSIDE_FILTERING", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+CLIENTSIDE_DATA_MAX_AGE = 60 * 60
 
-app = Dash(
-    __name__,
-    external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.BOOTSTRAP],
-    meta_tags=[
-        {"name": "viewport", "content": "width=device-width, initial-scale=1"},
-    ],
-    title="School Comparison",
+STATISTICS = [
+    "Median VCE study score",
+    "Percentage of study scores of 40 and over",
+    "Percentage of VCE students applying for tertiary places",
+    "Percentage of satisfactory VCE completions",
+    "ICSEA",
+    "Total Enrolments",
+    "Teaching Staff",
+]
+
+TOP_N_STATISTICS = [
+    "Median VCE study score",
+    "Percentage of study scores of 40 and over",
+    "Percentage of VCE students applying for tertiary places",
+    "Percentage of satisfactory VCE completions",
+    "ICSEA",
+    # "Total Enrolments", # Currently causes a callback issue because it's being used for grouping as well
+]
+
+MAP_CENTER = dict(lat=-37.8136, lon=144.9631)
+MAP_ZOOM = 9
+MAP_HEIGHT = 550
+# Assumed until the map reports its bounds, the width of the default container
+MAP_WIDTH = 1080
+# Schools are clustered below this zoom, or when more than this many are in view
+MAP_CLUSTER_ZOOM = 8
+MAP_MAX_POINTS = 1000
+
+SECTORS = ["Independent", "Government", "Catholic"]
+# Inputs pre-rendered by `snapshots.py`, besides every statistic, year & sector
+# combination. In snapshot mode the Top N slider snaps to its marks.
+TOP_N_PRESETS = list(range(0, 51, 5))
+MIN_ENROLMENT_PRESETS = [0, 50, 100, 200]
+MOVERS_N = 10
+# Columns the indexes spanning every year are built from
+INDEXED_COLUMNS = list(
+    dict.fromkeys(
+        [
+            "School",
+            "Locality",
+            "School Sector",
+            "School Type",
+            "Total Enrolments",
+            *TOP_N_STATISTICS,
+            *COMPOSITE_STATISTICS,
+        ]
+    )
 )
+# Starting weight of each of COMPOSITE_STATISTICS in the composite ranking
+COMPOSITE_WEIGHTS = [1, 1, 0, 0, 0]
+COMPOSITE_MAX_WEIGHT = 5
+# "k:<n>" for the n nearest schools, "km:<r>" for every school within r km
+NEARBY_QUERIES = {
+    "k:5": "5 nearest schools",
+    "k:10": "10 nearest schools",
+    "k:20": "20 nearest schools",
+    "km:2": "Within 2km",
+    "km:5": "Within 5km",
+    "km:10": "Within 10km",
+}
+
+figure_cache = figure_cache_from_env()
+callback_metrics = callback_metrics_from_env()
+response_compression = response_compression_from_env()
+snapshot_store = snapshot_store_from_env()
+
+
+@dataclass(frozen=True)
+class AppData:
+    """The analysis dataset & the indexes spanning every year
+
+    The rankings only rank over ALL_YEARS. Indexes over a single year, such as
+    its rankings, are built on first use by `dataset.index`.
+    """
+
+    dataset: PartitionedDataset
+    school_search: SchoolSearch
+    ranking_cube: RankingCube
+    composite_ranking: CompositeRanking
+
+
+def load_app_data() -> AppData:
+    """Load the analysis dataset & build its indexes
+
+    Returns:
+        AppData: Dataset & indexes
+    """
+    with startup_timer.stage("open analysis dataset"):
+        dataset = partitioned_dataset_from_env()
+    with startup_timer.stage("read every partition"):
+        # Only to build the indexes spanning every year, it's released after
+        analysis_df = dataset.frame(INDEXED_COLUMNS)
+    with startup_timer.stage("school search index"):
+        school_search = SchoolSearch(analysis_df)
+    with startup_timer.stage("ranking cube"):
+        ranking_cube = RankingCube(analysis_df, TOP_N_STATISTICS, [ALL_YEARS])
+    with startup_timer.stage("composite ranking"):
+        composite_ranking = CompositeRanking(
+            analysis_df, COMPOSITE_STATISTICS, [ALL_YEARS]
+        )
+
+    return AppData(dataset, school_search, ranking_cube, composite_ranking)
+
+
+def year_ranking_cube(year_df: pd.DataFrame) -> RankingCube:
+    """Top Schools rankings within a results year, built from its partition"""
+    return RankingCube(year_df, TOP_N_STATISTICS, year_df["year"].unique().tolist())
+
+
+def year_composite_ranking(year_df: pd.DataFrame) -> CompositeRanking:
+    """Composite ranking within a results year, built from its partition"""
+    return CompositeRanking(
+        year_df, COMPOSITE_STATISTICS, year_df["year"].unique().tolist()
+    )
+
+
+_app_data = None
+_app_data_lock = threading.Lock()
+
+
+def get_app_data() -> AppData:
+    """The app's data, loaded the first time it's asked for in this process
+
+    Returns:
+        AppData: Dataset & indexes
+    """
+    global _app_data
+    if _app_data is None:
+        with _app_data_lock:
+            if _app_data is None:
+                _app_data = load_app_data()
+                figure_cache.set_version(_app_data.dataset.version)
+                snapshot_store.set_version(_app_data.dataset.version)
+    return _app_data
+
+
+def figure_cache_stats():
+    return jsonify(
+        {
+            **figure_cache.stats(),
+            "snapshots": snapshot_store.stats(),
+            "partitions": get_app_data().dataset.stats(),
+        }
+    )
+
+
+_clientside_payload = None
+
+
+def clientside_data():
+    global _clientside_payload
+    dataset = get_app_data().dataset
+    if _clientside_payload is None:
+        _clientside_payload = json.dumps(
+            build_clientside_payload(
+                dataset.frame(), STATISTICS, os.getenv("MAPBOX_TOKEN")
+            ),
+            separators=(",", ":"),
+        )
+
+    # Only changes when the dataset does, so browsers can keep it
+    response = Response(_clientside_payload, mimetype="application/json")
+    response.set_etag(dataset.version)
+    response.cache_control.public = True
+    response.cache_control.max_age = CLIENTSIDE_DATA_MAX_AGE
+    return response.make_conditional(request)
 
-server = app.server
 
 navbar = dbc.Navbar(
     dbc.Container(
@@ -60,207 +273,324 @@ navbar = dbc.Navbar(
     style={"margin-bottom": 20},
 )
 
-historical_school_performance_tab = html.Div(
-    [
-        html.Div(style={"margin-bottom": 20}),
-        dcc.Dropdown(
-            [
-                "Median VCE study score",
-                "Percentage of study scores of 40 and over",
-                "Percentage of VCE students applying for tertiary places",
-                "Percentage of satisfactory VCE completions",
-                "ICSEA",
-                "Total Enrolments",
-                "Teaching Staff",
-            ],
-            value="Median VCE study score",
-            id="historical-performance-statistic-selection",
-        ),
-        dcc.Dropdown(
-            analysis_df["School"].unique(),
-            placeholder="Select a school",
-            multi=True,
-            id="school-selection",
-        ),
-        dcc.Graph(id="school-performance-over-time"),
-    ]
-)
 
-top_schools_tab = html.Div(
-    [
-        dbc.Row(
-            [
-                dbc.Col(
-                    dcc.Dropdown(
-                        [
-                            "Median VCE study score",
-                            "Percentage of study scores of 40 and over",
-                            "Percentage of VCE students applying for tertiary places",
-                            "Percentage of satisfactory VCE completions",
-                            "ICSEA",
-                            # "Total Enrolments", # Currently causes a callback issue because it's being used for grouping as well
-                        ],
-                        value="Median VCE study score",
-                        id="top-n-statistic-selection",
+def historical_school_performance_tab() -> html.Div:
+    return html.Div(
+        [
+            html.Div(style={"margin-bottom": 20}),
+            dcc.Dropdown(
+                STATISTICS,
+                value="Median VCE study score",
+                id="historical-performance-statistic-selection",
+            ),
+            dcc.Dropdown(
+                # Filled in by `update_school_options` as the user types
+                [],
+                placeholder="Type to search for a school",
+                multi=True,
+                id="school-selection",
+            ),
+            dcc.Graph(id="school-performance-over-time"),
+        ]
+    )
+
+
+def top_schools_tab(years: List[int]) -> html.Div:
+    return html.Div(
+        [
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dcc.Dropdown(
+                            TOP_N_STATISTICS + [COMPOSITE_SCORE],
+                            value="Median VCE study score",
+                            id="top-n-statistic-selection",
+                        ),
+                        width=5,
                     ),
-                    width=5,
-                ),
-                dbc.Col(width=5),
-            ],
-            justify="around",
-            style={"margin-top": 20},
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    html.Div(
-                        [
-                            html.Label("School Type:"),
-                            dcc.Dropdown(
-                                ["Independent", "Government", "Catholic"],
-                                multi=True,
-                                value=["Independent", "Government", "Catholic"],
-                                id="school-type",
+                    dbc.Col(width=5),
+                ],
+                justify="around",
+                style={"margin-top": 20},
+            ),
+            # Only shown while ranking by COMPOSITE_SCORE
+            dbc.Collapse(
+                dbc.Row(
+                    [
+                        dbc.Col(
+                            html.Div(
+                                [
+                                    html.Label(f"{statistic} weight:"),
+                                    dcc.Slider(
+                                        min=0,
+                                        max=COMPOSITE_MAX_WEIGHT,
+                                        step=1,
+                                        value=weight,
+                                        id={
+                                            "type": "composite-weight",
+                                            "statistic": statistic,
+                                        },
+                                    ),
+                                ]
                             ),
-                        ],
-                        style={"margin-bottom": 20},
-                    ),
-                    width=5,
+                            width=2,
+                        )
+                        for statistic, weight in zip(
+                            COMPOSITE_STATISTICS, COMPOSITE_WEIGHTS
+                        )
+                    ],
+                    justify="around",
+                    style={"margin-top": 20},
                 ),
-                dbc.Col(
-                    html.Div(
-                        [
-                            html.Label("Results Year:"),
-                            dcc.Dropdown(
-                                ["All"]
-                                + sorted(
-                                    analysis_df["year"].unique().tolist(), reverse=True
+                id="composite-weights",
+                is_open=False,
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label("School Type:"),
+                                dcc.Dropdown(
+                                    ["Independent", "Government", "Catholic"],
+                                    multi=True,
+                                    value=["Independent", "Government", "Catholic"],
+                                    id="school-type",
                                 ),
-                                value="All",
-                                id="result-year",
-                            ),
-                        ],
-                        style={"margin-bottom": 20},
+                            ],
+                            style={"margin-bottom": 20},
+                        ),
+                        width=5,
                     ),
-                    width=5,
-                ),
-            ],
-            justify="around",
-            style={"margin-top": 20},
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    html.Div(
-                        [
-                            html.Label("Top N Schools:"),
-                            dcc.Slider(
-                                min=0,
-                                max=50,
-                                value=10,
-                                step=1,
-                                marks={i: str(i) for i in range(0, 51, 5)},
-                                id="top-n-selection",
-                            ),
-                        ],
-                        style={"margin-bottom": 20},
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label("Results Year:"),
+                                dcc.Dropdown(
+                                    [ALL_YEARS] + sorted(years, reverse=True),
+                                    value=ALL_YEARS,
+                                    id="result-year",
+                                ),
+                            ],
+                            style={"margin-bottom": 20},
+                        ),
+                        width=5,
                     ),
-                    width=5,
-                ),
-                dbc.Col(
-                    html.Div(
-                        [
-                            html.Label(
-                                "Minimum School Enrollment:",
-                                style={"margin-right": 8},
-                            ),
-                            dcc.Input(
-                                placeholder="Minimum school entrollment...",
-                                type="number",
-                                value=50,
-                                id="minimum-enrolments",
-                            ),
-                        ],
-                        style={"margin-bottom": 20},
+                ],
+                justify="around",
+                style={"margin-top": 20},
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label("Top N Schools:"),
+                                dcc.Slider(
+                                    min=0,
+                                    max=50,
+                                    value=10,
+                                    step=None if snapshot_store.enabled else 1,
+                                    marks={i: str(i) for i in range(0, 51, 5)},
+                                    id="top-n-selection",
+                                ),
+                            ],
+                            style={"margin-bottom": 20},
+                        ),
+                        width=5,
                     ),
-                    width=5,
-                ),
-            ],
-            justify="around",
-        ),
-        dcc.Graph(
-            id="top-n-schools",
-        ),
-    ]
-)
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label(
+                                    "Minimum School Enrollment:",
+                                    style={"margin-right": 8},
+                                ),
+                                dcc.Input(
+                                    placeholder="Minimum school entrollment...",
+                                    type="number",
+                                    value=50,
+                                    id="minimum-enrolments",
+                                ),
+                            ],
+                            style={"margin-bottom": 20},
+                        ),
+                        width=5,
+                    ),
+                ],
+                justify="around",
+            ),
+            dcc.Graph(
+                id="top-n-schools",
+            ),
+        ]
+    )
 
-schools_map_tab = html.Div(
-    [
-        dbc.Row(
-            [
-                dbc.Col(
-                    dcc.Dropdown(
-                        [
-                            "Median VCE study score",
-                            "Percentage of study scores of 40 and over",
-                            "Percentage of VCE students applying for tertiary places",
-                            "Percentage of satisfactory VCE completions",
-                            "ICSEA",
-                            "Total Enrolments",
-                            "Teaching Staff",
-                        ],
-                        value="Median VCE study score",
-                        id="schools-map-statistic-selection",
+
+def schools_map_tab(years: List[int]) -> html.Div:
+    return html.Div(
+        [
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dcc.Dropdown(
+                            STATISTICS,
+                            value="Median VCE study score",
+                            id="schools-map-statistic-selection",
+                        ),
+                        width=5,
                     ),
-                    width=5,
-                ),
-                dbc.Col(width=5),
-            ],
-            justify="around",
-            style={"margin-top": 20},
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    html.Div(
-                        [
-                            html.Label("School Type:"),
-                            dcc.Dropdown(
-                                ["Independent", "Government", "Catholic"],
-                                multi=True,
-                                value=["Independent", "Government", "Catholic"],
-                                id="school-map-school-type",
-                            ),
-                        ],
-                        style={"margin-bottom": 0},
+                    dbc.Col(width=5),
+                ],
+                justify="around",
+                style={"margin-top": 20},
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label("School Type:"),
+                                dcc.Dropdown(
+                                    ["Independent", "Government", "Catholic"],
+                                    multi=True,
+                                    value=["Independent", "Government", "Catholic"],
+                                    id="school-map-school-type",
+                                ),
+                            ],
+                            style={"margin-bottom": 0},
+                        ),
+                        width=5,
                     ),
-                    width=5,
-                ),
-                dbc.Col(
-                    html.Div(
-                        [
-                            html.Label("Results Year:"),
-                            dcc.Dropdown(
-                                sorted(
-                                    analysis_df["year"].unique().tolist(), reverse=True
-                                )[1:],
-                                value=2022,
-                                id="result-year-no-2023",
-                            ),
-                        ],
-                        style={"margin-bottom": 0},
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label("Results Year:"),
+                                dcc.Dropdown(
+                                    sorted(years, reverse=True)[1:],
+                                    value=2022,
+                                    id="result-year-no-2023",
+                                ),
+                            ],
+                            style={"margin-bottom": 0},
+                        ),
+                        width=5,
                     ),
-                    width=5,
-                ),
-            ],
-            justify="around",
-            style={"margin-top": 20},
-        ),
-        dcc.Graph(
-            id="schools-map",
-        ),
-    ]
-)
+                ],
+                justify="around",
+                style={"margin-top": 20},
+            ),
+            dcc.Graph(
+                id="schools-map",
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label("Click the map to compare nearby schools:"),
+                                dcc.Dropdown(
+                                    NEARBY_QUERIES,
+                                    value="k:10",
+                                    clearable=False,
+                                    id="nearby-selection",
+                                ),
+                            ],
+                            style={"margin-bottom": 20},
+                        ),
+                        width=5,
+                    ),
+                    dbc.Col(width=5),
+                ],
+                justify="around",
+                style={"margin-top": 20},
+            ),
+            dcc.Graph(id="schools-nearby"),
+        ]
+    )
+
+
+def movers_tab(years: List[int]) -> html.Div:
+    years = sorted(years, reverse=True)
+    return html.Div(
+        [
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dcc.Dropdown(
+                            TREND_STATISTICS,
+                            value="Median VCE study score",
+                            id="movers-statistic-selection",
+                        ),
+                        width=5,
+                    ),
+                    dbc.Col(width=5),
+                ],
+                justify="around",
+                style={"margin-top": 20},
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label("School Type:"),
+                                dcc.Dropdown(
+                                    SECTORS,
+                                    multi=True,
+                                    value=SECTORS,
+                                    id="movers-school-type",
+                                ),
+                            ],
+                            style={"margin-bottom": 20},
+                        ),
+                        width=5,
+                    ),
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label("Results Year:"),
+                                # There's nothing to compare the first year with
+                                dcc.Dropdown(
+                                    years[:-1],
+                                    value=years[0],
+                                    id="movers-result-year",
+                                ),
+                            ],
+                            style={"margin-bottom": 20},
+                        ),
+                        width=5,
+                    ),
+                ],
+                justify="around",
+                style={"margin-top": 20},
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.Label("Risers & Fallers:"),
+                                dcc.Slider(
+                                    min=5,
+                                    max=25,
+                                    value=MOVERS_N,
+                                    step=5,
+                                    id="movers-n-selection",
+                                ),
+                            ],
+                            style={"margin-bottom": 20},
+                        ),
+                        width=5,
+                    ),
+                    dbc.Col(width=5),
+                ],
+                justify="around",
+            ),
+            dcc.Graph(id="movers"),
+        ]
+    )
+
 
 about_tab = html.Div(
     [
@@ -279,209 +609,826 @@ about_tab = html.Div(
 )
 
 
-app.layout = dbc.Container(
-    [
-        navbar,
-        dbc.Tabs(
-            [
-                dbc.Tab(
-                    historical_school_performance_tab,
-                    label="Historical School Performance",
-                    tab_id="historical-school-performance",
-                ),
-                dbc.Tab(top_schools_tab, label="Top Schools", tab_id="top-schools"),
-                dbc.Tab(schools_map_tab, label="Schools Map", tab_id="tab-schools-map"),
-                dbc.Tab(about_tab, label="About", tab_id="about"),
-            ],
-            id="tabs",
-            active_tab="historical-school-performance",
-        ),
-        html.Div(id="tab-content", className="p-4"),
-    ]
-)
+def build_layout(years: List[int]) -> dbc.Container:
+    return dbc.Container(
+        [
+            navbar,
+            dbc.Tabs(
+                [
+                    dbc.Tab(
+                        historical_school_performance_tab(),
+                        label="Historical School Performance",
+                        tab_id="historical-school-performance",
+                    ),
+                    dbc.Tab(
+                        top_schools_tab(years),
+                        label="Top Schools",
+                        tab_id="top-schools",
+                    ),
+                    dbc.Tab(
+                        schools_map_tab(years),
+                        label="Schools Map",
+                        tab_id="tab-schools-map",
+                    ),
+                    dbc.Tab(
+                        movers_tab(years),
+                        label="Movers",
+                        tab_id="movers",
+                    ),
+                    dbc.Tab(about_tab, label="About", tab_id="about"),
+                ],
+                id="tabs",
+                active_tab="historical-school-performance",
+            ),
+            html.Div(id="tab-content", className="p-4"),
+            dcc.Store(id="clientside-data"),
+        ]
+    )
 
 
-@callback(
-    Output("school-performance-over-time", "figure"),
-    Input("historical-performance-statistic-selection", "value"),
-    Input("school-selection", "value"),
-)
-def update_school_performance_over_time(statistic_to_plot, schools):
-    if schools is None:
-        schools = []
+@callback_metrics.phase("callback")
+def update_school_options(search_value, school_ids):
+    if not search_value:
+        return no_update
 
-    statistic_over_time_fig = px.line(
-        analysis_df[analysis_df["School"].isin(schools)].sort_values(
-            by="year", ascending=True
-        ),
-        x="year",
-        y=statistic_to_plot,
-        hover_data=[
-            "Locality",
-            "Median VCE study score",
-            "Percentage of study scores of 40 and over",
-            "Percentage of VCE students applying for tertiary places",
-            "Percentage of satisfactory VCE completions",
-            "ICSEA",
-            "School Sector",
-            "School Type",
-            "Total Enrolments",
-            "Teaching Staff",
-        ],
-        markers=True,
-        color="School",
-        title=statistic_to_plot,
-    )
+    school_search = get_app_data().school_search
+    school_ids = school_ids or []
+    matches = [
+        school_id
+        for school_id in school_search.search(search_value)
+        if school_id not in school_ids
+    ]
+    # Selected schools have to stay in the options or the dropdown drops them
+    return school_search.options(school_ids + matches, search_value)
 
-    statistic_over_time_fig.update_layout(
-        xaxis=dict(
-            range=[analysis_df["year"].min(), analysis_df["year"].max()], dtick=1
-        ),
-    )
 
-    statistic_over_time_fig.update_layout(
-        legend=dict(yanchor="top", xanchor="left", y=1.1, orientation="h")
+@callback_metrics.phase("callback")
+def update_school_performance_over_time(statistic_to_plot, school_ids):
+    return figure_update(
+        school_performance_figure(statistic_to_plot, school_ids),
+        ["title", "yaxis", "legend"],
     )
 
+
+@figure_cache.memoise("school-performance-over-time", unordered=[1])
+def school_performance_figure(statistic_to_plot, school_ids):
+    import plotly.express as px
+
+    data = get_app_data()
+    if school_ids is None:
+        school_ids = []
+
+    with callback_metrics.phase("filter"):
+        plot_df = to_plot_frame(data.dataset.rows(school_ids))
+
+    with callback_metrics.phase("build"):
+        statistic_over_time_fig = px.line(
+            plot_df,
+            x="year",
+            y=statistic_to_plot,
+            hover_data=[
+                "Locality",
+                "Median VCE study score",
+                "Percentage of study scores of 40 and over",
+                "Percentage of VCE students applying for tertiary places",
+                "Percentage of satisfactory VCE completions",
+                "ICSEA",
+                "School Sector",
+                "School Type",
+                "Total Enrolments",
+                "Teaching Staff",
+            ],
+            markers=True,
+            color="School",
+            title=statistic_to_plot,
+        )
+
+        statistic_over_time_fig.update_layout(
+            xaxis=dict(
+                range=[min(data.dataset.years), max(data.dataset.years)],
+                dtick=1,
+            ),
+        )
+
+        statistic_over_time_fig.update_layout(
+            legend=dict(yanchor="top", xanchor="left", y=1.1, orientation="h")
+        )
+
     return statistic_over_time_fig
 
 
-@callback(
-    Output("top-n-schools", "figure"),
-    Input("top-n-statistic-selection", "value"),
-    Input("school-type", "value"),
-    Input("result-year", "value"),
-    Input("top-n-selection", "value"),
-    Input("minimum-enrolments", "value"),
-)
+@callback_metrics.phase("callback")
 def update_top_n_schools(
-    top_n_statistic, school_type, result_year, top_n, min_enrolments
+    top_n_statistic, school_type, result_year, top_n, min_enrolments, weights
 ):
+    # The weights only matter to the composite ranking, so don't let them
+    # split the cache for the others
+    if top_n_statistic != COMPOSITE_SCORE:
+        weights = None
+    return figure_update(
+        top_n_schools_figure(
+            top_n_statistic, school_type, result_year, top_n, min_enrolments, weights
+        ),
+        ["title", "xaxis", "yaxis", "legend", "height"],
+    )
+
+
+def rank_top_n_schools(
+    top_n_statistic, school_type, result_year, top_n, min_enrolments, weights=None
+) -> pd.DataFrame:
+    """The Top Schools tab's ranking, best first
+
+    Args:
+        top_n_statistic (str): One of TOP_N_STATISTICS or COMPOSITE_SCORE
+        school_type (Optional[List[str]]): Sectors to include. Schools whose
+            sector isn't known yet are included unless this is None.
+        result_year (Union[int, str]): Results year or ALL_YEARS
+        top_n (int): Number of schools to return
+        min_enrolments (float): Minimum average enrolments
+        weights (Optional[List[float]], optional): Weights of
+            COMPOSITE_STATISTICS for COMPOSITE_SCORE. Defaults to None, for
+            COMPOSITE_WEIGHTS.
+
+    Returns:
+        pd.DataFrame: Top schools
+    """
+    data = get_app_data()
     if school_type is None:
         school_type = []
     else:
-        school_type.append("Not Yet Known")
+        school_type = school_type + ["Not Yet Known"]
+
+    if top_n_statistic == COMPOSITE_SCORE:
+        weights = [weight or 0 for weight in weights or COMPOSITE_WEIGHTS]
+        composite_ranking = (
+            data.composite_ranking
+            if result_year == ALL_YEARS
+            else data.dataset.index(result_year, year_composite_ranking)
+        )
+        return composite_ranking.top_n(
+            weights, result_year, school_type, top_n, min_enrolments
+        )
 
-    if result_year == "All":
-        result_year = analysis_df["year"].unique().tolist()
+    ranking_cube = (
+        data.ranking_cube
+        if result_year == ALL_YEARS
+        else data.dataset.index(result_year, year_ranking_cube)
+    )
+    return ranking_cube.top_n(
+        top_n_statistic, result_year, school_type, top_n, min_enrolments
+    )
+
+
+@snapshot_store.serve("top-n-schools", unordered=[1])
+@figure_cache.memoise("top-n-schools", unordered=[1])
+def top_n_schools_figure(
+    top_n_statistic, school_type, result_year, top_n, min_enrolments, weights=None
+):
+    import plotly.express as px
+
+    with callback_metrics.phase("filter"):
+        ranked = rank_top_n_schools(
+            top_n_statistic, school_type, result_year, top_n, min_enrolments, weights
+        )
+        top_n_schools = to_plot_frame(
+            ranked.sort_values(ascending=True, by=top_n_statistic)
+        )
+
+    with callback_metrics.phase("build"):
+        spacer = 0.5
+        x_min = top_n_schools[top_n_statistic].min() - spacer
+        x_max = top_n_schools[top_n_statistic].max() + spacer
+
+        color_discrete_map = {
+            "Independent": "#636EFA",
+            "Government": "#00CC96",
+            "Catholic": "#EF553B",
+        }
+
+        top_ranked_schools_fig = px.bar(
+            top_n_schools,
+            y="School",
+            x=top_n_statistic,
+            color="School Sector",
+            orientation="h",
+            hover_data=[
+                "School Sector",
+                "School Type",
+            ],
+            color_discrete_map=color_discrete_map,
+            title=f"Top {top_n} Schools",
+        )
+
+        calculated_height = max(450, 35 * top_n)
+        top_ranked_schools_fig.update_layout(
+            xaxis=dict(range=[x_min, x_max], dtick=0.5),
+            yaxis=dict(
+                categoryorder="array",
+                categoryarray=top_n_schools["School"],
+                tickvals=list(range(len(top_n_schools))),
+                ticktext=top_n_schools["School"].tolist(),
+            ),
+            height=calculated_height,
+        )
+
+        top_ranked_schools_fig.update_layout(
+            legend=dict(yanchor="top", xanchor="left", y=1.1, orientation="h")
+        )
+
+    return top_ranked_schools_fig
+
+
+@callback_metrics.phase("callback")
+def update_schools_map(
+    statistic_selection, school_type, results_year, relayout_data=None
+):
+    viewport = viewport_from_relayout(
+        relayout_data, MAP_CENTER, MAP_ZOOM, MAP_WIDTH, MAP_HEIGHT
+    )
+    return figure_update(
+        schools_map_figure(statistic_selection, school_type, results_year, viewport),
+        ["coloraxis", "legend"],
+    )
+
+
+def mapped_schools(year_df: pd.DataFrame, statistic_selection, school_type):
+    """Which of a year's schools the Schools Map shows
+
+    Args:
+        year_df (pd.DataFrame): A results year's partition
+        statistic_selection (Optional[str]): Statistic the map is coloured by.
+            Schools without a value aren't shown. None to keep them.
+        school_type (List[str]): Sectors to show
+
+    Returns:
+        np.ndarray: Boolean mask over `year_df`'s rows
+    """
+    keep = year_df["School Sector"].isin(school_type)
+    if statistic_selection is not None:
+        keep &= year_df[statistic_selection].notna()
+    return keep.to_numpy(dtype=bool, na_value=False)
+
+
+@snapshot_store.serve("schools-map", unordered=[1])
+@figure_cache.memoise("schools-map", unordered=[1])
+def schools_map_figure(statistic_selection, school_type, results_year, viewport):
+    import plotly.express as px
+
+    dataset = get_app_data().dataset
+    if school_type is None:
+        school_type = []
+
+    with callback_metrics.phase("filter"):
+        year_df = dataset.partition(results_year)
+        school_locations = dataset.index(results_year, SpatialIndex)
+        keep = mapped_schools(year_df, statistic_selection, school_type)
+        matches = school_locations.query(viewport, keep)
+
+        clustered = viewport.zoom < MAP_CLUSTER_ZOOM or len(matches) > MAP_MAX_POINTS
+        if clustered:
+            statistic_values = widen(year_df[statistic_selection]).to_numpy(
+                dtype="float64", na_value=np.nan
+            )
+            plot_df = school_locations.clusters(
+                matches, statistic_values, viewport.level, statistic_selection
+            )
+        else:
+            plot_df = to_plot_frame(year_df.iloc[school_locations.rows(matches)])
+
+    with callback_metrics.phase("build"):
+        map_options = dict(
+            lat="Latitude",
+            lon="Longitude",
+            color=statistic_selection,
+            opacity=1.0,
+            zoom=MAP_ZOOM,
+            height=MAP_HEIGHT,
+            center=MAP_CENTER,
+            color_continuous_scale="Jet",
+        )
+
+        if clustered:
+            schools_map_fig = px.scatter_mapbox(
+                plot_df,
+                size="Schools",
+                size_max=20,
+                hover_data={
+                    "Schools": True,
+                    statistic_selection: ":.1f",
+                    "Latitude": False,
+                    "Longitude": False,
+                },
+                **map_options,
+            )
+        else:
+            schools_map_fig = px.scatter_mapbox(
+                plot_df,
+                size=statistic_selection,
+                size_max=7,
+                hover_data={
+                    "School": True,
+                    "School Sector": True,
+                    "Latitude": False,
+                    "Longitude": False,
+                },
+                **map_options,
+            )
+
+        schools_map_fig.update_layout(
+            margin=dict(l=30, r=30, t=60, b=30),
+            coloraxis_colorbar=dict(
+                orientation="h",
+                xanchor="left",
+                x=0,
+                y=-0.2,
+            ),
+            # Keep the user's pan & zoom when the figure is redrawn
+            uirevision="schools-map",
+        )
+
+    return schools_map_fig
+
+
+@callback_metrics.phase("callback")
+def update_movers(statistic, school_type, result_year, n):
+    # Cleared dropdowns, eg before the year's options are filled in
+    if statistic is None or result_year is None or n is None:
+        return no_update
+    return figure_update(
+        movers_figure(statistic, school_type, result_year, n),
+        ["title", "xaxis", "yaxis", "legend", "height"],
+    )
+
+
+@figure_cache.memoise("movers", unordered=[1])
+def movers_figure(statistic, school_type, result_year, n):
+    import plotly.express as px
+
+    dataset = get_app_data().dataset
+    if school_type is None:
+        school_type = []
     else:
-        result_year = [result_year]
+        school_type = school_type + ["Not Yet Known"]
+    change_col = trend_column(statistic, "change")
+    rank_col = trend_column(statistic, "rank")
+    percentile_col = trend_column(statistic, "percentile")
 
-    average_median_study_score = (
-        analysis_df[analysis_df["year"].isin(result_year)]
-        .groupby(["School", "School Sector", "School Type"])[
-            [top_n_statistic, "Total Enrolments"]
-        ]
-        .mean()
-        .reset_index()
-        .sort_values(ascending=False, by=top_n_statistic)
-        .reset_index(drop=True)
+    with callback_metrics.phase("filter"):
+        # Biggest fall at the bottom, biggest rise at the top
+        movers_df = to_plot_frame(
+            movers(
+                dataset.partition(result_year), statistic, result_year, school_type, n
+            ).iloc[::-1][
+                [
+                    "School",
+                    "School Sector",
+                    statistic,
+                    change_col,
+                    rank_col,
+                    percentile_col,
+                ]
+            ]
+        )
+
+    with callback_metrics.phase("build"):
+        movers_fig = px.bar(
+            movers_df,
+            y="School",
+            x=change_col,
+            color="School Sector",
+            orientation="h",
+            hover_data=[statistic, rank_col, percentile_col],
+            color_discrete_map={
+                "Independent": "#636EFA",
+                "Government": "#00CC96",
+                "Catholic": "#EF553B",
+            },
+            title=f"Biggest Risers & Fallers in {result_year}",
+        )
+
+        movers_fig.update_layout(
+            xaxis=dict(title=f"Change in {statistic} since {result_year - 1}"),
+            yaxis=dict(
+                categoryorder="array",
+                categoryarray=movers_df["School"],
+                tickvals=list(range(len(movers_df))),
+                ticktext=movers_df["School"].tolist(),
+            ),
+            height=max(450, 30 * len(movers_df)),
+            legend=dict(yanchor="top", xanchor="left", y=1.1, orientation="h"),
+        )
+
+    return movers_fig
+
+
+@callback_metrics.phase("callback")
+def update_schools_nearby(
+    click_data, nearby_query, statistic_selection, school_type, results_year
+):
+    point = (click_data or {}).get("points", [{}])[0]
+    if "lat" not in point or "lon" not in point:
+        return no_update
+
+    figure = schools_nearby_figure(
+        statistic_selection,
+        school_type,
+        results_year,
+        round(point["lat"], 6),
+        round(point["lon"], 6),
+        nearby_query,
     )
+    # The graph is empty until the first click, so there's nothing to patch
+    if ctx.triggered_id == "schools-map":
+        return figure
+    return figure_update(figure, ["title", "xaxis", "yaxis", "legend", "height"])
 
-    if average_median_study_score["Total Enrolments"].sum() != 0:
-        average_median_study_score = average_median_study_score[
-            average_median_study_score["Total Enrolments"] >= min_enrolments
-        ]
 
-    top_n_schools = (
-        average_median_study_score[
-            average_median_study_score["School Sector"].isin(school_type)
-        ]
-        .head(top_n)
-        .sort_values(ascending=True, by=top_n_statistic)
+@figure_cache.memoise("schools-nearby", unordered=[1])
+def schools_nearby_figure(
+    statistic_selection, school_type, results_year, lat, lon, nearby_query
+):
+    import plotly.express as px
+
+    dataset = get_app_data().dataset
+    if school_type is None:
+        school_type = []
+
+    with callback_metrics.phase("filter"):
+        year_df = dataset.partition(results_year)
+        nearby_schools = dataset.index(results_year, NearbySchools)
+        keep = (
+            (year_df["School Sector"].isin(school_type))
+            & (year_df[statistic_selection].notna())
+        ).to_numpy(dtype=bool, na_value=False)
+
+        kind, _, amount = nearby_query.partition(":")
+        if kind == "km":
+            positions, distances = nearby_schools.within(
+                lat, lon, results_year, float(amount), keep
+            )
+        else:
+            positions, distances = nearby_schools.nearest(
+                lat, lon, results_year, int(amount), keep
+            )
+        # Best at the top
+        nearby_df = to_plot_frame(
+            rank_nearby(year_df, positions, distances, statistic_selection)[
+                ["School", "School Sector", statistic_selection, "Distance (km)"]
+            ].iloc[::-1]
+        )
+
+    with callback_metrics.phase("build"):
+        nearby_fig = px.bar(
+            nearby_df,
+            y="School",
+            x=statistic_selection,
+            color="School Sector",
+            orientation="h",
+            hover_data=["Distance (km)"],
+            color_discrete_map={
+                "Independent": "#636EFA",
+                "Government": "#00CC96",
+                "Catholic": "#EF553B",
+            },
+            title=f"{NEARBY_QUERIES[nearby_query]} ({results_year})",
+        )
+
+        nearby_fig.update_layout(
+            yaxis=dict(
+                categoryorder="array",
+                categoryarray=nearby_df["School"],
+                tickvals=list(range(len(nearby_df))),
+                ticktext=nearby_df["School"].tolist(),
+            ),
+            height=max(450, 30 * len(nearby_df)),
+            legend=dict(yanchor="top", xanchor="left", y=1.1, orientation="h"),
+        )
+
+    return nearby_fig
+
+
+def api_school_history(query: QueryArgs, school_id: int) -> Dict[str, Any]:
+    """A school's results in every year, as the Historical School Performance
+    tab plots them
+
+    Query parameters: `fields`, `offset` & `limit`.
+    """
+    data = get_app_data()
+    if school_id not in data.school_search:
+        raise NotFoundError(f"No school with School ID {school_id}")
+
+    dataset = data.dataset
+    fields = query.choices(
+        "fields", dataset.columns, ["School ID", "School", "year", *STATISTICS]
     )
+    page = query.page()
 
-    spacer = 0.5
-    x_min = top_n_schools[top_n_statistic].min() - spacer
-    x_max = top_n_schools[top_n_statistic].max() + spacer
-
-    color_discrete_map = {
-        "Independent": "#636EFA",
-        "Government": "#00CC96",
-        "Catholic": "#EF553B",
-    }
-
-    top_ranked_schools_fig = px.bar(
-        top_n_schools,
-        y="School",
-        x=top_n_statistic,
-        color="School Sector",
-        orientation="h",
-        hover_data=[
-            "School Sector",
-            "School Type",
-        ],
-        color_discrete_map=color_discrete_map,
-        title=f"Top {top_n} Schools",
+    # Only the requested columns of the school's rows are read
+    history = dataset.rows([school_id], fields)
+    rows = history.iloc[page["offset"] : page["offset"] + page["limit"]]
+    return paginated(
+        rows, fields, **page, more=len(history) > page["offset"] + page["limit"]
     )
 
-    calculated_height = max(450, 35 * top_n)
-    top_ranked_schools_fig.update_layout(
-        xaxis=dict(range=[x_min, x_max], dtick=0.5),
-        yaxis=dict(
-            categoryorder="array",
-            categoryarray=top_n_schools["School"],
-            tickvals=list(range(len(top_n_schools))),
-            ticktext=top_n_schools["School"].tolist(),
-        ),
-        height=calculated_height,
+
+def api_top_schools(query: QueryArgs) -> Dict[str, Any]:
+    """Schools ranked by a statistic, as the Top Schools tab ranks them
+
+    Query parameters: `statistic` (one of TOP_N_STATISTICS or COMPOSITE_SCORE),
+    `year` (a results year or ALL_YEARS), `sector`, `min_enrolments`, `weights`
+    (of COMPOSITE_STATISTICS, for COMPOSITE_SCORE), `fields`, `offset` &
+    `limit`.
+    """
+    dataset = get_app_data().dataset
+    statistic = query.choice(
+        "statistic", TOP_N_STATISTICS + [COMPOSITE_SCORE], TOP_N_STATISTICS[0]
     )
+    result_year = query.choice("year", [ALL_YEARS] + dataset.years, ALL_YEARS)
+    sectors = query.choices("sector", SECTORS)
+    min_enrolments = query.integer("min_enrolments", 0, minimum=0)
+    weights = query.floats("weights", len(COMPOSITE_STATISTICS))
+    page = query.page()
 
-    top_ranked_schools_fig.update_layout(
-        legend=dict(yanchor="top", xanchor="left", y=1.1, orientation="h")
+    # Ranked one past the page, to tell if there's another
+    end = page["offset"] + page["limit"]
+    ranked = rank_top_n_schools(
+        statistic, sectors, result_year, end + 1, min_enrolments, weights
+    )
+    ranked = ranked.assign(Rank=np.arange(1, len(ranked) + 1))
+    fields = query.choices(
+        "fields",
+        list(ranked.columns),
+        ["Rank", "School ID", "School", "School Sector", statistic],
+    )
+    return paginated(
+        ranked.iloc[page["offset"] : end], fields, **page, more=len(ranked) > end
+    )
+
+
+def api_schools(query: QueryArgs) -> Dict[str, Any]:
+    """A results year's schools, optionally within a bounding box, as the
+    Schools Map filters them
+
+    Query parameters: `year` (defaults to the latest with school locations,
+    like the map), `bbox` (west,south,east,north in degrees), `statistic`
+    (only schools with a value), `sector`, `fields`, `offset` & `limit`.
+    """
+    dataset = get_app_data().dataset
+    # The latest results come out before the schools' profiles & locations
+    located_years = [
+        year
+        for year in dataset.years
+        if dataset.column_stats(year).get("Latitude", {}).get("min") is not None
+    ]
+    year = query.choice("year", dataset.years, (located_years or dataset.years)[-1])
+    bbox = query.floats("bbox", 4)
+    if bbox is not None and (bbox[0] > bbox[2] or bbox[1] > bbox[3]):
+        raise QueryError("bbox must be west,south,east,north")
+    statistic = query.choice("statistic", STATISTICS, None)
+    sectors = query.choices("sector", SECTORS)
+    fields = query.choices(
+        "fields",
+        dataset.columns,
+        ["School ID", "School", "School Sector", "Latitude", "Longitude"]
+        + ([statistic] if statistic else []),
+    )
+    page = query.page()
+    end = page["offset"] + page["limit"]
+
+    if bbox is not None:
+        # Skip reading the year at all if the box misses all of its schools
+        west, south, east, north = bbox
+        stats = dataset.column_stats(year)
+        lat, lon = stats.get("Latitude", {}), stats.get("Longitude", {})
+        if (
+            lat.get("min") is None
+            or lon.get("min") is None
+            or north < lat["min"]
+            or south > lat["max"]
+            or east < lon["min"]
+            or west > lon["max"]
+        ):
+            return paginated(pd.DataFrame(columns=fields), fields, **page, more=False)
+
+    year_df = dataset.partition(year)
+    keep = mapped_schools(year_df, statistic, sectors)
+    if bbox is None:
+        positions = np.flatnonzero(keep)
+    else:
+        school_locations = dataset.index(year, SpatialIndex)
+        positions = school_locations.rows(
+            school_locations.within_bounds(west, south, east, north, keep)
+        )
+
+    return paginated(
+        year_df.iloc[positions[page["offset"] : end]],
+        fields,
+        **page,
+        more=len(positions) > end,
     )
 
-    return top_ranked_schools_fig
 
+# Served under json_api.API_PREFIX
+API_VIEWS = {
+    "/schools": api_schools,
+    "/schools/<int:school_id>/history": api_school_history,
+    "/top-schools": api_top_schools,
+}
 
-@callback(
+
+top_n_schools_callback = [
+    Output("top-n-schools", "figure"),
+    Input("top-n-statistic-selection", "value"),
+    Input("school-type", "value"),
+    Input("result-year", "value"),
+    Input("top-n-selection", "value"),
+    Input("minimum-enrolments", "value"),
+    Input({"type": "composite-weight", "statistic": ALL}, "value"),
+]
+schools_map_callback = [
     Output("schools-map", "figure"),
     Input("schools-map-statistic-selection", "value"),
     Input("school-map-school-type", "value"),
     Input("result-year-no-2023", "value"),
-)
-def update_schools_map(statistic_selection, school_type, results_year):
-    if school_type is None:
-        school_type = []
+]
+schools_nearby_callback = [
+    Output("schools-nearby", "figure"),
+    Input("schools-map", "clickData"),
+    Input("nearby-selection", "value"),
+    Input("schools-map-statistic-selection", "value"),
+    Input("school-map-school-type", "value"),
+    Input("result-year-no-2023", "value"),
+]
+movers_callback = [
+    Output("movers", "figure"),
+    Input("movers-statistic-selection", "value"),
+    Input("movers-school-type", "value"),
+    Input("movers-result-year", "value"),
+    Input("movers-n-selection", "value"),
+]
 
-    plot_df = analysis_df[
-        (analysis_df["year"] == results_year)
-        & (analysis_df["School Sector"].isin(school_type))
-    ]
-    plot_df = plot_df[~plot_df[statistic_selection].isna()]
-
-    schools_map_fig = px.scatter_mapbox(
-        plot_df,
-        lat="Latitude",
-        lon="Longitude",
-        color=statistic_selection,
-        opacity=1.0,
-        size=statistic_selection,
-        size_max=7,
-        zoom=9,
-        height=550,
-        center=dict(lat=-37.8136, lon=144.9631),
-        color_continuous_scale="Jet",
-        hover_data={
-            "School": True,
-            "School Sector": True,
-            "Latitude": False,
-            "Longitude": False,
-        },
-    )
 
-    schools_map_fig.update_layout(
-        margin=dict(l=30, r=30, t=60, b=30),
-        coloraxis_colorbar=dict(
-            orientation="h",
-            xanchor="left",
-            x=0,
-            y=-0.2,
-        ),
+def register_callbacks(app: Dash):
+    """Attach the callbacks to an app
+
+    Args:
+        app (Dash): The app
+    """
+    app.callback(
+        Output("school-performance-over-time", "figure"),
+        Input("historical-performance-statistic-selection", "value"),
+        Input("school-selection", "value"),
+    )(update_school_performance_over_time)
+    app.callback(
+        Output("school-selection", "options"),
+        Input("school-selection", "search_value"),
+        State("school-selection", "value"),
+    )(update_school_options)
+    app.callback(*movers_callback)(update_movers)
+    app.callback(*schools_nearby_callback)(update_schools_nearby)
+    app.clientside_callback(
+        f"function (statistic) {{ return statistic === '{COMPOSITE_SCORE}'; }}",
+        Output("composite-weights", "is_open"),
+        Input("top-n-statistic-selection", "value"),
     )
 
-    return schools_map_fig
+    if CLIENTSIDE_FILTERING:
+        # The dataset is only fetched once one of these tabs is opened
+        app.clientside_callback(
+            ClientsideFunction("vce", "loadData"),
+            Output("clientside-data", "data"),
+            Input("tabs", "active_tab"),
+            State("clientside-data", "data"),
+        )
+        app.clientside_callback(
+            ClientsideFunction("vce", "topNSchools"),
+            *top_n_schools_callback,
+            Input("clientside-data", "data"),
+        )
+        app.clientside_callback(
+            ClientsideFunction("vce", "schoolsMap"),
+            *schools_map_callback,
+            Input("clientside-data", "data"),
+        )
+    else:
+        app.callback(*top_n_schools_callback)(update_top_n_schools)
+        app.callback(*schools_map_callback, Input("schools-map", "relayoutData"))(
+            update_schools_map
+        )
+
+
+SNAPSHOT_FIGURES = {
+    "top-n-schools": top_n_schools_figure,
+    "schools-map": schools_map_figure,
+}
+
+
+def snapshot_inputs():
+    """Every input combination `snapshots.py` pre-renders
+
+    Yields:
+        Tuple[str, tuple]: Name in SNAPSHOT_FIGURES & the builder's inputs
+    """
+    years = sorted(get_app_data().dataset.years, reverse=True)
+    sector_choices = [
+        list(sectors)
+        for size in range(len(SECTORS) + 1)
+        for sectors in itertools.combinations(SECTORS, size)
+    ]
+
+    # Year first, so each year's partition & rankings are reused while loaded
+    for year, statistic, sectors, top_n, min_enrolments in itertools.product(
+        [ALL_YEARS] + years,
+        TOP_N_STATISTICS,
+        sector_choices,
+        TOP_N_PRESETS,
+        MIN_ENROLMENT_PRESETS,
+    ):
+        yield "top-n-schools", (statistic, sectors, year, top_n, min_enrolments, None)
+
+    # Only the initial view, the map is built live once it's moved
+    viewport = viewport_from_relayout(None, MAP_CENTER, MAP_ZOOM, MAP_WIDTH, MAP_HEIGHT)
+    for year, statistic, sectors in itertools.product(
+        years[1:], STATISTICS, sector_choices
+    ):
+        yield "schools-map", (statistic, sectors, year, viewport)
+
+
+def configure_figures():
+    """Set up plotly express: the figure template & the mapbox token"""
+    with startup_timer.stage("import plotly express"):
+        import plotly.express as px
+        from dash_bootstrap_templates import load_figure_template
+
+    with startup_timer.stage("figure template"):
+        load_figure_template("bootstrap")
+        px.set_mapbox_access_token(os.getenv("MAPBOX_TOKEN"))
+
+
+def create_app() -> Dash:
+    """Build the Dash app, loading the data if this process hasn't already
+
+    Returns:
+        Dash: The app
+    """
+    configure_figures()
+    data = get_app_data()
+
+    with startup_timer.stage("dash app & layout"):
+        app = Dash(
+            __name__,
+            external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.BOOTSTRAP],
+            meta_tags=[
+                {"name": "viewport", "content": "width=device-width, initial-scale=1"},
+            ],
+            title="School Comparison",
+        )
+        app.layout = build_layout(data.dataset.years)
+        register_callbacks(app)
+
+        server = app.server
+        # Installed first so it compresses what the other hooks produce
+        response_compression.init_app(server)
+        ResponseCaching().init_app(server)
+        callback_metrics.init_app(server)
+        server.add_url_rule(
+            "/figure-cache/stats", "figure_cache_stats", figure_cache_stats
+        )
+        server.add_url_rule("/data/clientside.json", "clientside_data", clientside_data)
+        JsonApi(data.dataset.version, API_VIEWS).init_app(server)
+
+    return app
+
+
+_default_app = None
+
+
+def __getattr__(name):
+    # `app` & `server` are built on first access, eg by gunicorn
+    global _default_app
+    if name not in ("app", "server"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    if _default_app is None:
+        _default_app = create_app()
+        # Objects made so far live as long as the process. Freezing them keeps
+        # the garbage collector in forked workers from writing to, and so
+        # copying, the pages they share with the master.
+        gc.freeze()
+    return _default_app if name == "app" else _default_app.server
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    parser = argparse.ArgumentParser(description="VCE school performance app")
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Print how long each stage of starting up took, then exit",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    if args.startup_report:
+        print(startup_timer.report())
+    else:
+        app.run(debug=True)
@@ -0,0 +1,440 @@
+/*
+ * Browser side versions of the Top Schools & Schools Map callbacks, used when
+ * the app runs with CLIENTSIDE_FILTERING turned on. They mirror
+ * `update_top_n_schools` & `update_schools_map` in app.py, working off the
+ * payload built by clientside.py.
+ */
+
+(function () {
+    const NOT_YET_KNOWN = "Not Yet Known";
+    const ALL_YEARS = "All";
+    // Mirror COMPOSITE_SCORE, COMPOSITE_STATISTICS & COMPOSITE_WEIGHTS in
+    // ranking.py & app.py
+    const COMPOSITE_SCORE = "Composite score";
+    const COMPOSITE_STATISTICS = [
+        "Median VCE study score",
+        "Percentage of study scores of 40 and over",
+        "Percentage of VCE students applying for tertiary places",
+        "Percentage of satisfactory VCE completions",
+        "ICSEA",
+    ];
+    const COMPOSITE_WEIGHTS = [1, 1, 0, 0, 0];
+    const SECTOR_COLOURS = {
+        Independent: "#636EFA",
+        Government: "#00CC96",
+        Catholic: "#EF553B",
+    };
+
+    function isMissing(value) {
+        return value === null || value === undefined || Number.isNaN(value);
+    }
+
+    // Sort by value, keeping missing values at the end like pandas does
+    function byValue(descending) {
+        return function (a, b) {
+            if (isMissing(a.value)) return isMissing(b.value) ? 0 : 1;
+            if (isMissing(b.value)) return -1;
+            return descending ? b.value - a.value : a.value - b.value;
+        };
+    }
+
+    // Same order as a pandas groupby on the group keys, so ties are broken the
+    // same way
+    function byKey(a, b) {
+        for (let k = 0; k < a.key.length; k++) {
+            if (a.key[k] !== b.key[k]) return a.key[k] - b.key[k];
+        }
+        return 0;
+    }
+
+    function mean(sum, count) {
+        return count > 0 ? sum / count : null;
+    }
+
+    function rankSchools(data, statistic, resultYear) {
+        const years =
+            resultYear === ALL_YEARS ? Object.keys(data.years) : [String(resultYear)];
+
+        const groups = new Map();
+        years.forEach(function (year) {
+            const columns = data.years[year];
+            if (!columns) return;
+            const values = columns.stats[statistic];
+            const enrolments = columns.stats["Total Enrolments"];
+
+            for (let i = 0; i < columns.school.length; i++) {
+                const key = [
+                    columns.school[i],
+                    columns.school_id[i],
+                    columns.sector[i],
+                    columns.school_type[i],
+                ];
+                const id = key.join("|");
+                if (!groups.has(id)) {
+                    groups.set(id, {
+                        key: key,
+                        sum: 0,
+                        count: 0,
+                        enrolmentSum: 0,
+                        enrolmentCount: 0,
+                    });
+                }
+                const group = groups.get(id);
+                if (!isMissing(values[i])) {
+                    group.sum += values[i];
+                    group.count += 1;
+                }
+                if (!isMissing(enrolments[i])) {
+                    group.enrolmentSum += enrolments[i];
+                    group.enrolmentCount += 1;
+                }
+            }
+        });
+
+        return Array.from(groups.values())
+            .sort(byKey)
+            .map(function (group) {
+                return {
+                    school: data.schools[group.key[0]],
+                    sector: data.sectors[group.key[2]],
+                    schoolType: data.school_types[group.key[3]],
+                    value: mean(group.sum, group.count),
+                    enrolments: mean(group.enrolmentSum, group.enrolmentCount),
+                };
+            })
+            .sort(byValue(true));
+    }
+
+    // Z-scores of each composite statistic within a year's columns
+    function normaliseYear(columns) {
+        return COMPOSITE_STATISTICS.map(function (statistic) {
+            const values = columns.stats[statistic];
+            let sum = 0;
+            let count = 0;
+            values.forEach(function (value) {
+                if (!isMissing(value)) {
+                    sum += value;
+                    count += 1;
+                }
+            });
+            const average = mean(sum, count);
+            let squares = 0;
+            values.forEach(function (value) {
+                if (!isMissing(value)) squares += (value - average) * (value - average);
+            });
+            const std = count > 0 ? Math.sqrt(squares / count) : 0;
+
+            return values.map(function (value) {
+                if (isMissing(value)) return null;
+                return std > 0 ? (value - average) / std : 0;
+            });
+        });
+    }
+
+    // Same as CompositeRanking.top_n before the sector, enrolment & top N cuts:
+    // every school's mean z-scores, weighted
+    function rankComposite(data, weights, resultYear) {
+        const years =
+            resultYear === ALL_YEARS ? Object.keys(data.years) : [String(resultYear)];
+
+        const groups = new Map();
+        years.forEach(function (year) {
+            const columns = data.years[year];
+            if (!columns) return;
+            const normalised = normaliseYear(columns);
+            const enrolments = columns.stats["Total Enrolments"];
+
+            for (let i = 0; i < columns.school.length; i++) {
+                const key = [
+                    columns.school[i],
+                    columns.school_id[i],
+                    columns.sector[i],
+                    columns.school_type[i],
+                ];
+                const id = key.join("|");
+                if (!groups.has(id)) {
+                    groups.set(id, {
+                        key: key,
+                        sums: COMPOSITE_STATISTICS.map(function () {
+                            return 0;
+                        }),
+                        counts: COMPOSITE_STATISTICS.map(function () {
+                            return 0;
+                        }),
+                        enrolmentSum: 0,
+                        enrolmentCount: 0,
+                    });
+                }
+                const group = groups.get(id);
+                normalised.forEach(function (column, k) {
+                    if (!isMissing(column[i])) {
+                        group.sums[k] += column[i];
+                        group.counts[k] += 1;
+                    }
+                });
+                if (!isMissing(enrolments[i])) {
+                    group.enrolmentSum += enrolments[i];
+                    group.enrolmentCount += 1;
+                }
+            }
+        });
+
+        return Array.from(groups.values())
+            .sort(byKey)
+            .map(function (group) {
+                let total = 0;
+                let weightSum = 0;
+                group.sums.forEach(function (sum, k) {
+                    if (group.counts[k] > 0) {
+                        total += weights[k] * (sum / group.counts[k]);
+                        weightSum += weights[k];
+                    }
+                });
+                return {
+                    school: data.schools[group.key[0]],
+                    sector: data.sectors[group.key[2]],
+                    schoolType: data.school_types[group.key[3]],
+                    value: weightSum > 0 ? Math.round((total / weightSum) * 1000) / 1000 : null,
+                    enrolments: mean(group.enrolmentSum, group.enrolmentCount),
+                };
+            })
+            // Schools without any of the weighted statistics aren't ranked
+            .filter(function (row) {
+                return !isMissing(row.value);
+            })
+            .sort(byValue(true));
+    }
+
+    function topNSchools(
+        statistic,
+        schoolTypes,
+        resultYear,
+        topN,
+        minEnrolments,
+        weights,
+        data
+    ) {
+        if (!data) return window.dash_clientside.no_update;
+
+        const sectors = new Set(schoolTypes ? schoolTypes.concat([NOT_YET_KNOWN]) : []);
+        let ranked;
+        if (statistic === COMPOSITE_SCORE) {
+            ranked = rankComposite(
+                data,
+                (weights || COMPOSITE_WEIGHTS).map(function (weight) {
+                    return weight || 0;
+                }),
+                resultYear
+            );
+        } else {
+            ranked = rankSchools(data, statistic, resultYear);
+        }
+
+        const totalEnrolments = ranked.reduce(function (total, row) {
+            return total + (isMissing(row.enrolments) ? 0 : row.enrolments);
+        }, 0);
+        if (totalEnrolments !== 0) {
+            ranked = ranked.filter(function (row) {
+                return !isMissing(row.enrolments) && row.enrolments >= minEnrolments;
+            });
+        }
+
+        const topSchools = ranked
+            .filter(function (row) {
+                return sectors.has(row.sector);
+            })
+            .slice(0, topN)
+            .sort(byValue(false));
+
+        const traces = [];
+        const traceBySector = {};
+        topSchools.forEach(function (row) {
+            if (!(row.sector in traceBySector)) {
+                traceBySector[row.sector] = {
+                    alignmentgroup: "True",
+                    customdata: [],
+                    hovertemplate:
+                        "School Sector=%{customdata[0]}<br>" +
+                        statistic +
+                        "=%{x}<br>School=%{y}<br>School Type=%{customdata[1]}<extra></extra>",
+                    legendgroup: row.sector,
+                    marker: {
+                        color:
+                            SECTOR_COLOURS[row.sector] ||
+                            data.template.layout.colorway[0],
+                        pattern: { shape: "" },
+                    },
+                    name: row.sector,
+                    offsetgroup: row.sector,
+                    orientation: "h",
+                    showlegend: true,
+                    textposition: "auto",
+                    x: [],
+                    xaxis: "x",
+                    y: [],
+                    yaxis: "y",
+                    type: "bar",
+                };
+                traces.push(traceBySector[row.sector]);
+            }
+            const trace = traceBySector[row.sector];
+            trace.customdata.push([row.sector, row.schoolType]);
+            trace.x.push(row.value);
+            trace.y.push(row.school);
+        });
+
+        const values = topSchools
+            .map(function (row) {
+                return row.value;
+            })
+            .filter(function (value) {
+                return !isMissing(value);
+            });
+        const spacer = 0.5;
+        const schools = topSchools.map(function (row) {
+            return row.school;
+        });
+
+        return {
+            data: traces,
+            layout: {
+                template: data.template,
+                xaxis: {
+                    anchor: "y",
+                    domain: [0.0, 1.0],
+                    title: { text: statistic },
+                    range: values.length
+                        ? [Math.min.apply(null, values) - spacer, Math.max.apply(null, values) + spacer]
+                        : [null, null],
+                    dtick: 0.5,
+                },
+                yaxis: {
+                    anchor: "x",
+                    domain: [0.0, 1.0],
+                    title: { text: "School" },
+                    categoryorder: "array",
+                    categoryarray: schools,
+                    tickvals: schools.map(function (_, i) {
+                        return i;
+                    }),
+                    ticktext: schools,
+                },
+                legend: {
+                    title: traces.length ? { text: "School Sector" } : undefined,
+                    tracegroupgap: 0,
+                    yanchor: "top",
+                    xanchor: "left",
+                    y: 1.1,
+                    orientation: "h",
+                },
+                title: { text: "Top " + topN + " Schools" },
+                barmode: "relative",
+                height: Math.max(450, 35 * topN),
+            },
+        };
+    }
+
+    function schoolsMap(statistic, schoolTypes, resultYear, data) {
+        if (!data) return window.dash_clientside.no_update;
+
+        const sectors = new Set(schoolTypes || []);
+        const columns = data.years[String(resultYear)] || {
+            school: [],
+            sector: [],
+            lat: [],
+            lon: [],
+            stats: { [statistic]: [] },
+        };
+        const values = columns.stats[statistic];
+
+        const trace = {
+            customdata: [],
+            hovertemplate:
+                statistic +
+                "=%{marker.color}<br>School=%{customdata[0]}<br>School Sector=%{customdata[1]}<extra></extra>",
+            lat: [],
+            legendgroup: "",
+            lon: [],
+            marker: {
+                color: [],
+                coloraxis: "coloraxis",
+                opacity: 1.0,
+                size: [],
+                sizemode: "area",
+                sizeref: 0,
+            },
+            mode: "markers",
+            name: "",
+            showlegend: false,
+            subplot: "mapbox",
+            type: "scattermapbox",
+        };
+
+        for (let i = 0; i < columns.school.length; i++) {
+            const sector = data.sectors[columns.sector[i]];
+            if (!sectors.has(sector) || isMissing(values[i])) continue;
+
+            trace.customdata.push([
+                data.schools[columns.school[i]],
+                sector,
+                columns.lat[i],
+                columns.lon[i],
+            ]);
+            trace.lat.push(columns.lat[i]);
+            trace.lon.push(columns.lon[i]);
+            trace.marker.color.push(values[i]);
+            trace.marker.size.push(values[i]);
+        }
+
+        const sizeMax = 7;
+        trace.marker.sizeref = trace.marker.size.length
+            ? Math.max.apply(null, trace.marker.size) / (sizeMax * sizeMax)
+            : null;
+
+        const mapbox = {
+            domain: { x: [0.0, 1.0], y: [0.0, 1.0] },
+            center: { lat: -37.8136, lon: 144.9631 },
+            zoom: 9,
+        };
+        if (data.mapbox_token) mapbox.accesstoken = data.mapbox_token;
+
+        return {
+            data: [trace],
+            layout: {
+                template: data.template,
+                mapbox: mapbox,
+                coloraxis: {
+                    colorbar: {
+                        title: { text: statistic },
+                        orientation: "h",
+                        xanchor: "left",
+                        x: 0,
+                        y: -0.2,
+                    },
+                    colorscale: data.map_colorscale,
+                },
+                legend: { tracegroupgap: 0, itemsizing: "constant" },
+                margin: { t: 60, l: 30, r: 30, b: 30 },
+                height: 550,
+            },
+        };
+    }
+
+    // Fetch the dataset the first time one of the filtered tabs is opened
+    function loadData(activeTab, data) {
+        if (data || (activeTab !== "top-schools" && activeTab !== "tab-schools-map")) {
+            return window.dash_clientside.no_update;
+        }
+        return fetch("data/clientside.json").then(function (response) {
+            return response.json();
+        });
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        vce: {
+            loadData: loadData,
+            topNSchools: topNSchools,
+            schoolsMap: schoolsMap,
+        },
+    });
+})();
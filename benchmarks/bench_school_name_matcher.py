@@ -0,0 +1,89 @@
+"""Compares the trigram index matcher with the difflib baseline.
+
+The joining table provides the ground truth: every VCAA name with a known ACARA
+name is used as a query. The ACARA names are padded out with made up
+"distractor" names (recombined words from real names) so the candidate pool is
+about the size of the national ACARA school list.
+
+    poetry run python benchmarks/bench_school_name_matcher.py --pool-size 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import get_close_match  # noqa: E402
+from school_name_matcher import JOINING_TABLE_PATH, TrigramIndex  # noqa: E402
+
+
+def build_pool(acara_names, pool_size, seed=0):
+    rng = random.Random(seed)
+    words = [name.split() for name in acara_names]
+    pool = set(acara_names)
+    while len(pool) < pool_size:
+        first, second = rng.sample(words, 2)
+        pool.add(" ".join(first[: len(first) // 2 + 1] + second[len(second) // 2 :]))
+    return sorted(pool)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-size", type=int, default=5000)
+    parser.add_argument(
+        "--queries",
+        type=int,
+        default=200,
+        help="Number of names to match (difflib takes a while)",
+    )
+    args = parser.parse_args()
+
+    joining_table = pd.read_csv(JOINING_TABLE_PATH).dropna()
+    queries = joining_table.sample(
+        n=min(args.queries, len(joining_table)), random_state=0
+    )
+    pool = build_pool(
+        joining_table["acara_school_name"].unique().tolist(), args.pool_size
+    )
+    print(f"{len(queries)} queries against {len(pool)} candidate names")
+
+    start = time.perf_counter()
+    difflib_matches = [
+        get_close_match(name, pool) for name in queries["vce_school_name"]
+    ]
+    difflib_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = TrigramIndex(pool)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index_matches = []
+    for name in queries["vce_school_name"]:
+        match = index.search(name)
+        index_matches.append(pool[match[0][0]] if match else None)
+    index_seconds = time.perf_counter() - start
+
+    truth = queries["acara_school_name"].tolist()
+    for label, matches, seconds in [
+        ("difflib", difflib_matches, difflib_seconds),
+        ("trigram index", index_matches, index_seconds),
+    ]:
+        correct = sum(m == t for m, t in zip(matches, truth))
+        print(
+            f"{label:>14}: {seconds:8.3f}s "
+            f"({1000 * seconds / len(queries):7.2f} ms/name), "
+            f"{correct}/{len(truth)} correct"
+        )
+    print(f"{'index build':>14}: {build_seconds:8.3f}s")
+    agree = sum(a == b for a, b in zip(difflib_matches, index_matches))
+    print(f"Matchers agree on {agree}/{len(truth)} names")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,580 @@
+"""Load tests the Dash server with simulated concurrent users.
+
+Starts the app in a single worker (gunicorn if it's installed, otherwise
+werkzeug's single threaded server, which behaves like a sync gunicorn worker)
+and has each simulated user replay the `_dash-update-component` requests a
+browser sends while using one of the tabs: searching for & picking schools,
+switching the statistic/year/sector, dragging the Top N slider, typing an
+enrolment minimum, panning & zooming the map. Every user runs in its own thread with its own
+keep-alive connection. Each concurrency level runs for `--duration` seconds and
+reports throughput plus p50/p95/p99 latency per callback:
+
+    poetry run python benchmarks/load_test.py --concurrency 1 2 4 8 16
+    poetry run python benchmarks/load_test.py --url http://127.0.0.1:8050 --concurrency 8
+
+Requests go out with `Accept-Encoding: gzip`, like a browser's. The server's
+figure cache is left as configured by the environment, so set
+`FIGURE_CACHE_BACKEND=off` to measure uncached callbacks.
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+CALLBACK_PATH = "/_dash-update-component"
+SECTORS = ["Independent", "Government", "Catholic"]
+DEFAULT_STATISTIC = "Median VCE study score"
+COMPOSITE_SCORE = "Composite score"
+# How often users pick each tab
+TAB_WEIGHTS = {"history": 0.4, "top_n": 0.35, "map": 0.25}
+SERVER_START_TIMEOUT = 120
+
+Request = Tuple[str, Dict[str, Any]]
+
+
+class Options:
+    """Dropdown options from the app's layout, to pick realistic inputs from
+
+    Args:
+        layout (Dict[str, Any]): The app's `/_dash-layout`
+        outputs (List[str]): Outputs of the server side callbacks, from
+            `/_dash-dependencies`
+        schools (List[Tuple[int, str]]): School IDs & names, from `find_schools`
+    """
+
+    def __init__(
+        self,
+        layout: Dict[str, Any],
+        outputs: List[str],
+        schools: List[Tuple[int, str]],
+    ):
+        found = {}
+        self.composite_weights = []
+
+        def walk(node):
+            if isinstance(node, list):
+                for child in node:
+                    walk(child)
+            elif isinstance(node, dict):
+                props = node.get("props", {})
+                if isinstance(props.get("id"), dict):
+                    if props["id"].get("type") == "composite-weight":
+                        self.composite_weights.append((props["id"], props["value"]))
+                elif isinstance(props.get("id"), str) and "options" in props:
+                    found[props["id"]] = [
+                        option["value"] if isinstance(option, dict) else option
+                        for option in props["options"]
+                    ]
+                walk(props.get("children"))
+
+        walk(layout)
+        self.schools = schools
+        self.statistics = found["historical-performance-statistic-selection"]
+        self.top_n_statistics = found["top-n-statistic-selection"]
+        self.top_n_years = found["result-year"]
+        self.map_statistics = found["schools-map-statistic-selection"]
+        self.map_years = found["result-year-no-2023"]
+        self.outputs = set(outputs)
+
+
+def callback_body(
+    output: str,
+    inputs: List[Tuple[str, str, Any]],
+    changed: Optional[str],
+    state: Optional[List[Tuple[str, str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Request body Dash's renderer sends for a single output callback
+
+    Args:
+        output (str): Output, eg "graph.figure"
+        inputs (List[Tuple[str, str, Any]]): Input id, property & value
+        changed (Optional[str]): Input ("id.property") that triggered the
+            callback. None for the initial call.
+        state (Optional[List[Tuple[str, str, Any]]], optional): State id,
+            property & value. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: Request JSON
+    """
+    output_id, output_property = output.rsplit(".", 1)
+    return {
+        "output": output,
+        "outputs": {"id": output_id, "property": output_property},
+        "inputs": [
+            {"id": id_, "property": prop, "value": value} for id_, prop, value in inputs
+        ],
+        "changedPropIds": [changed] if changed else [],
+        "state": [
+            {"id": id_, "property": prop, "value": value}
+            for id_, prop, value in state or []
+        ],
+    }
+
+
+def history_session(rng: random.Random, options: Options) -> Iterator[Request]:
+    """Search for & compare a few schools, then flick through the statistics"""
+    output = "school-performance-over-time.figure"
+    search_output = "school-selection.options"
+    statistic, schools = DEFAULT_STATISTIC, None
+
+    def request(changed):
+        inputs = [
+            ("historical-performance-statistic-selection", "value", statistic),
+            ("school-selection", "value", schools),
+        ]
+        return output, callback_body(output, inputs, changed)
+
+    def search(typed):
+        inputs = [("school-selection", "search_value", typed)]
+        state = [("school-selection", "value", schools)]
+        return search_output, callback_body(
+            search_output, inputs, "school-selection.search_value", state
+        )
+
+    yield request(None)
+    for _ in range(rng.randint(1, 5)):
+        school_id, name = rng.choice(options.schools)
+        # The dropdown searches on every keystroke
+        for length in range(1, rng.randint(2, 5)):
+            yield search(name[:length])
+        schools = (schools or []) + [school_id]
+        yield request("school-selection.value")
+    for _ in range(rng.randint(0, 3)):
+        statistic = rng.choice(options.statistics)
+        yield request("historical-performance-statistic-selection.value")
+    if rng.random() < 0.3:
+        schools = schools[1:]
+        yield request("school-selection.value")
+
+
+def top_n_session(rng: random.Random, options: Options) -> Iterator[Request]:
+    """Switch years & sectors, drag the slider & type an enrolment minimum"""
+    output = "top-n-schools.figure"
+    state = {
+        "top-n-statistic-selection": DEFAULT_STATISTIC,
+        "school-type": list(SECTORS),
+        "result-year": options.top_n_years[0],
+        "top-n-selection": 10,
+        "minimum-enrolments": 50,
+    }
+
+    weights = [weight for _, weight in options.composite_weights]
+
+    def request(changed):
+        inputs = [(id_, "value", value) for id_, value in state.items()]
+        body = callback_body(output, inputs, changed and f"{changed}.value")
+        # The pattern-matching input sends every slider's value as one list
+        body["inputs"].append(
+            [
+                {"id": id_, "property": "value", "value": weight}
+                for (id_, _), weight in zip(options.composite_weights, weights)
+            ]
+        )
+        return output, body
+
+    yield request(None)
+    for _ in range(rng.randint(1, 4)):
+        state["result-year"] = rng.choice(options.top_n_years)
+        yield request("result-year")
+    for _ in range(rng.randint(0, 2)):
+        # The slider only updates on mouseup, so a drag is one request
+        state["top-n-selection"] = rng.randrange(0, 51, 5)
+        yield request("top-n-selection")
+    if rng.random() < 0.5:
+        state["school-type"] = rng.sample(SECTORS, rng.randint(1, 3))
+        yield request("school-type")
+    if rng.random() < 0.3:
+        # Each keystroke updates the input
+        typed = str(rng.choice([100, 250, 500]))
+        for i in range(1, len(typed) + 1):
+            state["minimum-enrolments"] = int(typed[:i])
+            yield request("minimum-enrolments")
+    if rng.random() < 0.3:
+        state["top-n-statistic-selection"] = rng.choice(options.top_n_statistics)
+        yield request("top-n-statistic-selection")
+    if state["top-n-statistic-selection"] == COMPOSITE_SCORE and weights:
+        for _ in range(rng.randint(1, 3)):
+            i = rng.randrange(len(weights))
+            weights[i] = rng.randint(0, 5)
+            changed = json.dumps(options.composite_weights[i][0], sort_keys=True)
+            yield request(changed.replace(" ", ""))
+
+
+def map_session(rng: random.Random, options: Options) -> Iterator[Request]:
+    """Switch the statistic/year/sector, pan & zoom"""
+    output = "schools-map.figure"
+    state = {
+        "schools-map-statistic-selection": DEFAULT_STATISTIC,
+        "school-map-school-type": list(SECTORS),
+        "result-year-no-2023": options.map_years[0],
+    }
+    relayout_data = None
+
+    def request(changed):
+        inputs = [(id_, "value", value) for id_, value in state.items()]
+        inputs.append(("schools-map", "relayoutData", relayout_data))
+        return output, callback_body(output, inputs, changed)
+
+    yield request(None)
+    for _ in range(rng.randint(1, 3)):
+        state["result-year-no-2023"] = rng.choice(options.map_years)
+        yield request("result-year-no-2023.value")
+    if rng.random() < 0.5:
+        state["schools-map-statistic-selection"] = rng.choice(options.map_statistics)
+        yield request("schools-map-statistic-selection.value")
+    if rng.random() < 0.3:
+        state["school-map-school-type"] = rng.sample(SECTORS, rng.randint(1, 3))
+        yield request("school-map-school-type.value")
+
+    center, zoom = {"lat": -37.8136, "lon": 144.9631}, 9.0
+    for _ in range(rng.randint(0, 4)):
+        zoom = min(max(zoom + rng.choice([-1.0, -0.5, 0.5, 1.0]), 5.0), 14.0)
+        center = {
+            "lat": center["lat"] + rng.uniform(-0.1, 0.1),
+            "lon": center["lon"] + rng.uniform(-0.1, 0.1),
+        }
+        relayout_data = {"mapbox.center": center, "mapbox.zoom": zoom}
+        yield request("schools-map.relayoutData")
+
+
+SESSIONS = {"history": history_session, "top_n": top_n_session, "map": map_session}
+SESSION_OUTPUTS = {
+    "history": "school-performance-over-time.figure",
+    "top_n": "top-n-schools.figure",
+    "map": "schools-map.figure",
+}
+
+
+class Results:
+    """Latencies of every request, by callback"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.bytes: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, callback: str, seconds: float, size: int, ok: bool):
+        with self._lock:
+            if ok:
+                self.latencies.setdefault(callback, []).append(seconds)
+                self.bytes[callback] = self.bytes.get(callback, 0) + size
+            else:
+                self.errors[callback] = self.errors.get(callback, 0) + 1
+
+    def summary(self, seconds: float) -> Dict[str, Dict[str, float]]:
+        """Throughput & latency percentiles per callback, plus "all"
+
+        Args:
+            seconds (float): How long the test ran
+
+        Returns:
+            Dict[str, Dict[str, float]]: Statistics, latencies in seconds
+        """
+        with self._lock:
+            groups = dict(self.latencies)
+            groups["all"] = [t for ts in self.latencies.values() for t in ts]
+            summary = {}
+            for callback, latencies in groups.items():
+                errors = (
+                    sum(self.errors.values())
+                    if callback == "all"
+                    else self.errors.get(callback, 0)
+                )
+                summary[callback] = {
+                    "requests": len(latencies),
+                    "errors": errors,
+                    "throughput": len(latencies) / seconds,
+                    **percentiles(latencies),
+                }
+                if callback != "all":
+                    summary[callback]["mean_bytes"] = self.bytes[callback] / max(
+                        len(latencies), 1
+                    )
+            return summary
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if len(latencies) < 2:
+        value = latencies[0] if latencies else float("nan")
+        return {"p50": value, "p95": value, "p99": value}
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+def simulated_user(
+    url: str,
+    options: Options,
+    results: Results,
+    stop: threading.Event,
+    seed: int,
+    think_seconds: float,
+):
+    """Run sessions until `stop` is set, recording each request"""
+    rng = random.Random(seed)
+    parsed = urllib.parse.urlparse(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+    tabs = [tab for tab in SESSIONS if SESSION_OUTPUTS[tab] in options.outputs]
+    weights = [TAB_WEIGHTS[tab] for tab in tabs]
+    headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+
+    while not stop.is_set():
+        tab = rng.choices(tabs, weights)[0]
+        for callback, body in SESSIONS[tab](rng, options):
+            if stop.is_set():
+                break
+
+            payload = json.dumps(body).encode()
+            start = time.perf_counter()
+            try:
+                connection.request(
+                    "POST", parsed.path.rstrip("/") + CALLBACK_PATH, payload, headers
+                )
+                response = connection.getresponse()
+                data = response.read()
+                ok = response.status in (200, 204)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                data, ok = b"", False
+            results.record(callback, time.perf_counter() - start, len(data), ok)
+
+            if think_seconds:
+                stop.wait(rng.expovariate(1 / think_seconds))
+    connection.close()
+
+
+def run_level(
+    url: str,
+    options: Options,
+    concurrency: int,
+    duration: float,
+    think_seconds: float,
+    seed: int,
+) -> Dict[str, Dict[str, float]]:
+    """Run `concurrency` simulated users for `duration` seconds"""
+    results = Results()
+    stop = threading.Event()
+    users = [
+        threading.Thread(
+            target=simulated_user,
+            args=(url, options, results, stop, seed + i, think_seconds),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for user in users:
+        user.start()
+    stop.wait(duration)
+    stop.set()
+    for user in users:
+        user.join()
+    return results.summary(time.perf_counter() - start)
+
+
+def get_json(url: str, path: str, body: Optional[Dict[str, Any]] = None) -> Any:
+    parsed = urllib.parse.urlparse(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+    try:
+        if body is None:
+            connection.request("GET", parsed.path.rstrip("/") + path)
+        else:
+            connection.request(
+                "POST",
+                parsed.path.rstrip("/") + path,
+                json.dumps(body).encode(),
+                {"Content-Type": "application/json"},
+            )
+        response = connection.getresponse()
+        data = response.read()
+        if response.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        return json.loads(data)
+    finally:
+        connection.close()
+
+
+def find_schools(url: str) -> List[Tuple[int, str]]:
+    """Schools to pick from, found by searching for each letter
+
+    The layout no longer lists the schools, so this asks the server the way the
+    dropdown does.
+
+    Args:
+        url (str): App URL
+
+    Returns:
+        List[Tuple[int, str]]: School IDs & names
+    """
+    output = "school-selection.options"
+    schools = {}
+    for letter in "abcdefghijklmnopqrstuvwxyz":
+        body = callback_body(
+            output,
+            [("school-selection", "search_value", letter)],
+            "school-selection.search_value",
+            [("school-selection", "value", None)],
+        )
+        response = get_json(url, CALLBACK_PATH, body)["response"]
+        for option in response["school-selection"]["options"]:
+            schools[option["value"]] = option["label"]
+    return sorted(schools.items())
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(data_dir: str, port: int, threads: int) -> subprocess.Popen:
+    """Serve the app from `data_dir` in a single worker process
+
+    Args:
+        data_dir (str): Directory holding the analysis dataset
+        port (int): Port to listen on
+        threads (int): Threads in the worker
+
+    Returns:
+        subprocess.Popen: The server, once it's answering requests
+    """
+    bind = f"127.0.0.1:{port}"
+    if shutil.which("gunicorn"):
+        command = ["gunicorn", "--workers", "1", "--threads", str(threads)]
+        command += ["--bind", bind, "--pythonpath", REPO_DIR, "app:server"]
+    else:
+        command = [
+            sys.executable,
+            "-c",
+            "import sys; sys.path.insert(0, sys.argv[1]); import app; "
+            "from werkzeug.serving import run_simple; "
+            "run_simple('127.0.0.1', int(sys.argv[2]), app.server, "
+            "threaded=int(sys.argv[3]) > 1)",
+            REPO_DIR,
+            str(port),
+            str(threads),
+        ]
+    server = subprocess.Popen(
+        command, cwd=data_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}")
+        try:
+            get_json(f"http://{bind}", "/_dash-dependencies")
+            return server
+        except (OSError, http.client.HTTPException, ValueError):
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Timed out waiting for the server to start")
+
+
+def print_summary(concurrency: int, summary: Dict[str, Dict[str, float]]):
+    print(f"\n{concurrency} concurrent users")
+    print(
+        f"{'callback':<38} {'reqs':>6} {'errs':>5} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for callback, stats in sorted(summary.items(), key=lambda item: item[0] == "all"):
+        print(
+            f"{callback:<38} {stats['requests']:>6} {stats['errors']:>5} "
+            f"{stats['throughput']:8.1f} {1000 * stats['p50']:8.1f} "
+            f"{1000 * stats['p95']:8.1f} {1000 * stats['p99']:8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Numbers of simulated users to run, one level after another",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=20, help="Seconds to run each level for"
+    )
+    parser.add_argument(
+        "--think-ms",
+        type=float,
+        default=0,
+        help="Mean pause between a user's requests. 0 finds the worker's capacity.",
+    )
+    parser.add_argument(
+        "--url", help="Test an already running server instead of starting one"
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        help="Serve synthetic data at this scale instead of the real dataset",
+    )
+    parser.add_argument(
+        "--threads", type=int, default=1, help="Threads in the server's worker"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        data_dir = REPO_DIR
+        if args.scale is not None:
+            from run_benchmarks import synthetic_data
+
+            data_dir = synthetic_data(args.scale, args.seed, workbooks=False)
+        port = free_port()
+        print(f"Starting a single worker server on port {port}")
+        server = start_server(data_dir, port, args.threads)
+        url = f"http://127.0.0.1:{port}"
+
+    try:
+        dependencies = get_json(url, "/_dash-dependencies")
+        options = Options(
+            get_json(url, "/_dash-layout"),
+            [d["output"] for d in dependencies],
+            find_schools(url),
+        )
+
+        results = {}
+        for concurrency in args.concurrency:
+            summary = run_level(
+                url,
+                options,
+                concurrency,
+                args.duration,
+                args.think_ms / 1000,
+                args.seed,
+            )
+            print_summary(concurrency, summary)
+            results[concurrency] = summary
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": args.url, "levels": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""Times the ETL stages & the Dash callbacks against synthetic data.
+
+Synthetic data (see `synthetic.py`) is generated once per scale into
+benchmarks/.synthetic/ and reused. Each ETL stage is called directly, in the
+synthetic data's directory, and the callbacks' figure builders are called
+without a browser (or the figure cache) in a fresh process per scale, since
+the app loads its dataset once per process. Results are written to
+benchmarks/results/ as JSON, named after the commit, so runs can be compared:
+
+    poetry run python benchmarks/run_benchmarks.py --scales 1 10 100 --etl-scales 1 10
+    poetry run python benchmarks/run_benchmarks.py --compare OLD.json NEW.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+SYNTHETIC_DIR = os.path.join(REPO_DIR, "benchmarks", ".synthetic")
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+# Changes in median time beyond this are flagged when comparing runs
+SIGNIFICANT_CHANGE = 0.1
+
+
+def time_call(func: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    """Time repeated calls of `func`, discarding anything it prints
+
+    Args:
+        func (Callable[[], Any]): Function to time
+        repeat (int): Number of timed calls
+        warmup (int, optional): Untimed calls first. Defaults to 1.
+
+    Returns:
+        Dict[str, Any]: Timing statistics in seconds
+    """
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            func()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+
+    return {
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "min": min(times),
+        "max": max(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "repeat": repeat,
+    }
+
+
+def synthetic_data(scale: float, seed: int, workbooks: bool) -> str:
+    """Directory holding synthetic data for `scale`, generating it if needed"""
+    import synthetic
+
+    data_dir = os.path.join(SYNTHETIC_DIR, f"{scale:g}x-seed{seed}")
+    marker = os.path.join(data_dir, "WORKBOOKS" if workbooks else "DATASET")
+    if not os.path.exists(marker):
+        print(f"Generating {scale:g}x synthetic data in {data_dir}")
+        synthetic.generate(data_dir, scale, seed, workbooks=workbooks)
+        open(marker, "w").close()
+        if workbooks:
+            open(os.path.join(data_dir, "DATASET"), "w").close()
+    return data_dir
+
+
+def etl_benchmarks(data_dir: str, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Time each ETL stage against the synthetic workbooks in `data_dir`"""
+    import data_loader
+    from dataset_artifact import (
+        read_artifact,
+        read_manifest,
+        read_partition,
+        write_artifact,
+    )
+
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        analysis_df = data_loader.create_analysis_dataset(save=False)
+        artifact_dir = tempfile.mkdtemp()
+
+        def read_latest_partition():
+            manifest = read_manifest(artifact_dir)
+            return read_partition(artifact_dir, manifest, manifest["partitions"][-1])
+
+        stages = {
+            "etl.read_results_year": lambda: data_loader.get_results_for_year(
+                max(data_loader.RESULT_SOURCES), force=True
+            ),
+            "etl.get_results": lambda: data_loader.get_results(force=True),
+            "etl.get_results_cached": lambda: data_loader.get_results(),
+            "etl.school_profiles": lambda: data_loader.get_vic_school_profiles(
+                force=True
+            ),
+            "etl.school_locations": lambda: data_loader.get_vic_school_locations(
+                force=True
+            ),
+            # Sources come from the ETL cache, so this is the join & schema
+            "etl.create_analysis_dataset": lambda: data_loader.create_analysis_dataset(
+                save=False
+            ),
+            "etl.write_artifact": lambda: write_artifact(analysis_df, artifact_dir),
+            "etl.read_artifact": lambda: read_artifact(artifact_dir),
+            "etl.read_partition": read_latest_partition,
+        }
+        # Parsing is slow, so it isn't repeated as often
+        slow = {"etl.get_results", "etl.school_profiles", "etl.school_locations"}
+
+        results = {}
+        for name, func in stages.items():
+            print(f"  {name}")
+            results[name] = time_call(
+                func, repeat=1 if name in slow else repeat, warmup=0
+            )
+        return results
+    finally:
+        os.chdir(cwd)
+
+
+def callback_benchmarks(data_dir: str, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Time the callbacks' figure builders against the dataset in `data_dir`
+
+    Must run in a fresh process: it loads the app's data from `data_dir`.
+    """
+    os.environ["FIGURE_CACHE_BACKEND"] = "off"
+    os.chdir(data_dir)
+
+    start = time.perf_counter()
+    import app
+    import plotly.io as pio
+
+    results = {"app.import": {"median": time.perf_counter() - start, "repeat": 1}}
+    start = time.perf_counter()
+    dash_app = app.create_app()
+    results["app.create_app"] = {"median": time.perf_counter() - start, "repeat": 1}
+
+    dataset = app.get_app_data().dataset
+    statistic = "Median VCE study score"
+    sectors = ["Independent", "Government", "Catholic"]
+    latest_year = max(dataset.years)
+    school_ids = dataset.partition(latest_year)["School ID"].unique()[:3].tolist()
+    default_view = app.viewport_from_relayout(
+        None, app.MAP_CENTER, app.MAP_ZOOM, app.MAP_WIDTH, app.MAP_HEIGHT
+    )
+    state_view = app.viewport_from_relayout(
+        None, app.MAP_CENTER, 6, app.MAP_WIDTH, app.MAP_HEIGHT
+    )
+
+    # What the server does per request: build the figure & serialise it
+    callbacks = {
+        "callback.school_performance": lambda: app.school_performance_figure(
+            statistic, school_ids
+        ),
+        "callback.top_n_schools.all_years": lambda: app.top_n_schools_figure(
+            statistic, sectors, app.ALL_YEARS, 10, 50
+        ),
+        "callback.top_n_schools.one_year": lambda: app.top_n_schools_figure(
+            statistic, sectors, latest_year, 50, 50
+        ),
+        "callback.top_n_schools.composite": lambda: app.top_n_schools_figure(
+            app.COMPOSITE_SCORE, sectors, app.ALL_YEARS, 50, 50, [1, 1, 1, 1, 1]
+        ),
+        "callback.schools_map.default_view": lambda: app.schools_map_figure(
+            statistic, sectors, latest_year - 1, default_view
+        ),
+        "callback.schools_map.state_view": lambda: app.schools_map_figure(
+            statistic, sectors, latest_year - 1, state_view
+        ),
+        "callback.schools_nearby.nearest": lambda: app.schools_nearby_figure(
+            statistic,
+            sectors,
+            latest_year - 1,
+            app.MAP_CENTER["lat"],
+            app.MAP_CENTER["lon"],
+            "k:20",
+        ),
+        "callback.schools_nearby.radius": lambda: app.schools_nearby_figure(
+            statistic,
+            sectors,
+            latest_year - 1,
+            app.MAP_CENTER["lat"],
+            app.MAP_CENTER["lon"],
+            "km:10",
+        ),
+        "callback.movers": lambda: app.movers_figure(
+            statistic, sectors, latest_year - 1, app.MOVERS_N
+        ),
+    }
+    for name, build in callbacks.items():
+        results[name] = time_call(lambda: pio.to_json(build()), repeat)
+        results[name]["bytes"] = len(pio.to_json(build()))
+
+    # The JSON API's answers to the same queries, through the Flask app
+    client = dash_app.server.test_client()
+    endpoints = {
+        "api.school_history": f"/api/v1/schools/{school_ids[0]}/history",
+        "api.top_schools.one_year": (
+            f"/api/v1/top-schools?year={latest_year}&limit=50&min_enrolments=50"
+        ),
+        "api.schools.bbox": (
+            f"/api/v1/schools?year={latest_year - 1}&bbox=144.5,-38.2,145.5,-37.5"
+            f"&statistic={statistic}&limit=1000"
+        ),
+    }
+    for name, url in endpoints.items():
+        results[name] = time_call(lambda: client.get(url).get_data(), repeat)
+        results[name]["bytes"] = len(client.get(url).get_data())
+
+    return results
+
+
+def _run_callbacks_in_subprocess(data_dir: str, repeat: int) -> Dict[str, Any]:
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--callbacks-in",
+                data_dir,
+                "--repeat",
+                str(repeat),
+                "--output",
+                output.name,
+            ],
+            check=True,
+        )
+        with open(output.name) as f:
+            return json.load(f)
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    scales: List[float], etl_scales: List[float], repeat: int, seed: int
+) -> Dict[str, Any]:
+    """Run every benchmark at every scale
+
+    Returns:
+        Dict[str, Any]: Run metadata & results, keyed "<benchmark>@<scale>x"
+    """
+    benchmarks = {}
+    for scale in sorted(set(scales) | set(etl_scales)):
+        data_dir = synthetic_data(scale, seed, workbooks=scale in etl_scales)
+
+        suites = []
+        if scale in etl_scales:
+            print(f"ETL at {scale:g}x")
+            suites.append(etl_benchmarks(data_dir, repeat))
+        if scale in scales:
+            print(f"Callbacks at {scale:g}x")
+            suites.append(_run_callbacks_in_subprocess(data_dir, repeat))
+
+        for suite in suites:
+            for name, result in suite.items():
+                benchmarks[f"{name}@{scale:g}x"] = {"scale": scale, **result}
+
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": seed,
+        "benchmarks": benchmarks,
+    }
+
+
+def compare(old_path: str, new_path: str):
+    """Print the change in median time for every benchmark in both runs"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{old['commit'] or old_path} -> {new['commit'] or new_path}")
+    for name in sorted(set(old["benchmarks"]) & set(new["benchmarks"])):
+        before = old["benchmarks"][name]["median"]
+        after = new["benchmarks"][name]["median"]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio > 1 + SIGNIFICANT_CHANGE:
+            flag = "  slower"
+        elif ratio < 1 - SIGNIFICANT_CHANGE:
+            flag = "  faster"
+        print(
+            f"{name:<48} {1000 * before:10.2f}ms {1000 * after:10.2f}ms "
+            f"{ratio:6.2f}x{flag}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scales",
+        type=float,
+        nargs="+",
+        default=[1, 10, 100],
+        help="Scales to benchmark the callbacks at",
+    )
+    parser.add_argument(
+        "--etl-scales",
+        type=float,
+        nargs="*",
+        default=[1, 10],
+        help="Scales to benchmark the ETL at. Workbooks are slow to generate & parse.",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", help="Results file. Defaults to benchmarks/results/"
+    )
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--callbacks-in", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.callbacks_in:
+        results = callback_benchmarks(args.callbacks_in, args.repeat)
+        with open(args.output, "w") as f:
+            json.dump(results, f)
+        return
+
+    results = run(args.scales, args.etl_scales, args.repeat, args.seed)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (results["commit"] or "unknown")[:12]
+        stamp = results["created"].replace(":", "")
+        output = os.path.join(RESULTS_DIR, f"{commit}-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for name, result in results["benchmarks"].items():
+        print(f"{name:<48} {1000 * result['median']:10.2f}ms")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
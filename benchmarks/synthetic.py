@@ -0,0 +1,421 @@
+"""Synthetic VCAA/ACARA workbooks & analysis datasets for the benchmarks.
+
+The data is made up but shaped like the real thing: each results workbook
+follows its `RESULT_SOURCES` spec (sheet, header row, column offset & headers),
+the ACARA workbooks are national so most of their rows get filtered out, and a
+joining table links the two. `scale` multiplies the number of schools, 1 being
+about the size of the real data. There's still one results workbook per
+configured year, so the year count is the same at every scale.
+
+    poetry run python benchmarks/synthetic.py --scale 10 --out /tmp/synthetic-10x
+"""
+
+import argparse
+import os
+import sys
+from typing import List
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import (  # noqa: E402
+    RESULT_SOURCES,
+    SCHOOL_LOCATION_SOURCE,
+    SCHOOL_PROFILE_SOURCE,
+)
+from dataset_artifact import ARTIFACT_DIR, CSV_PATH, write_artifact  # noqa: E402
+from schema import apply_schema  # noqa: E402
+from trends import add_trend_metrics  # noqa: E402
+
+BASE_SCHOOLS = 600
+ACARA_YEARS = range(2008, 2024)
+# The ACARA workbooks cover every school in the country. The real ratio is
+# about 15 to every Vic secondary school, but that makes the larger scales
+# impractically slow to write
+OTHER_SCHOOLS_PER_VIC_SCHOOL = 3
+# Share of schools with results in any given year
+YEARLY_PRESENCE = 0.95
+
+SECTORS = ["Government", "Catholic", "Independent"]
+SECTOR_WEIGHTS = [0.55, 0.2, 0.25]
+OTHER_STATES = ["NSW", "QLD", "SA", "WA", "TAS", "NT", "ACT"]
+SUFFIXES = [
+    "Secondary College",
+    "High School",
+    "College",
+    "Grammar School",
+    "Christian College",
+    "Catholic College",
+]
+SYLLABLES = ["bal", "wyn", "mel", "ton", "ash", "burn", "glen", "wood", "kew"]
+SYLLABLES += ["ring", "dale", "brook", "vale", "mont", "field", "haw", "thorn"]
+
+MELBOURNE = (-37.8136, 144.9631)
+VIC_BOUNDS = ((-39.0, 141.0), (-34.0, 149.9))
+
+ANALYSIS_COLUMNS = [
+    "School ID",
+    "School",
+    "ACARA SML ID",
+    "year",
+    "Locality",
+    "Median VCE study score",
+    "Percentage of study scores of 40 and over",
+    "Percentage of VCE students applying for tertiary places",
+    "Percentage of satisfactory VCE completions",
+    "ICSEA",
+    "School Sector",
+    "School Type",
+    "Total Enrolments",
+    "Teaching Staff",
+    "Latitude",
+    "Longitude",
+]
+
+
+def _suburbs(rng: np.random.Generator, n: int) -> List[str]:
+    suburbs = set()
+    while len(suburbs) < n:
+        parts = rng.choice(SYLLABLES, size=rng.integers(2, 5))
+        suburbs.add("".join(parts).title())
+    return sorted(suburbs)
+
+
+def make_schools(scale: float, seed: int = 0) -> pd.DataFrame:
+    """The Vic secondary schools every synthetic source is built from
+
+    Args:
+        scale (float): Multiple of the real number of schools
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: One row per school
+    """
+    rng = np.random.default_rng(seed)
+    n = max(int(BASE_SCHOOLS * scale), 1)
+
+    suburbs = _suburbs(rng, max(n // 3, 1))
+    school_suburbs = rng.choice(suburbs, size=n)
+    names = pd.Series(
+        [f"{s} {suffix}" for s, suffix in zip(school_suburbs, rng.choice(SUFFIXES, n))]
+    )
+    # Make every name unique, the way real duplicates get a campus suffix
+    duplicate = names.groupby(names).cumcount()
+    names = names.where(
+        duplicate == 0, names + " Campus " + (duplicate + 1).astype(str)
+    )
+
+    # Most schools are around Melbourne, the rest anywhere in the state
+    metro = rng.random(n) < 0.6
+    (south, west), (north, east) = VIC_BOUNDS
+    latitude = np.where(
+        metro, rng.normal(MELBOURNE[0], 0.15, n), rng.uniform(south, north, n)
+    )
+    longitude = np.where(
+        metro, rng.normal(MELBOURNE[1], 0.2, n), rng.uniform(west, east, n)
+    )
+
+    schools = pd.DataFrame(
+        {
+            "School": names,
+            "ACARA SML ID": 40000 + np.arange(n) * 3,
+            "Suburb": school_suburbs,
+            "School Sector": rng.choice(SECTORS, size=n, p=SECTOR_WEIGHTS),
+            "School Type": rng.choice(["Secondary", "Combined"], size=n, p=[0.6, 0.4]),
+            "Latitude": latitude.round(6),
+            "Longitude": longitude.round(6),
+            # Drives every school's results so they're consistent across years
+            "quality": rng.normal(0, 1, n),
+            "size": rng.lognormal(6.5, 0.6, n).round(),
+        }
+    ).sort_values("School", ignore_index=True)
+    schools.insert(0, "School ID", np.arange(1, n + 1, dtype=np.int32))
+    return schools
+
+
+def _yearly(schools: pd.DataFrame, year: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, year])
+    year_df = schools[rng.random(len(schools)) < YEARLY_PRESENCE].copy()
+    n = len(year_df)
+    noise = rng.normal(0, 0.3, n)
+    quality = year_df["quality"].to_numpy() + noise
+
+    students = np.maximum((year_df["size"].to_numpy() / 6).round(), 1)
+    year_df["VCE students"] = students.astype(int)
+    year_df["Median VCE study score"] = np.clip(29 + 3 * quality, 15, 45).round()
+    year_df["Percentage of study scores of 40 and over"] = np.clip(
+        6 + 6 * quality, 0, 60
+    ).round(1)
+    year_df["Percentage of VCE students applying for tertiary places"] = np.clip(
+        80 + 8 * quality, 0, 100
+    ).round()
+    year_df["Percentage of satisfactory VCE completions"] = np.clip(
+        94 + 3 * quality, 0, 100
+    ).round()
+    year_df["ICSEA"] = np.clip(1040 + 60 * year_df["quality"], 800, 1250).round()
+    year_df["Total Enrolments"] = (year_df["size"] * rng.normal(1, 0.03, n)).round()
+    year_df["Teaching Staff"] = (year_df["Total Enrolments"] / 13).round(1)
+    return year_df
+
+
+def _result_value(column: str, row, rng: np.random.Generator):
+    if column == "School":
+        return row["School"]
+    if column == "Locality":
+        return row["Suburb"].upper()
+    if column in ("Adult School", "Small School"):
+        return "Y" if rng.random() < 0.03 else None
+    if column == "Availability of International Baccalaureate (Diploma)":
+        return "Y" if rng.random() < 0.05 else None
+    if column in (
+        "Median VCE study score",
+        "Percentage of study scores of 40 and over",
+        "Percentage of VCE students applying for tertiary places",
+        "Percentage of satisfactory VCE completions",
+    ):
+        # Small cohorts are suppressed
+        draw = rng.random()
+        if draw < 0.03:
+            return "-"
+        if draw < 0.05:
+            return "I/D"
+        return row[column]
+    if column.startswith("Percentage"):
+        return float(rng.integers(80, 101))
+    if column == "Number of students enrolled in at least one VCE unit at level 3-4":
+        return int(row["VCE students"])
+    return int(rng.integers(0, 40))
+
+
+def write_results_workbooks(schools: pd.DataFrame, out_dir: str, seed: int = 0):
+    """Write a workbook (or sheet) per `RESULT_SOURCES` year, laid out like the spec
+
+    Args:
+        schools (pd.DataFrame): From `make_schools`
+        out_dir (str): Directory the specs' relative paths are resolved against
+        seed (int, optional): Random seed. Defaults to 0.
+    """
+    workbooks = {}
+    for year, spec in sorted(RESULT_SOURCES.items()):
+        workbooks.setdefault(spec.path, []).append((year, spec))
+
+    for path, year_specs in workbooks.items():
+        wb = openpyxl.Workbook(write_only=True)
+        for year, spec in year_specs:
+            rng = np.random.default_rng([seed, year, 1])
+            ws = wb.create_sheet(spec.sheet or "Sheet1")
+
+            if spec.rename is None:
+                headers = [c for c in spec.columns if c not in spec.missing_columns]
+                columns = headers
+            else:
+                headers = list(spec.rename)
+                columns = [spec.rename[h] for h in headers]
+
+            if spec.header_row > 0:
+                ws.append([f"Senior Secondary Completion and Achievement {year}"])
+                for _ in range(spec.header_row - 1):
+                    ws.append([])
+            padding = [None] * spec.first_column
+            ws.append(padding + headers)
+            for _, row in _yearly(schools, year, seed).iterrows():
+                ws.append(padding + [_result_value(c, row, rng) for c in columns])
+
+        full_path = os.path.join(out_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        wb.save(full_path)
+
+
+def _acara_rows(schools: pd.DataFrame, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, 2])
+    n_other = len(schools) * OTHER_SCHOOLS_PER_VIC_SCHOOL
+
+    # Schools that are filtered out: interstate or primary
+    interstate = rng.random(n_other) < 0.75
+    others = pd.DataFrame(
+        {
+            "School": [f"Other School {i}" for i in range(n_other)],
+            "ACARA SML ID": 40001 + np.arange(n_other) * 3,
+            "Suburb": rng.choice(schools["Suburb"].unique(), size=n_other),
+            "State": np.where(
+                interstate, rng.choice(OTHER_STATES, size=n_other), "VIC"
+            ),
+            "School Sector": rng.choice(SECTORS, size=n_other, p=SECTOR_WEIGHTS),
+            "School Type": np.where(
+                interstate,
+                rng.choice(["Primary", "Secondary"], size=n_other),
+                "Primary",
+            ),
+            "Latitude": rng.uniform(-43, -12, n_other).round(6),
+            "Longitude": rng.uniform(113, 153, n_other).round(6),
+            "quality": rng.normal(0, 1, n_other),
+            "size": rng.lognormal(5.5, 0.6, n_other).round(),
+        }
+    )
+    return pd.concat([schools.assign(State="VIC"), others], ignore_index=True)
+
+
+def write_acara_workbooks(schools: pd.DataFrame, out_dir: str, seed: int = 0):
+    """Write national school profile & location workbooks
+
+    Args:
+        schools (pd.DataFrame): From `make_schools`
+        out_dir (str): Directory the specs' relative paths are resolved against
+        seed (int, optional): Random seed. Defaults to 0.
+    """
+    acara = _acara_rows(schools, seed)
+
+    profile_wb = openpyxl.Workbook(write_only=True)
+    profile_ws = profile_wb.create_sheet(SCHOOL_PROFILE_SOURCE.sheet)
+    profile_ws.append(
+        [
+            "Calendar Year",
+            "ACARA SML ID",
+            "School Name",
+            "Suburb",
+            "State",
+            "Postcode",
+            "School Sector",
+            "School Type",
+            "Campus Type",
+            "ICSEA",
+            "ICSEA Percentile",
+            "Total Enrolments",
+            "Teaching Staff",
+        ]
+    )
+    location_wb = openpyxl.Workbook(write_only=True)
+    location_ws = location_wb.create_sheet(SCHOOL_LOCATION_SOURCE.sheet)
+    location_ws.append(
+        [
+            "Calendar Year",
+            "ACARA SML ID",
+            "School Name",
+            "Suburb",
+            "State",
+            "Postcode",
+            "School Sector",
+            "School Type",
+            "Latitude",
+            "Longitude",
+        ]
+    )
+
+    for year in ACARA_YEARS:
+        for school in _yearly(acara, year, seed).to_dict("records"):
+            common = [
+                year,
+                school["ACARA SML ID"],
+                school["School"],
+                school["Suburb"],
+                school["State"],
+                3000,
+                school["School Sector"],
+                school["School Type"],
+            ]
+            profile_ws.append(
+                common
+                + [
+                    "School Single Entity",
+                    school["ICSEA"],
+                    50,
+                    school["Total Enrolments"],
+                    school["Teaching Staff"],
+                ]
+            )
+            location_ws.append(common + [school["Latitude"], school["Longitude"]])
+
+    for wb, path in [
+        (profile_wb, SCHOOL_PROFILE_SOURCE.path),
+        (location_wb, SCHOOL_LOCATION_SOURCE.path),
+    ]:
+        full_path = os.path.join(out_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        wb.save(full_path)
+
+
+def write_joining_table(schools: pd.DataFrame, out_dir: str):
+    """Write `raw_data/school_name_joining_keys.csv` for the synthetic schools"""
+    pd.DataFrame(
+        {
+            "vce_school_name": schools["School"],
+            "acara_school_name": schools["School"],
+            "ACARA SML ID": schools["ACARA SML ID"],
+            "school_id": schools["School ID"],
+        }
+    ).to_csv(
+        os.path.join(out_dir, "raw_data/school_name_joining_keys.csv"), index=False
+    )
+
+
+def make_analysis_dataset(schools: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Analysis dataset for the synthetic schools, as the ETL would produce it
+
+    Built directly rather than through the ETL so the large scales are quick to
+    make. Like the real data, the last results year has no ACARA data yet.
+
+    Args:
+        schools (pd.DataFrame): From `make_schools`
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Analysis dataset
+    """
+    acara_columns = ["ICSEA", "Total Enrolments", "Teaching Staff"]
+    acara_columns += ["School Sector", "School Type", "Latitude", "Longitude"]
+    acara_columns += ["ACARA SML ID"]
+
+    analysis_df = pd.concat(
+        [
+            _yearly(schools, year, seed).assign(year=year)
+            for year in sorted(RESULT_SOURCES)
+        ]
+    )
+    analysis_df["Locality"] = analysis_df["Suburb"].str.upper()
+    analysis_df.loc[analysis_df["year"] > max(ACARA_YEARS), acara_columns] = np.nan
+
+    analysis_df = apply_schema(analysis_df[ANALYSIS_COLUMNS]).sort_values(
+        by=["School", "School ID", "year"], ascending=True, ignore_index=True
+    )
+    return add_trend_metrics(analysis_df)
+
+
+def generate(out_dir: str, scale: float, seed: int = 0, workbooks: bool = True):
+    """Write everything the ETL & app read into `out_dir`
+
+    Args:
+        out_dir (str): Output directory
+        scale (float): Multiple of the real number of schools
+        seed (int, optional): Random seed. Defaults to 0.
+        workbooks (bool, optional): Also write the source workbooks, which is
+            slow at large scales. Defaults to True.
+    """
+    os.makedirs(os.path.join(out_dir, "raw_data"), exist_ok=True)
+    schools = make_schools(scale, seed)
+
+    if workbooks:
+        write_results_workbooks(schools, out_dir, seed)
+        write_acara_workbooks(schools, out_dir, seed)
+        write_joining_table(schools, out_dir)
+
+    analysis_df = make_analysis_dataset(schools, seed)
+    analysis_df.to_csv(os.path.join(out_dir, CSV_PATH), index=False)
+    write_artifact(analysis_df, os.path.join(out_dir, ARTIFACT_DIR))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument(
+        "--dataset-only",
+        action="store_true",
+        help="Only write the analysis dataset, not the source workbooks",
+    )
+    args = parser.parse_args()
+
+    generate(args.out, args.scale, args.seed, workbooks=not args.dataset_only)
@@ -0,0 +1,70 @@
+"""Compact copy of the analysis dataset for the browser side filtering mode.
+
+With CLIENTSIDE_FILTERING turned on the Top Schools & Schools Map tabs are
+filtered and drawn by `assets/clientside.js`, so changing a dropdown doesn't
+need a round trip to the server. The browser downloads this payload once: a
+column per statistic for each results year, with schools, sectors & school
+types replaced by their position in a shared lookup list.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from schema import widen
+
+
+def _codes(values: pd.Series) -> List[int]:
+    return values.cat.codes.tolist()
+
+
+def _values(values: pd.Series) -> List[Optional[float]]:
+    return [None if pd.isna(v) else v for v in widen(values).tolist()]
+
+
+def build_clientside_payload(
+    analysis_df: pd.DataFrame, statistics: List[str], mapbox_token: Optional[str]
+) -> Dict[str, Any]:
+    """Build the per-year, columnar payload used by `assets/clientside.js`
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+        statistics (List[str]): Statistic columns to ship
+        mapbox_token (Optional[str]): Mapbox access token for the map figure
+
+    Returns:
+        Dict[str, Any]: JSON serialisable payload
+    """
+    import plotly.colors
+    import plotly.io as pio
+    import plotly.utils
+
+    years = {}
+    for year, year_df in analysis_df.groupby("year", observed=True):
+        years[str(year)] = {
+            "school": _codes(year_df["School"]),
+            "school_id": year_df["School ID"].tolist(),
+            "sector": _codes(year_df["School Sector"]),
+            "school_type": _codes(year_df["School Type"]),
+            "lat": _values(year_df["Latitude"]),
+            "lon": _values(year_df["Longitude"]),
+            "stats": {stat: _values(year_df[stat]) for stat in statistics},
+        }
+
+    return {
+        "version": analysis_df.attrs.get("version"),
+        "schools": analysis_df["School"].cat.categories.tolist(),
+        "sectors": analysis_df["School Sector"].cat.categories.tolist(),
+        "school_types": analysis_df["School Type"].cat.categories.tolist(),
+        "years": years,
+        # Figures are built in the browser so they need the same styling px uses
+        "template": json.loads(
+            json.dumps(
+                pio.templates[pio.templates.default].to_plotly_json(),
+                cls=plotly.utils.PlotlyJSONEncoder,
+            )
+        ),
+        "map_colorscale": plotly.colors.make_colorscale(plotly.colors.sequential.Jet),
+        "mapbox_token": mapbox_token,
+    }
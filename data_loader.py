@@ -1,10 +1,30 @@
 """Loads & Returns All Available Result Years."""
 
+import argparse
 import difflib
-from typing import Iterable
-
+import glob
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import openpyxl
 import pandas as pd
 
+from dataset_artifact import write_artifact
+from schema import apply_schema
+from school_name_matcher import JOINING_TABLE_PATH
+from trends import add_trend_metrics
+
+# Normalised source frames are cached here, keyed by the source file's hash.
+# Bump ETL_CACHE_VERSION whenever the parsing/normalising logic changes.
+ETL_CACHE_DIR = ".etl_cache"
+ETL_CACHE_VERSION = 2
+
+SCHOOL_DIMENSION_PATH = "vce_school_dimension.csv"
+
+
 STANDARDISED_COLUMN_NAMES = [
     "School",
     "Adult School",
@@ -27,71 +47,135 @@ STANDARDISED_COLUMN_NAMES = [
 ]
 
 
-def get_results() -> pd.DataFrame:
-    """Read & join annual school results
+@dataclass(frozen=True)
+class SheetSpec:
+    """Describes where the data lives in a worksheet & which parts of it we keep
+
+    Attributes:
+        path (str): Workbook location
+        columns (Tuple[str, ...]): Output columns, in order
+        sheet (Optional[str]): Worksheet name. Defaults to the first sheet.
+        header_row (int): 0-indexed row holding the column headers. Everything
+            above it (titles, notes, etc) is skipped.
+        first_column (int): 0-indexed column the table starts in
+        rename (Optional[Dict[str, str]]): Maps sheet headers to output
+            columns; any other columns are ignored. If None the sheet's
+            columns are taken positionally.
+        missing_columns (Tuple[str, ...]): Output columns the sheet doesn't
+            have. They're filled with None.
+        include (Dict[str, Tuple]): Only keep rows whose column value is one of these
+        exclude (Dict[str, Tuple]): Drop rows whose column value is one of these
+    """
 
-    Read results in 1 by 1 because they're all annoyingly slightly different....
+    path: str
+    columns: Tuple[str, ...]
+    sheet: Optional[str] = None
+    header_row: int = 0
+    first_column: int = 0
+    rename: Optional[Dict[str, str]] = None
+    missing_columns: Tuple[str, ...] = ()
+    include: Dict[str, Tuple] = field(default_factory=dict)
+    exclude: Dict[str, Tuple] = field(default_factory=dict)
 
-    Returns:
-        pd.DataFrame: Joined DF of annual school results from 2014 to 2023
-    """
-    xls = pd.ExcelFile("raw_data/postcompletiondata-schools-2014-2017.xlsx")
-    results2014_2017 = []
-    for sheet in xls.sheet_names:
-        tmp = pd.read_excel(xls, sheet)
-        tmp["year"] = int(sheet)
-        tmp.columns = STANDARDISED_COLUMN_NAMES
-        results2014_2017.append(tmp)
-
-    results_2018 = pd.read_excel(
-        "raw_data/2018_Senior_Secondary_Completion_and_Achievement_Information.xlsx",
-        skiprows=range(1, 8),
-        header=1,
-    )
-    results_2018["year"] = 2018
-    results_2018.columns = STANDARDISED_COLUMN_NAMES
 
-    results_2019 = pd.read_excel(
-        "raw_data/2019SeniorSecondaryCompletionandAchievementInformation.xlsx",
-        skiprows=range(1, 8),
-        header=1,
-    )
-    results_2019["year"] = 2019
-    results_2019.columns = STANDARDISED_COLUMN_NAMES
+def read_sheet(spec: SheetSpec) -> pd.DataFrame:
+    """Stream a worksheet, keeping only the columns & rows the spec asks for
 
-    results_2020 = pd.read_excel(
-        "raw_data/2020SeniorSecondaryCompletionandAchievementInformation.xlsx",
-        skiprows=range(1, 8),
-        header=1,
-    )
-    results_2020["year"] = 2020
-    results_2020.drop(columns=results_2020.columns[0], axis=1, inplace=True)
-    results_2020.columns = STANDARDISED_COLUMN_NAMES
-
-    results_2021 = pd.read_excel(
-        "raw_data/2021SeniorSecondaryCompletionandAchievementInformation.xlsx",
-        skiprows=range(1, 10),
-        header=1,
-    )
-    results_2021["year"] = 2021
-    results_2021.columns = STANDARDISED_COLUMN_NAMES
+    The workbook is opened in read-only mode so rows are parsed one at a time
+    and discarded unless they're kept. Memory therefore scales with the size
+    of the output rather than the size of the workbook.
 
-    results_2022 = pd.read_excel(
-        "raw_data/2022SeniorSecondaryCompletionandAchievementInformation.xlsx",
-        skiprows=range(1, 8),
-        header=1,
-    )
-    results_2022["year"] = 2022
-    results_2022.columns = STANDARDISED_COLUMN_NAMES
+    Args:
+        spec (SheetSpec): What to read
 
-    results_2023 = pd.read_excel(
-        "raw_data/2023SeniorSecondaryCompletionandAchievementInformation.xlsx",
-        skiprows=range(1, 10),
-        header=1,
-    )
-    results_2023["year"] = 2023
-    results_2023.rename(
-        columns={
+    Returns:
+        pd.DataFrame: Selected rows with `spec.columns` as the columns
+    """
+    wb = openpyxl.load_workbook(spec.path, read_only=True, data_only=True)
+    try:
+        ws = wb[spec.sheet] if spec.sheet is not None else wb.worksheets[0]
+        rows = ws.iter_rows(min_row=spec.header_row + 1, values_only=True)
+        header_positions = {
+            name: i
+            for i, name in enumerate(next(rows))
+            if i >= spec.first_column and name is not None
+        }
+
+        present_columns = [c for c in spec.columns if c not in spec.missing_columns]
+        if spec.rename is None:
+            positions = [spec.first_column + i for i in range(len(present_columns))]
+        else:
+            unmatched = set(spec.rename) - set(header_positions)
+            if unmatched:
+                raise ValueError(f"{spec.path} is missing columns: {sorted(unmatched)}")
+            sheet_names = {new: old for old, new in spec.rename.items()}
+            positions = [header_positions[sheet_names[c]] for c in present_columns]
+
+        include = [(header_positions[c], set(v)) for c, v in spec.include.items()]
+        exclude = [(header_positions[c], set(v)) for c, v in spec.exclude.items()]
+
+        kept = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            if any(row[i] not in values for i, values in include):
+                continue
+            if any(row[i] in values for i, values in exclude):
+                continue
+            kept.append([row[i] if i < len(row) else None for i in positions])
+    finally:
+        wb.close()
+
+    df = pd.DataFrame(kept, columns=present_columns).infer_objects()
+    for col in spec.missing_columns:
+        df[col] = None
+
+    return df[list(spec.columns)]
+
+
+RESULT_COLUMNS = tuple(c for c in STANDARDISED_COLUMN_NAMES if c != "year")
+
+# Where each year of VCAA results lives. They're all annoyingly slightly different....
+RESULT_SOURCES = {
+    **{
+        year: SheetSpec(
+            path="raw_data/postcompletiondata-schools-2014-2017.xlsx",
+            columns=RESULT_COLUMNS,
+            sheet=str(year),
+        )
+        for year in range(2014, 2018)
+    },
+    2018: SheetSpec(
+        path="raw_data/2018_Senior_Secondary_Completion_and_Achievement_Information.xlsx",
+        columns=RESULT_COLUMNS,
+        header_row=8,
+    ),
+    2019: SheetSpec(
+        path="raw_data/2019SeniorSecondaryCompletionandAchievementInformation.xlsx",
+        columns=RESULT_COLUMNS,
+        header_row=8,
+    ),
+    2020: SheetSpec(
+        path="raw_data/2020SeniorSecondaryCompletionandAchievementInformation.xlsx",
+        columns=RESULT_COLUMNS,
+        header_row=8,
+        first_column=1,
+    ),
+    2021: SheetSpec(
+        path="raw_data/2021SeniorSecondaryCompletionAndAchievementInformation.xlsx",
+        columns=RESULT_COLUMNS,
+        header_row=10,
+    ),
+    2022: SheetSpec(
+        path="raw_data/2022SeniorSecondaryCompletionAndAchievementInformation.xlsx",
+        columns=RESULT_COLUMNS,
+        header_row=8,
+    ),
+    2023: SheetSpec(
+        path="raw_data/2023SeniorSecondaryCompletionAndAchievementInformation.xlsx",
+        columns=RESULT_COLUMNS,
+        header_row=10,
+        rename={
             "School": "School",
             "Small School": "Small School",
             "Locality": "Locality",
@@ -109,21 +193,14 @@ def get_results() -> pd.DataFrame:
             "Percentage of Victorian Certificate of Applied Learning (VCAL) units completed (2023 only)": "Percentage of VCAL units completed",
             "Median VCE study score": "Median VCE study score",
             "Percentage of study scores of 40 and over": "Percentage of study scores of 40 and over",
-            "year": "year",
         },
-        inplace=True,
-    )
-    results_2023["Adult School"] = None
-    results_2023 = results_2023[STANDARDISED_COLUMN_NAMES]
-
-    results_2024 = pd.read_excel(
-        "raw_data/2024SeniorSecondaryCompletionandAchievementInformation.xlsx",
-        skiprows=range(1, 10),
-        header=1,
-    )
-    results_2024["year"] = 2024
-    results_2024.rename(
-        columns={
+        missing_columns=("Adult School",),
+    ),
+    2024: SheetSpec(
+        path="raw_data/2024SeniorSecondaryCompletionAndAchievementInformation.xlsx",
+        columns=RESULT_COLUMNS,
+        header_row=10,
+        rename={
             "School": "School",
             "Small School": "Small School",
             "Locality": "Locality",
@@ -133,37 +210,97 @@ def get_results() -> pd.DataFrame:
             "Enrolment(s) in the\xa0International\xa0Baccalaureate (IB) Diploma": "Availability of International Baccalaureate (Diploma)",
             "Number of students enrolled in at least one VCE or VCE Vocational Major (VM) study or VCE VET program at Units 3 and 4 level": "Number of students enrolled in at least one VCE unit at level 3-4",
             "Number of students enrolled in a Vocational Education and Training (VET) certificate": "Number of students enrolled in a VET certificate",
-            "Number of students enrolled in the Victorian Certificate of Applied Learning (VCAL) at Intermediate level (2024 only)": "Number of students enrolled in VCAL",
             "Percentage of VCE students applying for tertiary places through the Victorian Tertiary Admissions Centre (VTAC)": "Percentage of VCE students applying for tertiary places",
             "Percentage of satisfactory VCE completions": "Percentage of satisfactory VCE completions",
             "Number of students awarded the VCE (Baccalaureate)": "Number of students awarded the VCE (Baccalaureate)",
             "Percentage of Vocational Education and Training (VET) units of competency completed": "Percentage of VET units of competency completed",
-            "Percentage of Victorian Certificate of Applied Learning (VCAL) units completed (2024 only)": "Percentage of VCAL units completed",
             "Median VCE study score": "Median VCE study score",
             "Percentage of study scores of 40 and over": "Percentage of study scores of 40 and over",
-            "year": "year",
         },
-        inplace=True,
-    )
+        missing_columns=(
+            "Adult School",
+            "Number of students enrolled in VCAL",
+            "Percentage of VCAL units completed",
+        ),
+    ),
+}
+
+SCHOOL_PROFILE_COLUMNS = (
+    "Calendar Year",
+    "School Name",
+    "ACARA SML ID",
+    "Suburb",
+    "School Sector",
+    "School Type",
+    "Campus Type",
+    "ICSEA",
+    "Total Enrolments",
+    "Teaching Staff",
+)
+SCHOOL_LOCATION_COLUMNS = ("Calendar Year", "ACARA SML ID", "Latitude", "Longitude")
+
+# Only Vic secondary schools are needed for this analysis, and only a handful of
+# columns, so everything else is dropped while the (national) workbooks are read
+SCHOOL_PROFILE_SOURCE = SheetSpec(
+    path="raw_data/school-profile-2008-2023.xlsx",
+    sheet="SchoolProfile 2008-2023",
+    columns=SCHOOL_PROFILE_COLUMNS,
+    rename={col: col for col in SCHOOL_PROFILE_COLUMNS},
+    include={"State": ("VIC",)},
+    exclude={"School Type": ("Primary",)},
+)
+
+SCHOOL_LOCATION_SOURCE = SheetSpec(
+    path="raw_data/school-location-2008-2023.xlsx",
+    sheet="SchoolLocations 2008-2023",
+    columns=SCHOOL_LOCATION_COLUMNS,
+    rename={col: col for col in SCHOOL_LOCATION_COLUMNS},
+    include={"State": ("VIC",)},
+    exclude={"School Type": ("Primary",)},
+)
+
+
+def _file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def cached_source(
+    name: str, source_path: str, build: Callable[[], pd.DataFrame], force: bool = False
+) -> pd.DataFrame:
+    """Return a normalised source frame, re-parsing only if its file changed
+
+    Frames are pickled to ETL_CACHE_DIR under a key made from the source
+    file's content hash, so editing (or replacing) a workbook invalidates just
+    the sources that come from it.
+
+    Args:
+        name (str): Unique name for this source, eg "results-2024"
+        source_path (str): Workbook the source is parsed from
+        build (Callable[[], pd.DataFrame]): Parses & normalises the source
+        force (bool, optional): Ignore any cached copy. Defaults to False.
 
-    results_2024["Number of students enrolled in VCAL"] = None
-    results_2024["Percentage of VCAL units completed"] = None
-    results_2024["Adult School"] = None
-    results_2024 = results_2024[STANDARDISED_COLUMN_NAMES]
-
-    all_results = pd.concat(
-        results2014_2017
-        + [
-            results_2018,
-            results_2019,
-            results_2020,
-            results_2021,
-            results_2022,
-            results_2023,
-            results_2024,
-        ]
-    )
+    Returns:
+        pd.DataFrame: Normalised source frame
+    """
+    key = f"{name}-v{ETL_CACHE_VERSION}-{_file_digest(source_path)[:16]}"
+    cache_path = os.path.join(ETL_CACHE_DIR, f"{key}.pkl")
+
+    if not force and os.path.exists(cache_path):
+        return pd.read_pickle(cache_path)
+
+    print(f"  Parsing {name} from {source_path}")
+    df = build()
+
+    os.makedirs(ETL_CACHE_DIR, exist_ok=True)
+    for stale in glob.glob(os.path.join(ETL_CACHE_DIR, f"{name}-*.pkl")):
+        os.remove(stale)
+    df.to_pickle(cache_path)
 
+    return df
+
+
+def _fix_value_columns(results: pd.DataFrame) -> pd.DataFrame:
     val_cols_to_fix = [
         "Median VCE study score",
         "Percentage of study scores of 40 and over",
@@ -172,52 +309,100 @@ def get_results() -> pd.DataFrame:
     ]
 
     for val_col in val_cols_to_fix:
-        all_results[val_col] = all_results[val_col].apply(
+        results[val_col] = results[val_col].apply(
             lambda x: None if x in ["-", "I/D"] else float(x)
         )
 
-    return all_results
+    return results
 
 
-def get_vic_school_profiles() -> pd.DataFrame:
-    # School Profile information
-    xls = pd.ExcelFile("raw_data/school-profile-2008-2023.xlsx")
-    school_profile_df = pd.read_excel(xls, "SchoolProfile 2008-2023")
+def get_results_for_year(year: int, force: bool = False) -> pd.DataFrame:
+    """Read a single year of school results
 
-    # Filter School Profile data to Vic Only for this analysis
-    # And get rid of most of the columns as they're not needed
-    wanted_cols = [
-        "Calendar Year",
-        "School Name",
-        "ACARA SML ID",
-        "Suburb",
-        "School Sector",
-        "School Type",
-        "Campus Type",
-        "ICSEA",
-        "Total Enrolments",
-        "Teaching Staff",
+    Args:
+        year (int): Results year
+        force (bool, optional): Re-parse even if cached. Defaults to False.
+
+    Returns:
+        pd.DataFrame: School results with standardised columns
+    """
+    spec = RESULT_SOURCES[year]
+    return cached_source(
+        f"results-{year}",
+        spec.path,
+        lambda: _fix_value_columns(read_sheet(spec).assign(year=year)),
+        force=force,
+    )
+
+
+def run_source_tasks(
+    tasks: List[Tuple[Callable[..., pd.DataFrame], Tuple[Any, ...]]], jobs: int = 1
+) -> List[pd.DataFrame]:
+    """Run independent source reads, optionally across a process pool
+
+    Workbook parsing is CPU bound so threads don't help. Results come back in
+    the same order as `tasks` regardless of which finishes first.
+
+    Args:
+        tasks (List[Tuple[Callable, Tuple]]): (function, args) pairs to run
+        jobs (int, optional): Number of worker processes. Defaults to 1.
+
+    Returns:
+        List[pd.DataFrame]: Result of each task, in task order
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        return [func(*args) for func, args in tasks]
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+        futures = [pool.submit(func, *args) for func, args in tasks]
+        return [future.result() for future in futures]
+
+
+def _results_tasks(
+    force: bool, force_years: Iterable[int]
+) -> List[Tuple[Callable[..., pd.DataFrame], Tuple[Any, ...]]]:
+    force_years = set(force_years)
+    return [
+        (get_results_for_year, (year, force or year in force_years))
+        for year in sorted(RESULT_SOURCES)
     ]
 
-    return school_profile_df[
-        (school_profile_df["State"] == "VIC")
-        & (school_profile_df["School Type"] != "Primary")
-    ][wanted_cols]
+
+def get_results(
+    force: bool = False, force_years: Iterable[int] = (), jobs: int = 1
+) -> pd.DataFrame:
+    """Read & join annual school results
+
+    Read results in 1 by 1 because they're all annoyingly slightly different....
+    Each year is cached, so only new or changed years are actually re-read.
+
+    Args:
+        force (bool, optional): Re-parse every year. Defaults to False.
+        force_years (Iterable[int], optional): Years to re-parse. Defaults to ().
+        jobs (int, optional): Number of worker processes. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: Joined DF of annual school results from 2014 to 2024
+    """
+    return pd.concat(run_source_tasks(_results_tasks(force, force_years), jobs))
 
 
-def get_vic_school_locations() -> pd.DataFrame:
-    # School Location Information
-    xls = pd.ExcelFile("raw_data/school-location-2008-2023.xlsx")
-    school_locations_df = pd.read_excel(xls, "SchoolLocations 2008-2023")
+def get_vic_school_profiles(force: bool = False) -> pd.DataFrame:
+    return cached_source(
+        "school-profiles",
+        SCHOOL_PROFILE_SOURCE.path,
+        lambda: read_sheet(SCHOOL_PROFILE_SOURCE),
+        force=force,
+    )
 
-    # Filter School Profile data to Vic Only for this analysis
-    # And get rid of most of the columns as they're not needed
-    wanted_cols = ["Calendar Year", "ACARA SML ID", "Latitude", "Longitude"]
 
-    return school_locations_df[
-        (school_locations_df["State"] == "VIC")
-        & (school_locations_df["School Type"] != "Primary")
-    ][wanted_cols]
+def get_vic_school_locations(force: bool = False) -> pd.DataFrame:
+    return cached_source(
+        "school-locations",
+        SCHOOL_LOCATION_SOURCE.path,
+        lambda: read_sheet(SCHOOL_LOCATION_SOURCE),
+        force=force,
+    )
 
 
 def get_close_match(school_name: str, school_name_options: Iterable) -> str:
@@ -228,33 +413,127 @@ def get_close_match(school_name: str, school_name_options: Iterable) -> str:
     return None
 
 
-def create_analysis_dataset(save: bool = True):
-    print("Collating VCE Results Files")
-    results_df = get_results()
+def assign_school_ids(joining_table: pd.DataFrame) -> pd.DataFrame:
+    """Make sure every joining table row has a school_id
+
+    IDs are kept in the joining table so they're the same from one run to the
+    next. A renamed school keeps its history by giving its new VCAA name the
+    old name's school_id. Rows added without one (eg straight from
+    `school_name_matcher.py`) get the next free IDs, which only stick once
+    they're written into the joining table.
+
+    Args:
+        joining_table (pd.DataFrame): VCAA name -> ACARA name & ID table
+
+    Returns:
+        pd.DataFrame: Joining table with an int32 school_id on every row
+    """
+    if "school_id" not in joining_table:
+        joining_table = joining_table.assign(school_id=float("nan"))
+
+    missing = joining_table["school_id"].isna()
+    if missing.any():
+        first_id = int(joining_table["school_id"].max()) + 1 if not missing.all() else 1
+        joining_table = joining_table.copy()
+        joining_table.loc[missing, "school_id"] = range(
+            first_id, first_id + missing.sum()
+        )
+        names = joining_table.loc[missing, "vce_school_name"].tolist()
+        print(
+            f"  {len(names)} joining table names have no school_id, add them to "
+            f"{JOINING_TABLE_PATH} to keep their IDs, eg {names[:5]}"
+        )
+
+    return joining_table.astype({"school_id": "int32"})
+
 
-    print("Sourcing school profile data")
-    school_profile_df = get_vic_school_profiles()
+def build_school_dimension(
+    results_df: pd.DataFrame, joining_table: pd.DataFrame
+) -> pd.DataFrame:
+    """One row per school: its ID, current name & ACARA ID
 
-    print("Sourcing school location data")
-    school_locations_df = get_vic_school_locations()
+    A school's current name is the one it most recently reported results under.
+
+    Args:
+        results_df (pd.DataFrame): VCAA results with a School ID column
+        joining_table (pd.DataFrame): Joining table, from `assign_school_ids`
+
+    Returns:
+        pd.DataFrame: School ID, School & ACARA SML ID, sorted by ID
+    """
+    latest_names = results_df.sort_values("year", kind="stable").drop_duplicates(
+        subset=["School ID"], keep="last"
+    )
+    acara_ids = joining_table.drop_duplicates(subset=["school_id"]).set_index(
+        "school_id"
+    )["ACARA SML ID"]
+
+    school_dimension = pd.DataFrame(
+        {
+            "School ID": latest_names["School ID"].to_numpy(),
+            "School": latest_names["School"].to_numpy(),
+            "ACARA SML ID": latest_names["School ID"].map(acara_ids).to_numpy(),
+        }
+    )
+    return apply_schema(school_dimension.sort_values("School ID", ignore_index=True))
+
+
+def _with_int_keys(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype({"ACARA SML ID": "Int32", "Calendar Year": "Int16"})
+
+
+def create_analysis_dataset(
+    save: bool = True,
+    force: bool = False,
+    force_years: Iterable[int] = (),
+    jobs: int = 1,
+):
+    # The ACARA workbooks are by far the biggest so they're queued first
+    print("Collating VCE results files & sourcing school profile/location data")
+    school_profile_df, school_locations_df, *results = run_source_tasks(
+        [
+            (get_vic_school_profiles, (force,)),
+            (get_vic_school_locations, (force,)),
+        ]
+        + _results_tasks(force, force_years),
+        jobs=jobs,
+    )
+    results_df = pd.concat(results)
 
     # Append location data to school profile data
     school_profile_df = pd.merge(
-        school_profile_df, school_locations_df, on=["ACARA SML ID", "Calendar Year"]
+        _with_int_keys(school_profile_df),
+        _with_int_keys(school_locations_df),
+        on=["ACARA SML ID", "Calendar Year"],
     )
 
-    # Append school information to results data
+    # Every school gets its integer ID up front, so the rest of the joins are
+    # on (ID, year) pairs rather than names
     print("Joining school profile data to VCE results")
-    joining_table = pd.read_csv("raw_data/school_name_joining_keys.csv")
+    joining_table = assign_school_ids(pd.read_csv(JOINING_TABLE_PATH))
+    school_ids = dict(zip(joining_table["vce_school_name"], joining_table["school_id"]))
+
+    # Names missing from the joining table can't be joined to anything
+    results_df = results_df.assign(
+        **{"School ID": results_df["School"].map(school_ids)}
+    ).dropna(subset=["School ID"])
+    results_df = results_df.astype({"School ID": "int32", "year": "int16"})
+    school_dimension = build_school_dimension(results_df, joining_table)
+
+    school_profile_df = pd.merge(
+        school_dimension[["School ID", "ACARA SML ID"]].dropna(),
+        school_profile_df,
+        on="ACARA SML ID",
+    ).drop(columns="ACARA SML ID")
 
     results_df = pd.merge(
-        results_df, joining_table, left_on="School", right_on="vce_school_name"
+        results_df.drop(columns="School"), school_dimension, on="School ID"
     )
     results_df = pd.merge(
         results_df,
         school_profile_df,
-        left_on=["ACARA SML ID", "year"],
-        right_on=["ACARA SML ID", "Calendar Year"],
+        left_on=["School ID", "year"],
+        right_on=["School ID", "Calendar Year"],
         how="left",
     )
 
@@ -264,6 +543,7 @@ def create_analysis_dataset(save: bool = True):
     # results_df[results_df["Locality"].str.lower() != results_df["Suburb"].str.lower()]
 
     cols_for_analysis = [
+        "School ID",
         "School",
         "ACARA SML ID",
         "year",
@@ -281,16 +561,48 @@ def create_analysis_dataset(save: bool = True):
         "Longitude",
     ]
 
-    analysis_df = results_df[cols_for_analysis].sort_values(
-        by=["School", "year"], ascending=True
+    analysis_df = apply_schema(results_df[cols_for_analysis]).sort_values(
+        by=["School", "School ID", "year"], ascending=True
     )
+    analysis_df = add_trend_metrics(analysis_df)
 
     if save:
+        print("Writing school dimension table...")
+        school_dimension.to_csv(SCHOOL_DIMENSION_PATH, index=False)
+
         print("Writing CSV...")
         analysis_df.to_csv("vce_school_results_analysis_dataset.csv", index=False)
+
+        print("Writing columnar artifact...")
+        write_artifact(analysis_df)
     else:
         return analysis_df
 
 
 if __name__ == "__main__":
-    create_analysis_dataset()
+    parser = argparse.ArgumentParser(description="Build the VCE analysis dataset")
+    parser.add_argument(
+        "--years",
+        type=int,
+        nargs="+",
+        default=[],
+        help="Results years to re-parse even if their workbook hasn't changed",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the ETL cache and re-parse every source",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes used to parse source workbooks in parallel",
+    )
+    args = parser.parse_args()
+
+    unknown_years = set(args.years) - set(RESULT_SOURCES)
+    if unknown_years:
+        parser.error(f"No results source configured for {sorted(unknown_years)}")
+
+    create_analysis_dataset(force=args.force, force_years=args.years, jobs=args.jobs)
@@ -0,0 +1,380 @@
+"""Reads & writes the binary columnar copy of the analysis dataset.
+
+Parsing the CSV (and then filling in the gaps) on every app start is slow, so
+`data_loader` also writes the dataset out as `.npy` files, one per column,
+which the app memory-maps instead. Most of the app only ever looks at one
+results year at a time, so the files are partitioned by `year`:
+
+    vce_school_results_analysis_dataset/
+        manifest.json
+        year=2014/col_00.npy ...
+        year=2015/col_00.npy ...
+
+`manifest.json` holds the dataset version, the columns & each partition's row
+count, size and column stats (null count, plus min & max of numeric columns),
+so what's in a partition is known without reading it. Columns keep the dtypes
+from `schema`: categoricals are stored as their codes (the categories, shared
+by every partition, live in the manifest) and nullable ints as their values
+plus a mask. Rows keep their dataset order within a partition.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema
+
+CSV_PATH = "vce_school_results_analysis_dataset.csv"
+ARTIFACT_DIR = "vce_school_results_analysis_dataset"
+RAW_DATA_DIR = "raw_data"
+MANIFEST_FILE = "manifest.json"
+PARTITION_COLUMN = "year"
+# Most memory-mapped column files kept open
+MAPPED_FILES = 4096
+
+NOT_YET_KNOWN = "Not Yet Known"
+NOT_YET_KNOWN_COLUMNS = ["School", "School Sector", "School Type"]
+
+
+def fill_not_yet_known(analysis_df: pd.DataFrame) -> pd.DataFrame:
+    """Replace missing school/sector/type values with "Not Yet Known"
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+
+    Returns:
+        pd.DataFrame: Analysis dataset with the gaps filled in
+    """
+    filled = {}
+    for col in NOT_YET_KNOWN_COLUMNS:
+        values = analysis_df[col]
+        if (
+            isinstance(values.dtype, pd.CategoricalDtype)
+            and NOT_YET_KNOWN not in values.cat.categories
+        ):
+            values = values.cat.add_categories(NOT_YET_KNOWN)
+        filled[col] = values.fillna(NOT_YET_KNOWN)
+
+    return analysis_df.assign(**filled)
+
+
+def read_csv_dataset(csv_path: str = CSV_PATH) -> pd.DataFrame:
+    """Parse the analysis dataset CSV
+
+    Args:
+        csv_path (str, optional): Analysis dataset CSV. Defaults to CSV_PATH.
+
+    Returns:
+        pd.DataFrame: Analysis dataset with "Not Yet Known" fills & `schema`
+            dtypes applied. `attrs["version"]` is a hash of the CSV.
+    """
+    analysis_df = apply_schema(fill_not_yet_known(pd.read_csv(csv_path)))
+    with open(csv_path, "rb") as f:
+        analysis_df.attrs["version"] = hashlib.file_digest(f, "sha256").hexdigest()[:16]
+    return analysis_df
+
+
+def partition_dir(year: int) -> str:
+    """Directory name, relative to the artifact, of a year's partition"""
+    return f"{PARTITION_COLUMN}={year}"
+
+
+def _scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def column_stats(partition_df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Null count, and min & max of numeric columns, for a partition's columns
+
+    Args:
+        partition_df (pd.DataFrame): Rows of one partition
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Stats keyed by column name. min & max are
+            None when a numeric column has no values.
+    """
+    stats = {}
+    for col in partition_df.columns:
+        values = partition_df[col]
+        col_stats = {"nulls": int(values.isna().sum())}
+        if not isinstance(values.dtype, pd.CategoricalDtype) and (
+            pd.api.types.is_numeric_dtype(values.dtype)
+        ):
+            has_values = col_stats["nulls"] < len(values)
+            col_stats["min"] = _scalar(values.min()) if has_values else None
+            col_stats["max"] = _scalar(values.max()) if has_values else None
+        stats[col] = col_stats
+    return stats
+
+
+def _encode(analysis_df: pd.DataFrame) -> pd.DataFrame:
+    # Text columns are stored as categoricals, with their categories decided
+    # over the whole dataset so every partition shares the same codes
+    return analysis_df.assign(
+        **{
+            col: values.astype("category")
+            for col, values in analysis_df.items()
+            if not isinstance(values.dtype, pd.CategoricalDtype)
+            and not pd.api.types.is_numeric_dtype(values.dtype)
+        }
+    )
+
+
+def _write_columns(partition_df: pd.DataFrame, out_dir: str) -> int:
+    """Write one `.npy` file per column (plus masks), returning their size"""
+    os.makedirs(out_dir)
+    for i, col in enumerate(partition_df.columns):
+        values = partition_df[col]
+        path = os.path.join(out_dir, f"col_{i:02d}.npy")
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            np.save(path, values.cat.codes.to_numpy())
+        elif pd.api.types.is_extension_array_dtype(values.dtype):
+            np.save(path, values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=0))
+            np.save(
+                os.path.join(out_dir, f"col_{i:02d}_mask.npy"),
+                values.isna().to_numpy(),
+            )
+        else:
+            np.save(path, values.to_numpy())
+
+    return sum(entry.stat().st_size for entry in os.scandir(out_dir))
+
+
+def write_artifact(analysis_df: pd.DataFrame, artifact_dir: str = ARTIFACT_DIR):
+    """Write the analysis dataset as one `.npy` file per column, per year
+
+    The directory is built alongside the target & swapped in at the end so a
+    running app never sees a half written artifact.
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset, as written to the CSV
+        artifact_dir (str, optional): Where to write the artifact. Defaults to ARTIFACT_DIR.
+
+    Raises:
+        ValueError: If a row has no results year to be partitioned by
+    """
+    analysis_df = _encode(
+        apply_schema(fill_not_yet_known(analysis_df)).reset_index(drop=True)
+    )
+    if analysis_df[PARTITION_COLUMN].isna().any():
+        raise ValueError(f"Every row needs a {PARTITION_COLUMN} to be partitioned by")
+
+    columns = []
+    for i, (col, values) in enumerate(analysis_df.items()):
+        column = {"name": col, "dtype": str(values.dtype), "file": f"col_{i:02d}.npy"}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            column["categories"] = values.cat.categories.tolist()
+        elif pd.api.types.is_extension_array_dtype(values.dtype):
+            column["mask_file"] = f"col_{i:02d}_mask.npy"
+        columns.append(column)
+
+    tmp_dir = f"{artifact_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Content hash of every file, used to invalidate anything derived from it
+    version = hashlib.sha256()
+    partitions = []
+    years = analysis_df[PARTITION_COLUMN].to_numpy(dtype="int64")
+    for year in np.unique(years):
+        partition_df = analysis_df.iloc[np.flatnonzero(years == year)]
+        name = partition_dir(int(year))
+        size = _write_columns(partition_df, os.path.join(tmp_dir, name))
+
+        for file_name in sorted(os.listdir(os.path.join(tmp_dir, name))):
+            version.update(f"{name}/{file_name}".encode())
+            with open(os.path.join(tmp_dir, name, file_name), "rb") as f:
+                version.update(hashlib.file_digest(f, "sha256").digest())
+
+        partitions.append(
+            {
+                PARTITION_COLUMN: int(year),
+                "dir": name,
+                "rows": len(partition_df),
+                "bytes": size,
+                "stats": column_stats(partition_df),
+            }
+        )
+
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(
+            {
+                "version": version.hexdigest()[:16],
+                "rows": len(analysis_df),
+                "partition_column": PARTITION_COLUMN,
+                "columns": columns,
+                "partitions": partitions,
+            },
+            f,
+            indent=2,
+        )
+
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+    os.replace(tmp_dir, artifact_dir)
+
+
+def read_manifest(artifact_dir: str = ARTIFACT_DIR) -> Dict[str, Any]:
+    """The artifact's manifest: version, columns & partitions
+
+    Each categorical column also gets its `pd.CategoricalDtype`, under
+    "categorical_dtype", so every partition read with the manifest shares one
+    copy of the categories.
+
+    Args:
+        artifact_dir (str, optional): Artifact location. Defaults to ARTIFACT_DIR.
+
+    Returns:
+        Dict[str, Any]: Parsed `manifest.json`
+    """
+    with open(os.path.join(artifact_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    for col in manifest["columns"]:
+        if "categories" in col:
+            col["categorical_dtype"] = pd.CategoricalDtype(col["categories"])
+    return manifest
+
+
+@functools.lru_cache(maxsize=MAPPED_FILES)
+def _map_file(path: str, version: str) -> np.ndarray:
+    # Mappings are reused, as parsing the `.npy` header costs more than
+    # reading a few rows. Keyed on the version too, so a rebuilt artifact at
+    # the same path isn't read through stale mappings.
+    return np.load(path, mmap_mode="c")
+
+
+def read_partition(
+    artifact_dir: str,
+    manifest: Dict[str, Any],
+    partition: Dict[str, Any],
+    columns: Optional[List[str]] = None,
+    rows: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """Memory-map one partition of the artifact
+
+    Every column (including categorical codes & nullable int masks) is backed
+    directly by its `.npy` file, unless `rows` picks out a copy of some rows.
+
+    Args:
+        artifact_dir (str): Artifact location
+        manifest (Dict[str, Any]): The artifact's manifest, from `read_manifest`
+        partition (Dict[str, Any]): Entry of `manifest["partitions"]`
+        columns (Optional[List[str]], optional): Columns to read. Defaults to
+            None, for all of them.
+        rows (Optional[np.ndarray], optional): Row positions to read. Defaults
+            to None, for all of them.
+
+    Returns:
+        pd.DataFrame: The partition's rows
+    """
+
+    def load(file_name):
+        values = _map_file(
+            os.path.join(artifact_dir, partition["dir"], file_name),
+            manifest["version"],
+        )
+        return values if rows is None else values[rows]
+
+    data = {}
+    for col in manifest["columns"]:
+        if columns is not None and col["name"] not in columns:
+            continue
+
+        values = load(col["file"])
+        if "categories" in col:
+            values = pd.Categorical.from_codes(values, dtype=col["categorical_dtype"])
+        elif "mask_file" in col:
+            array_type = pd.api.types.pandas_dtype(col["dtype"]).construct_array_type()
+            values = array_type(values, load(col["mask_file"]))
+        data[col["name"]] = values
+
+    return pd.DataFrame(data, copy=False)
+
+
+def read_artifact(artifact_dir: str = ARTIFACT_DIR) -> pd.DataFrame:
+    """Read every partition of the artifact into one frame
+
+    Unlike `read_partition` this is a copy, in memory, of the whole dataset.
+
+    Args:
+        artifact_dir (str, optional): Artifact location. Defaults to ARTIFACT_DIR.
+
+    Returns:
+        pd.DataFrame: Analysis dataset, in year order. `attrs["version"]`
+            holds a content hash.
+    """
+    manifest = read_manifest(artifact_dir)
+    analysis_df = pd.concat(
+        [
+            read_partition(artifact_dir, manifest, partition)
+            for partition in manifest["partitions"]
+        ],
+        ignore_index=True,
+    )
+    analysis_df.attrs["version"] = manifest["version"]
+    return analysis_df
+
+
+def _latest_mtime(paths) -> float:
+    return max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0.0)
+
+
+def artifact_is_stale(
+    artifact_dir: str = ARTIFACT_DIR,
+    csv_path: str = CSV_PATH,
+    raw_data_dir: str = RAW_DATA_DIR,
+) -> bool:
+    """Check whether the artifact is missing or older than its inputs
+
+    Args:
+        artifact_dir (str, optional): Artifact location. Defaults to ARTIFACT_DIR.
+        csv_path (str, optional): Analysis dataset CSV. Defaults to CSV_PATH.
+        raw_data_dir (str, optional): Raw source files. Defaults to RAW_DATA_DIR.
+
+    Returns:
+        bool: True if the artifact can't be trusted
+    """
+    manifest_path = os.path.join(artifact_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return True
+
+    sources = [csv_path]
+    if os.path.isdir(raw_data_dir):
+        sources += [
+            os.path.join(raw_data_dir, name) for name in os.listdir(raw_data_dir)
+        ]
+
+    return os.path.getmtime(manifest_path) < _latest_mtime(sources)
+
+
+def load_analysis_dataset(
+    artifact_dir: str = ARTIFACT_DIR, csv_path: str = CSV_PATH
+) -> pd.DataFrame:
+    """Load the whole analysis dataset, preferring the artifact over the CSV
+
+    Args:
+        artifact_dir (str, optional): Artifact location. Defaults to ARTIFACT_DIR.
+        csv_path (str, optional): Analysis dataset CSV. Defaults to CSV_PATH.
+
+    Returns:
+        pd.DataFrame: Analysis dataset with "Not Yet Known" fills & `schema`
+            dtypes applied. `attrs["version"]` identifies the data it was loaded from.
+    """
+    if not artifact_is_stale(artifact_dir, csv_path):
+        try:
+            return read_artifact(artifact_dir)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Unable to read {artifact_dir}, falling back to CSV: {e}")
+
+    return read_csv_dataset(csv_path)
+
+
+if __name__ == "__main__":
+    # Rebuild the artifact from the current CSV without re-running the ETL
+    write_artifact(pd.read_csv(CSV_PATH))
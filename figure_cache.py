@@ -0,0 +1,307 @@
+"""Memoises the figures returned by the Dash callbacks.
+
+Every visitor asking for the same inputs gets the same figure, so the
+serialised figure JSON is cached under a key built from the callback name, the
+dataset version and the (normalised) inputs. Backends:
+
+- "memory": a per-process LRU capped at `max_bytes`
+- "disk": one file per figure in `cache_dir`, shared by every gunicorn worker
+  pointed at the same directory. Put it on a tmpfs (eg /dev/shm) for a shared
+  memory cache. Least recently used files are removed once the directory
+  grows past `max_bytes`.
+- "off": callbacks aren't cached at all
+
+Hit/miss counters are per process. A cache can be created before the dataset
+is loaded, and nothing is cached until `set_version` is called. Setting a
+different dataset version to the one on disk clears out the old entries.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Collection, Dict, Optional, Tuple
+
+DEFAULT_CACHE_DIR = ".figure_cache"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+VERSION_FILE = "VERSION"
+
+
+def normalise_inputs(args, unordered: Collection[int] = ()) -> list:
+    """Make callback inputs hashable & order independent
+
+    Multi-select values (school & sector lists) only ever filter the data, so
+    their order doesn't change the figure. Other lists (eg the composite
+    weights, one per statistic) are kept in order.
+
+    Args:
+        args: Callback input values
+        unordered (Collection[int], optional): Positions of the multi-select
+            inputs. Defaults to none.
+
+    Returns:
+        list: JSON serialisable, normalised inputs
+    """
+    return [
+        sorted(arg, key=str) if i in unordered and arg is not None else arg
+        for i, arg in enumerate(args)
+    ]
+
+
+class FigureCache:
+    """Bounded LRU cache of serialised figures
+
+    Args:
+        version (Optional[str]): Dataset version. Entries for other versions are
+            never served. None to set it later with `set_version`.
+        backend (str, optional): "memory", "disk" or "off". Defaults to "memory".
+        max_bytes (int, optional): Size cap. Defaults to DEFAULT_MAX_BYTES.
+        cache_dir (str, optional): Directory for the disk backend.
+            Defaults to DEFAULT_CACHE_DIR.
+    """
+
+    def __init__(
+        self,
+        version: Optional[str],
+        backend: str = "memory",
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+    ):
+        if backend not in ("memory", "disk", "off"):
+            raise ValueError(f"Unknown figure cache backend: {backend}")
+
+        self.version = None
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Positions of each callback's multi-select inputs, from `memoise`
+        self._unordered: Dict[str, Tuple[int, ...]] = {}
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+
+        if version is not None:
+            self.set_version(version)
+
+    def set_version(self, version: str):
+        """Start caching figures for a dataset version
+
+        Args:
+            version (str): Dataset version
+        """
+        self.version = version
+        if self.backend == "disk":
+            self._prepare_cache_dir()
+        else:
+            self.clear()
+
+    def _prepare_cache_dir(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        version_path = os.path.join(self.cache_dir, VERSION_FILE)
+        if os.path.exists(version_path):
+            with open(version_path) as f:
+                if f.read() == self.version:
+                    return
+
+        self.clear()
+        with open(version_path, "w") as f:
+            f.write(self.version)
+
+    def key(self, name: str, args) -> str:
+        """Cache key for a callback & its inputs
+
+        Args:
+            name (str): Callback name
+            args: Callback input values
+
+        Returns:
+            str: Hex digest
+        """
+        raw = json.dumps(
+            [name, self.version, normalise_inputs(args, self._unordered.get(name, ()))],
+            default=str,
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self.backend == "memory":
+            with self._lock:
+                payload = self._entries.get(key)
+                if payload is not None:
+                    self._entries.move_to_end(key)
+        else:
+            path = os.path.join(self.cache_dir, f"{key}.json")
+            try:
+                with open(path, "rb") as f:
+                    payload = f.read()
+                # Bump the mtime so eviction treats it as recently used
+                os.utime(path)
+            except FileNotFoundError:
+                payload = None
+
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return payload
+
+    def set(self, key: str, payload: bytes):
+        if len(payload) > self.max_bytes:
+            return
+
+        if self.backend == "memory":
+            with self._lock:
+                if key in self._entries:
+                    self._bytes -= len(self._entries.pop(key))
+                self._entries[key] = payload
+                self._bytes += len(payload)
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+                    self.evictions += 1
+            return
+
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        self._evict_files()
+
+    def _cache_files(self) -> Dict[str, os.stat_result]:
+        stats = {}
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stats[entry.path] = entry.stat()
+            except FileNotFoundError:
+                # Evicted by another worker
+                continue
+        return stats
+
+    def _evict_files(self):
+        stats = self._cache_files()
+        total = sum(stat.st_size for stat in stats.values())
+        for path, stat in sorted(stats.items(), key=lambda item: item[1].st_mtime):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached figure"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+        if self.backend == "disk" and os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".json"):
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters (for this process) & cache size
+
+        Returns:
+            Dict[str, Any]: Cache statistics
+        """
+        if self.backend != "disk":
+            entries, size = len(self._entries), self._bytes
+        else:
+            files = self._cache_files()
+            entries = len(files)
+            size = sum(stat.st_size for stat in files.values())
+
+        return {
+            "backend": self.backend,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def memoise(self, name: str, unordered: Collection[int] = ()) -> Callable:
+        """Decorator caching the figure a callback returns
+
+        Cache hits return the figure as a plain dict, which Dash serialises
+        just like a Figure.
+
+        Args:
+            name (str): Unique name for the callback
+            unordered (Collection[int], optional): Positions of its multi-select
+                inputs, whose order doesn't matter. Defaults to none.
+
+        Returns:
+            Callable: Decorator
+        """
+        self._unordered[name] = tuple(unordered)
+
+        def decorator(func):
+            if self.backend == "off":
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                if self.version is None:
+                    return func(*args)
+
+                key = self.key(name, args)
+                payload = self.get(key)
+                if payload is not None:
+                    return json.loads(payload)
+
+                import plotly.io as pio
+
+                figure = func(*args)
+                self.set(key, pio.to_json(figure, validate=False).encode())
+                return figure
+
+            return wrapper
+
+        return decorator
+
+
+def figure_cache_from_env(version: Optional[str] = None) -> FigureCache:
+    """Build the figure cache configured by environment variables
+
+    - FIGURE_CACHE_BACKEND: "memory" (default), "disk" or "off"
+    - FIGURE_CACHE_DIR: Directory for the disk backend
+    - FIGURE_CACHE_MAX_MB: Size cap in MB. Defaults to 64.
+
+    Args:
+        version (Optional[str], optional): Dataset version. Defaults to None,
+            to set it later with `FigureCache.set_version`.
+
+    Returns:
+        FigureCache: The cache
+    """
+    return FigureCache(
+        version,
+        backend=os.getenv("FIGURE_CACHE_BACKEND", "memory"),
+        max_bytes=int(
+            float(os.getenv("FIGURE_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 2**20))
+            * 2**20
+        ),
+        cache_dir=os.getenv("FIGURE_CACHE_DIR", DEFAULT_CACHE_DIR),
+    )
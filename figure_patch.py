@@ -0,0 +1,58 @@
+"""Partial figure updates for the Dash callbacks.
+
+A graph gets its whole figure the first time it's drawn. After that only the
+inputs change, so the callbacks send a `dash.Patch` replacing the traces & the
+few layout properties that depend on the inputs. The template & the rest of the
+layout, most of a figure's JSON, stay in the browser.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Union
+
+from dash import Patch, ctx
+
+if TYPE_CHECKING:
+    # Only for annotations, plotly is imported by whatever builds the figures
+    import plotly.graph_objects as go
+
+
+def figure_patch(figure: Union["go.Figure", Dict[str, Any]], layout_keys: List[str]):
+    """Patch replacing a figure's traces & the given top level layout properties
+
+    Args:
+        figure (Union[go.Figure, Dict[str, Any]]): Full figure
+        layout_keys (List[str]): Layout properties that depend on the inputs.
+            Ones missing from `figure` are removed from the displayed figure.
+
+    Returns:
+        Patch: Partial update
+    """
+    if not isinstance(figure, dict):
+        figure = figure.to_plotly_json()
+
+    patch = Patch()
+    patch["data"] = figure["data"]
+    for key in layout_keys:
+        if key in figure["layout"]:
+            patch["layout"][key] = figure["layout"][key]
+        else:
+            del patch["layout"][key]
+    return patch
+
+
+def figure_update(
+    figure: Union["go.Figure", Dict[str, Any]], layout_keys: List[str]
+) -> Union["go.Figure", Dict[str, Any], Patch]:
+    """The full figure on a callback's initial call, a `figure_patch` after that
+
+    Must be called from inside a callback.
+
+    Args:
+        figure (Union[go.Figure, Dict[str, Any]]): Full figure
+        layout_keys (List[str]): Layout properties that depend on the inputs
+
+    Returns:
+        Union[go.Figure, Dict[str, Any], Patch]: Callback output
+    """
+    if ctx.triggered_id is None:
+        return figure
+    return figure_patch(figure, layout_keys)
@@ -0,0 +1,206 @@
+"""Compression & cache validators for the app's HTTP responses.
+
+Callback responses are JSON full of float arrays & repeated hover text, which
+compresses very well. `ResponseCompression` gzips JSON, JavaScript, CSS & HTML
+responses, or uses brotli when the `brotli` package is installed & the browser
+accepts it. Compressed copies of responses that can be cached (static files &
+anything with an ETag) are kept in a small LRU, so plotly.js isn't compressed
+again on every page load. As nginx does, compressing a response weakens its
+ETag, since the bytes no longer match.
+
+`ResponseCaching` gives the layout & dependency routes ETags from their
+content, so browsers revalidate them rather than downloading them again. Only
+GET responses get validators: browsers & standard proxies neither cache nor
+revalidate POSTs, so the callbacks are left to the figure cache.
+"""
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "text/css",
+    "text/html",
+    "text/plain",
+}
+# Smaller responses barely shrink & fit in a packet anyway
+MIN_COMPRESS_BYTES = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+CONTENT_ETAG_PATHS = ("_dash-layout", "_dash-dependencies")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best encoding the client accepts that's available here
+
+    Args:
+        accept_encoding (str): Accept-Encoding header
+
+    Returns:
+        Optional[str]: "br", "gzip" or None
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        accepted[name.strip().lower()] = quality
+
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class ResponseCompression:
+    """Negotiated gzip/brotli compression of text responses
+
+    Args:
+        enabled (bool, optional): Compress anything at all. Defaults to True.
+        cache_bytes (int, optional): Size cap on the compressed copies kept.
+            Defaults to DEFAULT_CACHE_BYTES.
+    """
+
+    def __init__(self, enabled: bool = True, cache_bytes: int = DEFAULT_CACHE_BYTES):
+        self.enabled = enabled
+        self.cache_bytes = cache_bytes
+
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+        self._bytes = 0
+
+    def init_app(self, server: Flask):
+        """Install the response hook. Install it before any other hooks, so
+        it runs last.
+
+        Args:
+            server (Flask): The Dash app's server
+        """
+        if self.enabled:
+            server.after_request(self._compress_response)
+
+    def _compress_response(self, response: Response) -> Response:
+        if (
+            response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.status_code != 200
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        data = response.get_data()
+        if encoding is None or len(data) < MIN_COMPRESS_BYTES:
+            return response
+
+        etag, weak = response.get_etag()
+        cacheable = etag is not None or bool(response.cache_control.max_age)
+        key = (request.full_path, etag or "", encoding)
+
+        compressed = self._get(key) if cacheable else None
+        if compressed is None:
+            compressed = compress(data, encoding)
+            if cacheable:
+                self._set(key, compressed)
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _get(self, key: Tuple[str, str, str]) -> Optional[bytes]:
+        with self._lock:
+            compressed = self._cache.get(key)
+            if compressed is not None:
+                self._cache.move_to_end(key)
+            return compressed
+
+    def _set(self, key: Tuple[str, str, str], compressed: bytes):
+        if len(compressed) > self.cache_bytes:
+            return
+        with self._lock:
+            if key in self._cache:
+                self._bytes -= len(self._cache.pop(key))
+            self._cache[key] = compressed
+            self._bytes += len(compressed)
+            while self._bytes > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+class ResponseCaching:
+    """Content ETags for the Dash config routes
+
+    Args:
+        paths (Tuple[str, ...], optional): Endpoints (path suffixes) whose GET
+            responses are revalidated against an ETag of their content.
+            Defaults to CONTENT_ETAG_PATHS.
+    """
+
+    def __init__(self, paths: Tuple[str, ...] = CONTENT_ETAG_PATHS):
+        self.paths = paths
+
+    def init_app(self, server: Flask):
+        """Install the response hook
+
+        Args:
+            server (Flask): The Dash app's server
+        """
+        server.after_request(self._add_validators)
+
+    def _add_validators(self, response: Response) -> Response:
+        if (
+            response.status_code != 200
+            or request.method != "GET"
+            or not request.path.endswith(self.paths)
+        ):
+            return response
+
+        # Depends on the code as well as the data, so revalidate every time
+        response.add_etag()
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+
+def response_compression_from_env() -> ResponseCompression:
+    """Build the compression configured by environment variables
+
+    - RESPONSE_COMPRESSION: "0" to turn it off, eg behind a proxy that compresses
+
+    Returns:
+        ResponseCompression: The compression
+    """
+    return ResponseCompression(
+        enabled=os.getenv("RESPONSE_COMPRESSION", "1").lower()
+        not in ("0", "false", "no"),
+    )
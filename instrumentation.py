@@ -0,0 +1,258 @@
+"""Latency instrumentation for the Dash callbacks.
+
+Each callback request is broken into phases:
+
+- "filter": selecting the rows to plot
+- "build": building the figure
+- "callback": the whole callback function, including figure cache lookups
+- "serialise": the rest of the request, which is mostly Dash serialising the
+  callback's output
+- "total": the whole request
+
+Phases are timed per request & reported back in a `Server-Timing` header
+(shown in the browser's dev tools), and recorded in Prometheus histograms
+labelled by callback, served as text from `/metrics`. Histograms are per
+process, so scrape each gunicorn worker or aggregate in Prometheus. Requests
+slower than `slow_seconds` are logged along with their inputs.
+
+When disabled, `phase` is a no-op & no request hooks are installed.
+
+`StartupTimer` times the stages of starting the app (loading the data, building
+the indexes & layout) for the startup report.
+"""
+
+import contextlib
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence, Tuple
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+DURATION_BUCKETS += (0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CALLBACK_PATH = "_dash-update-component"
+
+
+class Histogram:
+    """Prometheus style cumulative histogram, keyed by a tuple of label values
+
+    Args:
+        name (str): Metric name
+        help_text (str): Metric description
+        label_names (Sequence[str]): Names of the labels
+        buckets (Sequence[float]): Bucket upper bounds, ascending
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float],
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        series = self._series.get(labels)
+        if series is None:
+            # Per bucket counts (plus +Inf), then the sum
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, series in sorted(self._series.items()):
+            label_text = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.label_names, labels)
+            )
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return "\n".join(lines)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class CallbackMetrics:
+    """Times the phases of every callback request
+
+    Args:
+        enabled (bool, optional): Record anything at all. Defaults to True.
+        slow_seconds (Optional[float], optional): Log requests slower than
+            this. Defaults to None, for no logging.
+    """
+
+    def __init__(self, enabled: bool = True, slow_seconds: Optional[float] = None):
+        self.enabled = enabled
+        self.slow_seconds = slow_seconds
+
+        self._lock = threading.Lock()
+        self.durations = Histogram(
+            "vce_callback_duration_seconds",
+            "Time spent in each phase of a callback request",
+            ["callback", "phase"],
+            DURATION_BUCKETS,
+        )
+        self.response_bytes = Histogram(
+            "vce_callback_response_bytes",
+            "Size of callback responses",
+            ["callback"],
+            BYTES_BUCKETS,
+        )
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Time a block (or, as a decorator, a function) as part of a phase
+
+        Time spent in the same phase more than once in a request is summed.
+        Does nothing outside of a request.
+
+        Args:
+            name (str): Phase name
+        """
+        if not self.enabled or not has_request_context():
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases = g.setdefault("callback_phases", {})
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+    def init_app(self, server: Flask):
+        """Install the request hooks & the `/metrics` route
+
+        Args:
+            server (Flask): The Dash app's server
+        """
+        if not self.enabled:
+            return
+
+        server.before_request(self._start_request)
+        server.after_request(self._finish_request)
+        server.add_url_rule("/metrics", "metrics", self._metrics)
+
+    def _start_request(self):
+        if request.path.endswith(CALLBACK_PATH):
+            g.callback_started = time.perf_counter()
+
+    def _finish_request(self, response: Response) -> Response:
+        started = g.get("callback_started")
+        if started is None:
+            return response
+
+        phases = dict(g.get("callback_phases", {}))
+        phases["total"] = time.perf_counter() - started
+        phases["serialise"] = phases["total"] - phases.get("callback", 0.0)
+
+        body = request.get_json(silent=True) or {}
+        callback_id = str(body.get("output", "unknown"))
+        size = response.calculate_content_length() or 0
+
+        with self._lock:
+            for name, seconds in phases.items():
+                self.durations.observe((callback_id, name), seconds)
+            self.response_bytes.observe((callback_id,), size)
+
+        response.headers["Server-Timing"] = ", ".join(
+            f"{name};dur={1000 * seconds:.2f}" for name, seconds in phases.items()
+        )
+
+        if self.slow_seconds is not None and phases["total"] > self.slow_seconds:
+            inputs = [item.get("value") for item in body.get("inputs", [])]
+            timings = ", ".join(f"{n}={1000 * s:.1f}ms" for n, s in phases.items())
+            current_app.logger.warning(
+                f"Slow callback {callback_id} ({timings}) with inputs {inputs}"
+            )
+
+        return response
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format
+
+        Returns:
+            str: Metrics
+        """
+        with self._lock:
+            return (
+                "\n".join([self.durations.render(), self.response_bytes.render()])
+                + "\n"
+            )
+
+    def _metrics(self) -> Response:
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+def callback_metrics_from_env() -> CallbackMetrics:
+    """Build the instrumentation configured by environment variables
+
+    - CALLBACK_METRICS: "1" to turn it on
+    - CALLBACK_METRICS_SLOW_MS: Log callbacks slower than this many milliseconds
+
+    Returns:
+        CallbackMetrics: The instrumentation
+    """
+    slow_ms = os.getenv("CALLBACK_METRICS_SLOW_MS")
+    return CallbackMetrics(
+        enabled=os.getenv("CALLBACK_METRICS", "").lower() in ("1", "true", "yes"),
+        slow_seconds=float(slow_ms) / 1000 if slow_ms else None,
+    )
+
+
+class StartupTimer:
+    """Records how long each stage of starting the app took"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Time a block (or, as a decorator, a function) as a startup stage
+
+        Args:
+            name (str): Stage name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def report(self) -> str:
+        """Table of the stages, slowest first
+
+        Returns:
+            str: Report
+        """
+        total = sum(self.stages.values())
+        lines = [f"{'Stage':<40} {'ms':>10} {'%':>6}"]
+        for name, seconds in sorted(self.stages.items(), key=lambda item: -item[1]):
+            share = 100 * seconds / total if total else 0.0
+            lines.append(f"{name:<40} {1000 * seconds:10.1f} {share:6.1f}")
+        lines.append(f"{'Total':<40} {1000 * total:10.1f} {100.0:6.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,303 @@
+"""Read-only JSON endpoints over the analysis dataset, for scripts & reports.
+
+Scraping the Dash callbacks for a ranked list builds (and throws away) a whole
+figure per request. `JsonApi` serves the same queries as plain JSON under
+API_PREFIX, with the app's filtering: each view filters the dataset's indexes,
+narrows the matches to the requested page & only then turns those rows, with
+just the requested fields, into records.
+
+Responses only depend on the URL & the dataset, so they carry an ETag of the
+dataset version & query and a `Cache-Control` lifetime, which browsers &
+proxies honour for these GET requests. A matching `If-None-Match` gets a 304 without
+running the view, and every response states the dataset version it came from.
+
+Query parameters holding several values are comma separated, eg
+`?fields=School,year&sector=Government,Catholic`.
+"""
+
+import hashlib
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+from flask import Flask, Response, jsonify, request
+from werkzeug.datastructures import MultiDict
+
+from schema import to_plot_frame
+
+API_PREFIX = "/api/v1"
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+API_MAX_AGE = 60 * 60
+
+ApiView = Callable[..., Dict[str, Any]]
+
+
+class QueryError(ValueError):
+    """A query parameter the API can't use, answered with a 400"""
+
+
+class NotFoundError(LookupError):
+    """A URL naming something that isn't in the dataset, answered with a 404"""
+
+
+class QueryArgs:
+    """Typed access to a request's query parameters
+
+    Args:
+        args (MultiDict): The request's query parameters
+    """
+
+    def __init__(self, args: MultiDict):
+        self.args = args
+
+    def _get(self, name: str) -> Optional[str]:
+        value = self.args.get(name)
+        return None if value is None else value.strip()
+
+    def integer(
+        self,
+        name: str,
+        default: Optional[int] = None,
+        minimum: Optional[int] = None,
+        maximum: Optional[int] = None,
+    ) -> Optional[int]:
+        """An integer parameter
+
+        Args:
+            name (str): Parameter name
+            default (Optional[int], optional): Value when it's missing.
+                Defaults to None.
+            minimum (Optional[int], optional): Smallest value allowed.
+                Defaults to None.
+            maximum (Optional[int], optional): Largest value allowed.
+                Defaults to None.
+
+        Returns:
+            Optional[int]: The value
+
+        Raises:
+            QueryError: If it isn't an integer within range
+        """
+        value = self._get(name)
+        if not value:
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise QueryError(f"{name} must be an integer, not {value!r}")
+        if (minimum is not None and number < minimum) or (
+            maximum is not None and number > maximum
+        ):
+            raise QueryError(f"{name} must be between {minimum} and {maximum}")
+        return number
+
+    def strings(self, name: str, default: Optional[List[str]] = None) -> List[str]:
+        """A comma separated parameter
+
+        Args:
+            name (str): Parameter name
+            default (Optional[List[str]], optional): Values when it's missing.
+                Defaults to None, for none.
+
+        Returns:
+            List[str]: The values. Empty if the parameter is, eg `?sector=`.
+        """
+        value = self._get(name)
+        if value is None:
+            return list(default or [])
+        return [item.strip() for item in value.split(",") if item.strip()]
+
+    def floats(self, name: str, count: int) -> Optional[List[float]]:
+        """A comma separated list of exactly `count` numbers
+
+        Args:
+            name (str): Parameter name
+            count (int): Number of values
+
+        Returns:
+            Optional[List[float]]: The values, or None if it's missing
+
+        Raises:
+            QueryError: If they aren't `count` numbers
+        """
+        if self._get(name) is None:
+            return None
+        items = self.strings(name)
+        try:
+            values = [float(item) for item in items]
+        except ValueError:
+            values = []
+        if len(values) != count:
+            raise QueryError(f"{name} must be {count} comma separated numbers")
+        return values
+
+    def choice(self, name: str, choices: Sequence[Any], default: Any) -> Any:
+        """A parameter that has to be one of `choices`
+
+        Integer choices (eg results years) are matched against the text.
+
+        Args:
+            name (str): Parameter name
+            choices (Sequence[Any]): Values allowed
+            default (Any): Value when it's missing
+
+        Returns:
+            Any: The matching choice
+
+        Raises:
+            QueryError: If it isn't one of `choices`
+        """
+        value = self._get(name)
+        if not value:
+            return default
+        for choice in choices:
+            if str(choice) == value:
+                return choice
+        raise QueryError(f"{name} must be one of {', '.join(map(str, choices))}")
+
+    def choices(
+        self, name: str, choices: Sequence[str], default: Optional[List[str]] = None
+    ) -> List[str]:
+        """A comma separated parameter whose values have to be in `choices`
+
+        Args:
+            name (str): Parameter name
+            choices (Sequence[str]): Values allowed
+            default (Optional[List[str]], optional): Values when it's missing.
+                Defaults to None, for all of `choices`.
+
+        Returns:
+            List[str]: The values, in the order given
+
+        Raises:
+            QueryError: If any of them isn't one of `choices`
+        """
+        values = self.strings(name, list(choices) if default is None else default)
+        unknown = [value for value in values if value not in choices]
+        if unknown:
+            raise QueryError(f"Unknown {name}: {', '.join(unknown)}")
+        return list(dict.fromkeys(values))
+
+    def page(self) -> Dict[str, int]:
+        """The `offset` & `limit` parameters
+
+        Returns:
+            Dict[str, int]: offset (default 0) & limit (default DEFAULT_LIMIT,
+                at most MAX_LIMIT)
+        """
+        return {
+            "offset": self.integer("offset", 0, minimum=0),
+            "limit": self.integer("limit", DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT),
+        }
+
+
+def records(rows: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Rows of the analysis dataset as JSON objects
+
+    Args:
+        rows (pd.DataFrame): A (small) slice of the analysis dataset
+
+    Returns:
+        List[Dict[str, Any]]: One dict per row, with missing values as None
+    """
+    widened = to_plot_frame(rows).astype(object)
+    return widened.where(widened.notna(), None).to_dict("records")
+
+
+def paginated(
+    rows: pd.DataFrame,
+    fields: List[str],
+    offset: int,
+    limit: int,
+    more: bool,
+) -> Dict[str, Any]:
+    """A page of results
+
+    Args:
+        rows (pd.DataFrame): The page's rows, at most `limit` of them
+        fields (List[str]): Columns of `rows` to return
+        offset (int): Position of the first row in the whole result
+        limit (int): Page size
+        more (bool): Whether there are results after this page
+
+    Returns:
+        Dict[str, Any]: The page, with the `next_offset` to ask for (None on
+            the last page)
+    """
+    return {
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if more else None,
+        "fields": fields,
+        "results": records(rows[fields]),
+    }
+
+
+class JsonApi:
+    """JSON endpoints whose responses are versioned by the dataset
+
+    Args:
+        version (str): Dataset version
+        views (Dict[str, ApiView]): Views by URL rule (under API_PREFIX). Each
+            is called with a `QueryArgs` & the rule's variables, and returns
+            the response body.
+        max_age (int, optional): Seconds responses can be reused without
+            revalidating. Defaults to API_MAX_AGE.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        views: Dict[str, ApiView],
+        max_age: int = API_MAX_AGE,
+    ):
+        self.version = version
+        self.views = views
+        self.max_age = max_age
+
+    def init_app(self, server: Flask):
+        """Add the routes
+
+        Args:
+            server (Flask): The Dash app's server
+        """
+        for rule, view in self.views.items():
+            server.add_url_rule(
+                API_PREFIX + rule, f"api_{view.__name__}", self._endpoint(view)
+            )
+
+    def etag(self) -> str:
+        """ETag for the current request: the dataset version & the query
+
+        Returns:
+            str: ETag
+        """
+        raw = json.dumps(
+            [self.version, request.path, sorted(request.args.items(multi=True))]
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def _endpoint(self, view: ApiView) -> Callable[..., Response]:
+        def endpoint(**rule_args) -> Response:
+            etag = self.etag()
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                try:
+                    body = view(QueryArgs(request.args), **rule_args)
+                except (QueryError, NotFoundError) as e:
+                    response = jsonify({"error": str(e)})
+                    response.status_code = 400 if isinstance(e, QueryError) else 404
+                    return response
+                response = jsonify({"version": self.version, **body})
+
+            response.set_etag(etag)
+            if self.max_age:
+                response.cache_control.public = True
+                response.cache_control.max_age = self.max_age
+            else:
+                response.cache_control.no_cache = True
+            return response
+
+        return endpoint
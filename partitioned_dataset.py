@@ -0,0 +1,449 @@
+"""The analysis dataset as year partitions, loaded on first use.
+
+The Schools Map, the nearby schools comparison & the Movers tab only ever read
+one results year, so rather than holding the whole dataset the app reads each
+year's partition of the artifact (see `dataset_artifact`) the first time it's
+asked for. Loaded partitions are kept in a least recently used cache capped at
+`memory_budget` bytes, so the memory they use doesn't grow as more years of
+results are added. Indexes over a partition (eg its `spatial.SpatialIndex`)
+are built on first use too, and dropped along with it. An index that only
+needs a few columns (eg the School ID offsets a school's history is sliced
+with) can be built from just those, so it's cached without the whole year.
+
+The year list, row counts & column stats come from the manifest, so nothing
+has to be read to know what's there. Without a usable artifact the dataset is
+parsed from the CSV & split by year in memory, where the budget can't save
+anything.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dataset_artifact import (
+    ARTIFACT_DIR,
+    CSV_PATH,
+    PARTITION_COLUMN,
+    artifact_is_stale,
+    column_stats,
+    read_csv_dataset,
+    read_manifest,
+    read_partition,
+)
+from school_index import SchoolRowIndex, sort_by_school
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+def _nbytes(obj: Any, depth: int = 4) -> int:
+    """Rough size of an index: the frames & arrays it holds, a few levels down"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=False).sum())
+    if isinstance(obj, (np.ndarray, pd.Series)):
+        return int(obj.nbytes)
+    if depth == 0:
+        return 0
+
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    elif hasattr(obj, "__dict__"):
+        values = vars(obj).values()
+    else:
+        return 0
+    return sum(_nbytes(value, depth - 1) for value in values)
+
+
+def _concat(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """`pd.concat` of partitions, which share their categorical dtypes"""
+    # pd.concat would compare (by hashing) every category of every partition,
+    # so join the codes & put the shared dtype back instead
+    dtypes = {
+        col: dtype
+        for col, dtype in frames[0].dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype)
+    }
+    combined = pd.concat(
+        [
+            frame.assign(**{col: frame[col].cat.codes for col in dtypes})
+            for frame in frames
+        ],
+        ignore_index=True,
+    )
+    return combined.assign(
+        **{
+            col: pd.Categorical.from_codes(combined[col], dtype=dtype)
+            for col, dtype in dtypes.items()
+        }
+    )
+
+
+# A year & the columns read, None for all of them
+_PartitionKey = Tuple[int, Optional[Tuple[str, ...]]]
+
+
+@dataclass
+class _LoadedPartition:
+    frame: pd.DataFrame
+    nbytes: int
+    indexes: Dict[Callable, Any] = field(default_factory=dict)
+
+
+class PartitionedDataset:
+    """Year partitions of the analysis dataset, read on first access
+
+    Args:
+        manifest (Dict[str, Any]): Version & partitions, as in the artifact's
+            manifest
+        read (Callable[..., pd.DataFrame]): Reads a partition, given its entry
+            in `manifest["partitions"]`, and optionally just some `columns`
+            and/or `rows` of it
+        memory_budget (int, optional): Bytes of partitions, and the indexes
+            built over them, to keep loaded. The most recently used partition
+            is kept even if it's bigger. Defaults to DEFAULT_MEMORY_BUDGET.
+    """
+
+    def __init__(
+        self,
+        manifest: Dict[str, Any],
+        read: Callable[..., pd.DataFrame],
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ):
+        self.version = manifest["version"]
+        self.memory_budget = memory_budget
+        self._partitions = {
+            int(partition[PARTITION_COLUMN]): partition
+            for partition in manifest["partitions"]
+        }
+        self.years: List[int] = sorted(self._partitions)
+        self._read = read
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Re-entrant as building an index can ask for its partition
+        self._lock = threading.RLock()
+        self._loaded: "OrderedDict[_PartitionKey, _LoadedPartition]" = OrderedDict()
+        self._bytes = 0
+        self._empty: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def from_artifact(
+        cls,
+        artifact_dir: str = ARTIFACT_DIR,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ) -> "PartitionedDataset":
+        """Partitions memory-mapped from the artifact
+
+        Args:
+            artifact_dir (str, optional): Artifact location. Defaults to ARTIFACT_DIR.
+            memory_budget (int, optional): Bytes of partitions to keep loaded.
+                Defaults to DEFAULT_MEMORY_BUDGET.
+
+        Returns:
+            PartitionedDataset: The dataset
+        """
+        manifest = read_manifest(artifact_dir)
+        return cls(
+            manifest,
+            lambda partition, columns=None, rows=None: read_partition(
+                artifact_dir, manifest, partition, columns, rows
+            ),
+            memory_budget,
+        )
+
+    @classmethod
+    def from_frame(
+        cls, analysis_df: pd.DataFrame, memory_budget: int = DEFAULT_MEMORY_BUDGET
+    ) -> "PartitionedDataset":
+        """Partitions split from a dataset that's already in memory
+
+        Args:
+            analysis_df (pd.DataFrame): Analysis dataset, with `attrs["version"]`
+            memory_budget (int, optional): Bytes of partitions to keep loaded.
+                Defaults to DEFAULT_MEMORY_BUDGET.
+
+        Returns:
+            PartitionedDataset: The dataset
+        """
+        years = analysis_df[PARTITION_COLUMN].to_numpy(dtype="float64", na_value=np.nan)
+        positions = {
+            int(year): np.flatnonzero(years == year)
+            for year in np.unique(years[~np.isnan(years)])
+        }
+
+        def read(partition, columns=None, rows=None):
+            partition_df = analysis_df.iloc[positions[partition[PARTITION_COLUMN]]]
+            if columns is not None:
+                partition_df = partition_df[
+                    [col for col in analysis_df.columns if col in columns]
+                ]
+            if rows is not None:
+                partition_df = partition_df.iloc[rows]
+            return partition_df.reset_index(drop=True)
+
+        partitions = []
+        for year, rows in positions.items():
+            partition_df = analysis_df.iloc[rows]
+            partitions.append(
+                {
+                    PARTITION_COLUMN: year,
+                    "rows": len(rows),
+                    "bytes": _nbytes(partition_df),
+                    "stats": column_stats(partition_df),
+                }
+            )
+        return cls(
+            {"version": analysis_df.attrs["version"], "partitions": partitions},
+            read,
+            memory_budget,
+        )
+
+    @property
+    def row_count(self) -> int:
+        return sum(partition["rows"] for partition in self._partitions.values())
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._empty_frame().columns)
+
+    def column_stats(self, year: int) -> Dict[str, Dict[str, Any]]:
+        """A partition's column stats, from the manifest
+
+        Args:
+            year (int): Results year
+
+        Returns:
+            Dict[str, Dict[str, Any]]: See `dataset_artifact.column_stats`.
+                Empty for a year without results.
+        """
+        partition = self._partitions.get(year)
+        return {} if partition is None else partition["stats"]
+
+    def _load(
+        self, year: int, columns: Optional[Tuple[str, ...]] = None
+    ) -> Optional[_LoadedPartition]:
+        key = (year, columns)
+        with self._lock:
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                self._loaded.move_to_end(key)
+                self.hits += 1
+                return loaded
+
+            partition = self._partitions.get(year)
+            if partition is None:
+                return None
+
+            self.misses += 1
+            frame = self._read(
+                partition, columns=None if columns is None else list(columns)
+            )
+            loaded = _LoadedPartition(frame, _nbytes(frame))
+            self._loaded[key] = loaded
+            self._bytes += loaded.nbytes
+            self._evict()
+            return loaded
+
+    def _evict(self):
+        # Least recently used first, always keeping the one just used
+        while self._bytes > self.memory_budget and len(self._loaded) > 1:
+            _, evicted = self._loaded.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _empty_frame(self) -> pd.DataFrame:
+        if not self.years:
+            return pd.DataFrame()
+        if self._empty is None:
+            # Copied so it doesn't keep the partition it came from alive
+            self._empty = self._read(self._partitions[self.years[0]]).iloc[:0].copy()
+        return self._empty
+
+    def partition(self, year: int) -> pd.DataFrame:
+        """Every row of a results year, in dataset order
+
+        Args:
+            year (int): Results year
+
+        Returns:
+            pd.DataFrame: The year's rows. Empty, with the dataset's columns, for
+                a year without results.
+        """
+        loaded = self._load(year)
+        return self._empty_frame() if loaded is None else loaded.frame
+
+    def index(
+        self,
+        year: int,
+        build: Callable[[pd.DataFrame], Any],
+        columns: Optional[List[str]] = None,
+    ) -> Any:
+        """An index over a year's partition, built the first time it's needed
+
+        The index lives as long as the partition stays loaded, and its frames
+        & arrays count towards the memory budget.
+
+        Args:
+            year (int): Results year
+            build (Callable[[pd.DataFrame], Any]): Builds the index from the
+                partition, eg `spatial.SpatialIndex`. Also identifies it.
+            columns (Optional[List[str]], optional): The only columns `build`
+                needs. The index is then built from, & kept with, just those
+                columns of the partition rather than all of it. Defaults to
+                None, for all of them.
+
+        Returns:
+            Any: The index, over the empty partition for a year without results
+        """
+        with self._lock:
+            loaded = self._load(year, None if columns is None else tuple(columns))
+            if loaded is None:
+                empty_df = self._empty_frame()
+                return build(empty_df if columns is None else empty_df[columns])
+            if build not in loaded.indexes:
+                index = loaded.indexes[build] = build(loaded.frame)
+                size = _nbytes(index)
+                loaded.nbytes += size
+                self._bytes += size
+                self._evict()
+            return loaded.indexes[build]
+
+    def rows(
+        self, school_ids: Iterable[int], columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Every row for the given schools, across every year
+
+        Each year's rows are found with its `SchoolRowIndex`, which is built
+        from just the year's School ID column & cached. Years that aren't
+        loaded then only have those rows read, without going through the
+        cache, so looking up a school doesn't push out the years in use.
+
+        Args:
+            school_ids (Iterable[int]): School IDs to look up. Unknown IDs are
+                ignored.
+            columns (Optional[List[str]], optional): Columns to read, besides
+                School ID & year. Defaults to None, for all of them.
+
+        Returns:
+            pd.DataFrame: The schools' rows, by school then year
+        """
+        school_ids = np.fromiter(school_ids, dtype="int64")
+        requested = columns
+        if columns is not None:
+            # School too, to put the schools back in dataset order
+            columns = ["School", "School ID", PARTITION_COLUMN, *columns]
+        if not self.years:
+            return self._empty_frame()
+
+        frames = []
+        for year in self.years:
+            positions = self.index(
+                year, SchoolRowIndex, columns=["School ID"]
+            ).positions(school_ids)
+
+            with self._lock:
+                loaded = self._loaded.get((year, None))
+            if loaded is None:
+                frames.append(self._read(self._partitions[year], columns, positions))
+                continue
+
+            partition_df = loaded.frame
+            if columns is not None:
+                partition_df = partition_df[
+                    [col for col in partition_df.columns if col in columns]
+                ]
+            frames.append(partition_df.iloc[positions])
+
+        rows_df = sort_by_school(_concat(frames))
+        if requested is not None and "School" not in requested:
+            rows_df = rows_df.drop(columns="School")
+        return rows_df
+
+    def frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """The whole dataset in one frame, by year then school
+
+        Partitions are read for this alone, without going through the cache,
+        and the frame is a copy. Use it to build indexes that span every year,
+        not to answer requests. It isn't sorted by school: each school's rows
+        are still in year order, which is all the indexes built from it need.
+
+        Args:
+            columns (Optional[List[str]], optional): Columns to read, besides
+                School ID & year. Defaults to None, for all of them.
+
+        Returns:
+            pd.DataFrame: Analysis dataset, with `attrs["version"]`
+        """
+        if columns is not None:
+            columns = ["School ID", PARTITION_COLUMN, *columns]
+        analysis_df = _concat(
+            [self._read(self._partitions[year], columns=columns) for year in self.years]
+        )
+        analysis_df.attrs["version"] = self.version
+        return analysis_df
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": [
+                    year if columns is None else f"{year} ({', '.join(columns)})"
+                    for year, columns in self._loaded
+                ],
+                "bytes": self._bytes,
+                "memory_budget": self.memory_budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def open_partitioned_dataset(
+    artifact_dir: str = ARTIFACT_DIR,
+    csv_path: str = CSV_PATH,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> PartitionedDataset:
+    """Open the analysis dataset, preferring the artifact over the CSV
+
+    Args:
+        artifact_dir (str, optional): Artifact location. Defaults to ARTIFACT_DIR.
+        csv_path (str, optional): Analysis dataset CSV. Defaults to CSV_PATH.
+        memory_budget (int, optional): Bytes of partitions to keep loaded.
+            Defaults to DEFAULT_MEMORY_BUDGET.
+
+    Returns:
+        PartitionedDataset: The dataset
+    """
+    if not artifact_is_stale(artifact_dir, csv_path):
+        try:
+            return PartitionedDataset.from_artifact(artifact_dir, memory_budget)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Unable to read {artifact_dir}, falling back to CSV: {e}")
+
+    return PartitionedDataset.from_frame(read_csv_dataset(csv_path), memory_budget)
+
+
+def partitioned_dataset_from_env() -> PartitionedDataset:
+    """Open the analysis dataset configured by environment variables
+
+    - DATASET_MEMORY_BUDGET_MB: Size cap of the loaded partitions in MB.
+      Defaults to 64.
+
+    Returns:
+        PartitionedDataset: The dataset
+    """
+    return open_partitioned_dataset(
+        memory_budget=int(
+            float(
+                os.getenv("DATASET_MEMORY_BUDGET_MB", DEFAULT_MEMORY_BUDGET / 2**20)
+            )
+            * 2**20
+        )
+    )
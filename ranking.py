@@ -0,0 +1,334 @@
+"""Pre-computed school rankings for the Top Schools tab.
+
+Only the statistic & year change what gets averaged and how schools are
+ordered, and both have small domains. So every (statistic, year) ranking,
+plus the all years ranking, is computed once, before it's asked for. Serving a
+request is then just masking by sector & enrolments and taking the head. The
+app ranks over all years when it starts & within a year when that year's
+partition is loaded (see `partitioned_dataset`).
+
+The composite ranking weights several statistics, and the weights can be
+anything, so it can't be ranked up front. Each statistic is normalised to a
+z-score within its results year & averaged per school once. A request is then
+a matrix-vector product of those scores with the weights, and `argpartition`
+picks out the top N without sorting every school.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from schema import widen
+
+ALL_YEARS = "All"
+COMPOSITE_SCORE = "Composite score"
+COMPOSITE_STATISTICS = [
+    "Median VCE study score",
+    "Percentage of study scores of 40 and over",
+    "Percentage of VCE students applying for tertiary places",
+    "Percentage of satisfactory VCE completions",
+    "ICSEA",
+]
+
+RankingKey = Tuple[str, Union[int, str]]
+
+
+def rank_schools(
+    analysis_df: pd.DataFrame, statistic: str, years: Iterable[int]
+) -> pd.DataFrame:
+    """Average a statistic (and enrolments) per school & sort, best first
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+        statistic (str): Column to rank by
+        years (Iterable[int]): Results years to average over
+
+    Returns:
+        pd.DataFrame: One row per school with School, School ID, School Sector,
+            School Type, `statistic` & Total Enrolments
+    """
+    # Group on the category codes but average the widened values so the means
+    # match what's displayed
+    year_df = analysis_df[analysis_df["year"].isin(list(years))]
+    return (
+        year_df.assign(
+            **{col: widen(year_df[col]) for col in [statistic, "Total Enrolments"]}
+        )
+        .groupby(
+            ["School", "School ID", "School Sector", "School Type"], observed=True
+        )[[statistic, "Total Enrolments"]]
+        .mean()
+        .reset_index()
+        .sort_values(ascending=False, by=statistic)
+        .reset_index(drop=True)
+    )
+
+
+class RankingCube:
+    """Every school ranking the Top Schools tab can ask for
+
+    The dataset isn't kept, so it can be released once the cube is built. Any
+    results year the cube wasn't built for ranks no schools.
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+        statistics (List[str]): Statistics schools can be ranked by
+        result_years (Optional[List[Union[int, str]]], optional): Results years
+            (or ALL_YEARS) to rank. Defaults to None, for ALL_YEARS & every
+            year in `analysis_df`.
+    """
+
+    def __init__(
+        self,
+        analysis_df: pd.DataFrame,
+        statistics: List[str],
+        result_years: Optional[List[Union[int, str]]] = None,
+    ):
+        self.statistics = statistics
+        self.years = sorted(analysis_df["year"].dropna().unique().tolist())
+        if result_years is None:
+            result_years = [ALL_YEARS] + self.years
+        # Copied so it doesn't keep the dataset alive
+        self._no_rows = analysis_df.iloc[:0].copy()
+
+        self._rankings: Dict[RankingKey, pd.DataFrame] = {}
+        for statistic in statistics:
+            for result_year in result_years:
+                years = self.years if result_year == ALL_YEARS else [result_year]
+                self._rankings[(statistic, result_year)] = rank_schools(
+                    analysis_df, statistic, years
+                )
+
+        # Enrolment filtering is skipped if there's no enrolment data at all
+        self._has_enrolments = {
+            key: ranked["Total Enrolments"].sum() != 0
+            for key, ranked in self._rankings.items()
+        }
+
+    def ranking(self, statistic: str, result_year: Union[int, str]) -> pd.DataFrame:
+        """Full ranking for a statistic & year (or ALL_YEARS)
+
+        Args:
+            statistic (str): Column schools are ranked by
+            result_year (Union[int, str]): Results year or ALL_YEARS
+
+        Returns:
+            pd.DataFrame: Ranked schools, best first
+
+        Raises:
+            KeyError: If the cube wasn't built for `statistic`
+        """
+        key = (statistic, result_year)
+        if statistic not in self.statistics:
+            raise KeyError(f"Schools aren't ranked by {statistic}")
+        if key not in self._rankings:
+            return rank_schools(self._no_rows, statistic, [])
+        return self._rankings[key]
+
+    def top_n(
+        self,
+        statistic: str,
+        result_year: Union[int, str],
+        school_sectors: List[str],
+        top_n: int,
+        min_enrolments: float,
+    ) -> pd.DataFrame:
+        """Best `top_n` schools in the given sectors with enough students
+
+        Args:
+            statistic (str): Column schools are ranked by
+            result_year (Union[int, str]): Results year or ALL_YEARS
+            school_sectors (List[str]): Sectors to include
+            top_n (int): Number of schools to return
+            min_enrolments (float): Minimum average enrolments
+
+        Returns:
+            pd.DataFrame: Top schools, best first
+        """
+        ranked = self.ranking(statistic, result_year)
+
+        keep = ranked["School Sector"].isin(school_sectors).to_numpy()
+        if self._has_enrolments.get((statistic, result_year), False):
+            keep &= (ranked["Total Enrolments"] >= min_enrolments).to_numpy()
+
+        return ranked.iloc[np.flatnonzero(keep)[:top_n]]
+
+
+def normalise_within_years(
+    analysis_df: pd.DataFrame, statistics: List[str]
+) -> np.ndarray:
+    """Z-score of each statistic within its results year
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+        statistics (List[str]): Columns to normalise
+
+    Returns:
+        np.ndarray: (rows, statistics) array, NaN where a value is missing.
+            0 for every school in a year where all their values are equal.
+    """
+    year_codes, years = pd.factorize(analysis_df["year"], use_na_sentinel=True)
+    normalised = np.full((len(analysis_df), len(statistics)), np.nan)
+
+    for i, statistic in enumerate(statistics):
+        values = widen(analysis_df[statistic]).to_numpy(
+            dtype="float64", na_value=np.nan
+        )
+        valid = ~np.isnan(values) & (year_codes >= 0)
+        codes, present = year_codes[valid], values[valid]
+
+        counts = np.bincount(codes, minlength=len(years))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.bincount(codes, present, minlength=len(years)) / counts
+            stds = np.sqrt(
+                np.bincount(codes, (present - means[codes]) ** 2, len(years)) / counts
+            )
+            normalised[valid, i] = np.where(
+                stds[codes] > 0, (present - means[codes]) / stds[codes], 0.0
+            )
+
+    return normalised
+
+
+def weighted_scores(normalised: np.ndarray, weights: Sequence[float]) -> np.ndarray:
+    """Weighted mean of each row's normalised statistics
+
+    Missing statistics are left out of a row's mean rather than counted as 0.
+
+    Args:
+        normalised (np.ndarray): (rows, statistics) scores
+        weights (Sequence[float]): One weight per statistic
+
+    Returns:
+        np.ndarray: Score per row, NaN where every weighted statistic is missing
+    """
+    weights = np.asarray(weights, dtype="float64")
+    present = ~np.isnan(normalised)
+    total = np.where(present, normalised, 0.0) @ weights
+    weight_sum = present @ weights
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(weight_sum > 0, total / weight_sum, np.nan)
+
+
+def top_n_positions(scores: np.ndarray, keep: np.ndarray, n: int) -> np.ndarray:
+    """Positions of the `n` highest kept scores, best first
+
+    A partition finds the `n`-th best score in linear time, so only the `n`
+    rows at or above it are sorted. Ties go to the earlier position.
+
+    Args:
+        scores (np.ndarray): Score per row. NaNs are never picked.
+        keep (np.ndarray): Boolean mask of rows that can be picked
+        n (int): Number of rows
+
+    Returns:
+        np.ndarray: Positions into `scores`
+    """
+    candidates = np.flatnonzero(keep & ~np.isnan(scores))
+    if n <= 0 or len(candidates) == 0:
+        return np.array([], dtype=int)
+
+    if n < len(candidates):
+        candidate_scores = scores[candidates]
+        # The n-th best score, then everything above it & the earliest ties
+        threshold = -np.partition(-candidate_scores, n - 1)[n - 1]
+        above = candidates[candidate_scores > threshold]
+        tied = candidates[candidate_scores == threshold][: n - len(above)]
+        candidates = np.sort(np.r_[above, tied])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class CompositeRanking:
+    """Schools ranked by a weighted mix of statistics
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+        statistics (List[str], optional): Statistics that can be weighted.
+            Defaults to COMPOSITE_STATISTICS.
+        result_years (Optional[List[Union[int, str]]], optional): Results years
+            (or ALL_YEARS) schools can be ranked within. Defaults to None, for
+            ALL_YEARS & every year in `analysis_df`.
+    """
+
+    def __init__(
+        self,
+        analysis_df: pd.DataFrame,
+        statistics: List[str] = COMPOSITE_STATISTICS,
+        result_years: Optional[List[Union[int, str]]] = None,
+    ):
+        self.statistics = statistics
+        self.years = sorted(analysis_df["year"].dropna().unique().tolist())
+        if result_years is None:
+            result_years = [ALL_YEARS] + self.years
+
+        keys = ["School", "School ID", "School Sector", "School Type"]
+        normalised = pd.DataFrame(
+            normalise_within_years(analysis_df, statistics),
+            columns=statistics,
+            index=analysis_df.index,
+        ).assign(
+            **{col: analysis_df[col] for col in keys},
+            year=analysis_df["year"],
+            **{"Total Enrolments": widen(analysis_df["Total Enrolments"])},
+        )
+
+        # Per school means of the normalised statistics, for each year & overall
+        self._schools: Dict[Union[int, str], pd.DataFrame] = {}
+        self._normalised: Dict[Union[int, str], np.ndarray] = {}
+        for result_year in result_years:
+            year_df = (
+                normalised
+                if result_year == ALL_YEARS
+                else normalised[(normalised["year"] == result_year).to_numpy(bool)]
+            )
+            by_school = (
+                year_df.groupby(keys, observed=True)[[*statistics, "Total Enrolments"]]
+                .mean()
+                .reset_index()
+            )
+            self._schools[result_year] = by_school[[*keys, "Total Enrolments"]]
+            self._normalised[result_year] = by_school[statistics].to_numpy()
+
+        self._no_schools = (
+            normalised.iloc[:0]
+            .groupby(keys, observed=True)[["Total Enrolments"]]
+            .mean()
+            .reset_index()
+        )
+
+    def top_n(
+        self,
+        weights: Sequence[float],
+        result_year: Union[int, str],
+        school_sectors: List[str],
+        top_n: int,
+        min_enrolments: Optional[float],
+    ) -> pd.DataFrame:
+        """Best `top_n` schools by weighted score in the given sectors
+
+        Args:
+            weights (Sequence[float]): Weight of each of `statistics`
+            result_year (Union[int, str]): Results year or ALL_YEARS
+            school_sectors (List[str]): Sectors to include
+            top_n (int): Number of schools to return
+            min_enrolments (Optional[float]): Minimum average enrolments
+
+        Returns:
+            pd.DataFrame: Top schools, best first, with their COMPOSITE_SCORE
+        """
+        if result_year not in self._schools:
+            return self._no_schools.assign(**{COMPOSITE_SCORE: []})
+
+        schools = self._schools[result_year]
+        # Rounded as displayed, so schools that look tied are ranked as tied
+        scores = np.round(weighted_scores(self._normalised[result_year], weights), 3)
+
+        keep = schools["School Sector"].isin(school_sectors).to_numpy()
+        enrolments = schools["Total Enrolments"].to_numpy()
+        # Enrolment filtering is skipped if there's no enrolment data at all
+        if np.nansum(enrolments) != 0:
+            keep &= enrolments >= (min_enrolments or 0)
+
+        positions = top_n_positions(scores, keep, top_n)
+        return schools.iloc[positions].assign(**{COMPOSITE_SCORE: scores[positions]})
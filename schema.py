@@ -0,0 +1,127 @@
+"""Column dtypes for the analysis dataset, shared by the data loader & the app.
+
+Text columns with only a few hundred distinct values are stored as
+categoricals, IDs/counts as nullable ints (the merges leave gaps so plain ints
+won't do, except for School ID which every row has) and the study statistics as
+float32. Latitude/Longitude stay as
+float64: float32 would shift schools by up to a couple of metres. The derived
+trend columns are listed here too, so they survive the round trip through the
+CSV.
+"""
+
+import numpy as np
+import pandas as pd
+
+DTYPES = {
+    "School ID": "int32",
+    "School": "category",
+    "ACARA SML ID": "Int32",
+    "year": "Int16",
+    "Locality": "category",
+    "Median VCE study score": "float32",
+    "Percentage of study scores of 40 and over": "float32",
+    "Percentage of VCE students applying for tertiary places": "float32",
+    "Percentage of satisfactory VCE completions": "float32",
+    "ICSEA": "Int16",
+    "School Sector": "category",
+    "School Type": "category",
+    "Total Enrolments": "Int32",
+    "Teaching Staff": "float32",
+    "Latitude": "float64",
+    "Longitude": "float64",
+}
+
+# Statistics `trends.add_trend_metrics` derives a year-on-year change, a rank &
+# a percentile for, within each results year
+TREND_STATISTICS = [
+    "Median VCE study score",
+    "Percentage of study scores of 40 and over",
+    "Percentage of VCE students applying for tertiary places",
+    "Percentage of satisfactory VCE completions",
+]
+TREND_DTYPES = {"change": "float32", "rank": "Int32", "percentile": "float32"}
+
+
+def trend_column(statistic: str, metric: str) -> str:
+    """Name of a derived trend column, eg "Median VCE study score change"
+
+    Args:
+        statistic (str): One of TREND_STATISTICS
+        metric (str): One of TREND_DTYPES
+
+    Returns:
+        str: Column name
+    """
+    return f"{statistic} {metric}"
+
+
+DTYPES.update(
+    {
+        trend_column(statistic, metric): dtype
+        for statistic in TREND_STATISTICS
+        for metric, dtype in TREND_DTYPES.items()
+    }
+)
+
+# float32 can't hold these exactly, so they're rounded back to the number of
+# decimals published by VCAA/ACARA when widened for display
+DECIMALS = {
+    "Median VCE study score": 1,
+    "Percentage of study scores of 40 and over": 1,
+    "Percentage of VCE students applying for tertiary places": 1,
+    "Percentage of satisfactory VCE completions": 1,
+    "Teaching Staff": 1,
+}
+DECIMALS.update(
+    {trend_column(statistic, "change"): 1 for statistic in TREND_STATISTICS}
+)
+DECIMALS.update(
+    {trend_column(statistic, "percentile"): 1 for statistic in TREND_STATISTICS}
+)
+
+
+def apply_schema(analysis_df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the analysis dataset to its compact dtypes
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+
+    Returns:
+        pd.DataFrame: Analysis dataset with DTYPES applied to known columns
+    """
+    dtypes = {col: dtype for col, dtype in DTYPES.items() if col in analysis_df}
+    return analysis_df.astype(dtypes)
+
+
+def widen(values: pd.Series) -> pd.Series:
+    """Convert a compact column back to a plain numpy/object dtype
+
+    Plotly express doesn't cope with unused categories or pd.NA, and float32
+    values serialise as eg 7.099999904632568, so anything that's displayed (or
+    averaged for display) is widened first.
+
+    Args:
+        values (pd.Series): Column of the analysis dataset
+
+    Returns:
+        pd.Series: Column as object, int64 or float64
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(object)
+    if pd.api.types.is_extension_array_dtype(values.dtype):
+        return values.astype("int64" if not values.hasnans else "float64")
+    if values.dtype == np.float32:
+        return values.astype("float64").round(DECIMALS.get(values.name, 6))
+    return values
+
+
+def to_plot_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Widen a (small) slice of the analysis dataset for plotting
+
+    Args:
+        df (pd.DataFrame): Slice of the analysis dataset
+
+    Returns:
+        pd.DataFrame: Copy of `df` with every column widened
+    """
+    return pd.DataFrame({col: widen(df[col]) for col in df.columns}, index=df.index)
@@ -0,0 +1,85 @@
+"""Row-range index over the analysis dataset, keyed by School ID.
+
+`create_analysis_dataset` sorts the dataset by school then year, so each
+school's history is a contiguous, already ordered block of rows, and so is
+each school's row in a year's partition. Looking up a school is then a dict
+lookup & a slice rather than a scan of the whole frame. A school's history
+read back from the year partitions is put back in that order.
+"""
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+def sort_by_school(analysis_df: pd.DataFrame) -> pd.DataFrame:
+    """Ensure every school's rows are contiguous & in year order
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+
+    Returns:
+        pd.DataFrame: `analysis_df` itself if already sorted, else a sorted copy
+    """
+    school_codes = pd.factorize(analysis_df["School ID"])[0]
+    block_starts = np.flatnonzero(np.diff(school_codes)) + 1
+    contiguous = len(block_starts) + 1 == len(np.unique(school_codes))
+
+    years = analysis_df["year"].to_numpy(dtype="float64", na_value=np.nan)
+    year_steps = np.diff(years)
+    year_steps[block_starts - 1] = 0
+    in_year_order = not (year_steps < 0).any()
+
+    if contiguous and in_year_order:
+        return analysis_df
+
+    return analysis_df.sort_values(
+        by=["School", "School ID", "year"], ascending=True, kind="stable"
+    ).reset_index(drop=True)
+
+
+class SchoolRowIndex:
+    """School ID -> (start, stop) row positions in the analysis dataset
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset, or a partition of it,
+            sorted by `sort_by_school`
+    """
+
+    def __init__(self, analysis_df: pd.DataFrame):
+        school_ids = analysis_df["School ID"].to_numpy(dtype="int64")
+        starts = np.r_[0, np.flatnonzero(school_ids[1:] != school_ids[:-1]) + 1]
+        if len(school_ids) == 0:
+            starts = starts[:0]
+        stops = np.r_[starts[1:], len(school_ids)]
+
+        # Sorted by School ID, so a lookup is a binary search
+        order = np.argsort(school_ids[starts], kind="stable")
+        self._school_ids = school_ids[starts][order]
+        self._starts = starts[order]
+        self._stops = stops[order]
+
+    def positions(self, school_ids: Iterable[int]) -> np.ndarray:
+        """Row positions of the given schools
+
+        Args:
+            school_ids (Iterable[int]): School IDs to look up. Unknown IDs are
+                ignored.
+
+        Returns:
+            np.ndarray: The schools' row positions, in dataset order
+        """
+        school_ids = np.unique(np.fromiter(school_ids, dtype="int64"))
+        found = np.searchsorted(self._school_ids, school_ids)
+        known = found < len(self._school_ids)
+        found = found[known][self._school_ids[found[known]] == school_ids[known]]
+
+        found = found[np.argsort(self._starts[found])]
+        return np.concatenate(
+            [
+                np.arange(start, stop)
+                for start, stop in zip(self._starts[found], self._stops[found])
+            ]
+            or [np.array([], dtype="int64")]
+        )
@@ -0,0 +1,262 @@
+"""Proposes VCAA -> ACARA school name matches for the joining table.
+
+`raw_data/school_name_joining_keys.csv` maps the name VCAA publishes results
+under to the school's ACARA name & ID. Comparing every VCAA name against every
+ACARA name with difflib is far too slow to redo each year, so this builds a
+character trigram inverted index over the ACARA names. Each VCAA name is then
+only compared (with difflib's ratio) against the handful of ACARA names that
+share the most trigrams with it, optionally restricted to schools in the same
+suburb & year.
+
+To propose joining keys for every VCAA name that isn't mapped yet run:
+
+    poetry run python school_name_matcher.py
+"""
+
+import argparse
+import difflib
+import re
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+JOINING_TABLE_PATH = "raw_data/school_name_joining_keys.csv"
+# Not under raw_data/, whose files decide whether the dataset artifact is stale
+PROPOSED_JOINING_KEYS_PATH = "school_name_joining_keys_proposed.csv"
+
+
+def normalise_name(name: str) -> str:
+    """Lower case a school name & collapse punctuation/whitespace
+
+    Args:
+        name (str): School name
+
+    Returns:
+        str: Normalised name
+    """
+    return re.sub(r"[^a-z0-9]+", " ", str(name).lower()).strip()
+
+
+def trigrams(name: str) -> set:
+    """Character trigrams of a normalised name, padded so word starts count
+
+    Args:
+        name (str): Normalised school name
+
+    Returns:
+        set: Distinct trigrams
+    """
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from character trigram to the names containing it
+
+    Args:
+        names (Sequence[str]): Names to index. Results refer to their positions.
+    """
+
+    def __init__(self, names: Sequence[str]):
+        self.names = list(names)
+        self._normalised = [normalise_name(name) for name in self.names]
+
+        postings = defaultdict(list)
+        n_trigrams = np.zeros(len(self.names), dtype=np.int32)
+        for i, name in enumerate(self._normalised):
+            name_trigrams = trigrams(name)
+            n_trigrams[i] = len(name_trigrams)
+            for trigram in name_trigrams:
+                postings[trigram].append(i)
+
+        self._postings = {
+            trigram: np.array(ids, dtype=np.int32) for trigram, ids in postings.items()
+        }
+        self._n_trigrams = n_trigrams
+
+    def search(
+        self,
+        name: str,
+        candidates: Optional[np.ndarray] = None,
+        limit: int = 1,
+        prune_to: int = 10,
+        cutoff: float = 0.6,
+    ) -> List[Tuple[int, float]]:
+        """Find the indexed names closest to `name`
+
+        Names are first ranked by the Dice coefficient of their trigram sets,
+        which only touches names sharing at least one trigram. The best
+        `prune_to` of those are then scored with difflib's ratio, the same
+        measure `difflib.get_close_matches` uses.
+
+        Args:
+            name (str): Name to match
+            candidates (Optional[np.ndarray], optional): Restrict matches to
+                these positions, eg schools in the same suburb. Defaults to None.
+            limit (int, optional): Maximum number of matches. Defaults to 1.
+            prune_to (int, optional): Number of names to rescore. Defaults to 10.
+            cutoff (float, optional): Minimum ratio to accept. Defaults to 0.6.
+
+        Returns:
+            List[Tuple[int, float]]: (position, score) pairs, best first
+        """
+        normalised = normalise_name(name)
+        query_trigrams = trigrams(normalised)
+        hits = [self._postings[t] for t in query_trigrams if t in self._postings]
+        if not hits:
+            return []
+
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        if candidates is not None:
+            allowed = np.zeros(len(self.names), dtype=bool)
+            allowed[candidates] = True
+            shared[~allowed] = 0
+
+        matched = np.flatnonzero(shared)
+        if len(matched) == 0:
+            return []
+
+        dice = 2 * shared[matched] / (len(query_trigrams) + self._n_trigrams[matched])
+        if len(matched) > prune_to:
+            matched = matched[np.argpartition(-dice, prune_to)[:prune_to]]
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(normalised)
+        scored = []
+        for i in matched:
+            matcher.set_seq1(self._normalised[i])
+            if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+                continue
+            score = matcher.ratio()
+            if score >= cutoff:
+                scored.append((int(i), score))
+
+        return sorted(scored, key=lambda match: -match[1])[:limit]
+
+
+def _blocks(keys: Iterable[Hashable]) -> Dict[Hashable, np.ndarray]:
+    blocks = defaultdict(list)
+    for i, key in enumerate(keys):
+        blocks[key].append(i)
+    return {key: np.array(ids, dtype=np.int32) for key, ids in blocks.items()}
+
+
+def propose_joining_keys(
+    results_df: pd.DataFrame,
+    school_profile_df: pd.DataFrame,
+    joining_table: pd.DataFrame,
+    block_by_locality: bool = True,
+    cutoff: float = 0.6,
+) -> pd.DataFrame:
+    """Propose joining table rows for VCAA school names that aren't mapped yet
+
+    With `block_by_locality`, a name is first matched against ACARA schools in
+    the same suburb & year, then the same suburb in any year, and only then
+    against every school.
+
+    Args:
+        results_df (pd.DataFrame): VCAA results, as from `data_loader.get_results`
+        school_profile_df (pd.DataFrame): ACARA profiles, as from
+            `data_loader.get_vic_school_profiles`
+        joining_table (pd.DataFrame): Current joining table
+        block_by_locality (bool, optional): Prefer schools in the same
+            suburb. Defaults to True.
+        cutoff (float, optional): Minimum match score. Defaults to 0.6.
+
+    Returns:
+        pd.DataFrame: Joining table rows plus a `score` column. Unmatched
+            names have no ACARA name/ID & a score of 0.
+    """
+    unmapped = (
+        results_df[~results_df["School"].isin(joining_table["vce_school_name"])]
+        .dropna(subset=["School"])
+        .sort_values("year")
+        .drop_duplicates(subset=["School"], keep="last")
+    )
+
+    acara_schools = school_profile_df[
+        ["School Name", "ACARA SML ID", "Suburb", "Calendar Year"]
+    ].dropna(subset=["School Name"])
+    candidates = acara_schools[["School Name", "ACARA SML ID"]].drop_duplicates()
+    candidates = candidates.reset_index(drop=True)
+    index = TrigramIndex(candidates["School Name"].tolist())
+
+    candidate_ids = pd.MultiIndex.from_frame(candidates).get_indexer(
+        pd.MultiIndex.from_frame(acara_schools[["School Name", "ACARA SML ID"]])
+    )
+    suburbs = acara_schools["Suburb"].map(normalise_name).tolist()
+    years = acara_schools["Calendar Year"].tolist()
+    by_suburb_year = {
+        key: np.unique(candidate_ids[rows])
+        for key, rows in _blocks(zip(suburbs, years)).items()
+    }
+    by_suburb = {
+        key: np.unique(candidate_ids[rows]) for key, rows in _blocks(suburbs).items()
+    }
+
+    proposals = []
+    for school, locality, year in zip(
+        unmapped["School"], unmapped["Locality"], unmapped["year"]
+    ):
+        blocks = [None]
+        if block_by_locality:
+            locality = normalise_name(locality)
+            blocks = [
+                block
+                for block in [
+                    by_suburb_year.get((locality, year)),
+                    by_suburb.get(locality),
+                ]
+                if block is not None
+            ] + [None]
+
+        for block in blocks:
+            match = index.search(school, candidates=block, cutoff=cutoff)
+            if match:
+                break
+
+        if match:
+            position, score = match[0]
+            acara_name, acara_id = candidates.iloc[position]
+        else:
+            acara_name, acara_id, score = None, None, 0.0
+
+        proposals.append(
+            {
+                "vce_school_name": school,
+                "acara_school_name": acara_name,
+                "ACARA SML ID": acara_id,
+                "score": round(score, 3),
+            }
+        )
+
+    return pd.DataFrame(
+        proposals,
+        columns=["vce_school_name", "acara_school_name", "ACARA SML ID", "score"],
+    )
+
+
+if __name__ == "__main__":
+    from data_loader import get_results, get_vic_school_profiles
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=PROPOSED_JOINING_KEYS_PATH)
+    parser.add_argument("--cutoff", type=float, default=0.6)
+    parser.add_argument(
+        "--no-blocking",
+        action="store_true",
+        help="Match against every ACARA school rather than preferring the same suburb",
+    )
+    args = parser.parse_args()
+
+    proposed = propose_joining_keys(
+        get_results(),
+        get_vic_school_profiles(),
+        pd.read_csv(JOINING_TABLE_PATH),
+        block_by_locality=not args.no_blocking,
+        cutoff=args.cutoff,
+    )
+    proposed.to_csv(args.output, index=False)
+    print(f"Wrote {len(proposed)} proposed joining keys to {args.output}")
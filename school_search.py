@@ -0,0 +1,154 @@
+"""Search over school names & localities for the school selection dropdown.
+
+Sending every school to the browser with the layout makes the first page load
+grow with the number of schools, so the dropdown starts empty and asks the
+server for matches as the user types (its `search_value`).
+
+Every word of a school's normalised name & locality goes into one sorted
+array, so the schools with a word starting with the typed text are a single
+binary search away. A query matches the schools that have a word starting with
+each of its words. Schools whose name starts with the query come first, then
+those matched on their name alone, then the rest, alphabetically within each.
+If that doesn't fill the results, names sharing the most character trigrams
+(see `school_name_matcher.TrigramIndex`) fill in the rest, which catches typos.
+"""
+
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from school_name_matcher import TrigramIndex, normalise_name
+
+DEFAULT_LIMIT = 20
+# Lowest difflib ratio a fuzzy match needs
+FUZZY_CUTOFF = 0.5
+
+# Where a school's matching word came from
+NAME, LOCALITY = 0, 1
+
+
+class SchoolSearch:
+    """Prefix & trigram index over the analysis dataset's schools
+
+    Each school is indexed under its most recent name & locality.
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+    """
+
+    def __init__(self, analysis_df: pd.DataFrame):
+        schools = (
+            analysis_df[["School ID", "School", "Locality", "year"]]
+            .sort_values("year", kind="stable")
+            .drop_duplicates("School ID", keep="last")
+            .sort_values("School", kind="stable")
+        )
+        self.ids = schools["School ID"].to_numpy(dtype="int64")
+        self.names = schools["School"].astype(str).tolist()
+        self.localities = schools["Locality"].astype(object).fillna("").tolist()
+        self._positions = {int(id_): i for i, id_ in enumerate(self.ids)}
+        self._normalised = [normalise_name(name) for name in self.names]
+
+        words, owners, fields = [], [], []
+        for i, (name, locality) in enumerate(zip(self._normalised, self.localities)):
+            for field, text in ((NAME, name), (LOCALITY, normalise_name(locality))):
+                for word in set(text.split()):
+                    words.append(word)
+                    owners.append(i)
+                    fields.append(field)
+
+        order = np.argsort(np.array(words, dtype=str), kind="stable")
+        self._words = np.array(words, dtype=str)[order]
+        self._owners = np.array(owners, dtype=np.int32)[order]
+        self._fields = np.array(fields, dtype=np.int8)[order]
+
+        self._trigrams = TrigramIndex(self.names)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, school_id: int) -> bool:
+        return school_id in self._positions
+
+    def _prefix_matches(self, word: str) -> slice:
+        lo = np.searchsorted(self._words, word, side="left")
+        hi = np.searchsorted(self._words, word + "\uffff", side="left")
+        return slice(lo, hi)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[int]:
+        """Schools matching what's been typed, best first
+
+        Args:
+            query (str): Typed text
+            limit (int, optional): Maximum number of schools. Defaults to
+                DEFAULT_LIMIT.
+
+        Returns:
+            List[int]: School IDs
+        """
+        normalised = normalise_name(query)
+        words = normalised.split()
+        if not words or limit <= 0:
+            return []
+
+        matched = np.ones(len(self), dtype=bool)
+        by_name = np.ones(len(self), dtype=bool)
+        for word in words:
+            found = self._prefix_matches(word)
+            word_matched = np.zeros(len(self), dtype=bool)
+            word_matched[self._owners[found]] = True
+            word_by_name = np.zeros(len(self), dtype=bool)
+            word_by_name[self._owners[found][self._fields[found] == NAME]] = True
+            matched &= word_matched
+            by_name &= word_by_name
+
+        # Already in name order, so a stable sort on the tier is enough
+        positions = np.flatnonzero(matched)
+        starts_with = np.array(
+            [self._normalised[i].startswith(normalised) for i in positions], dtype=bool
+        )
+        tiers = np.where(starts_with, 0, np.where(by_name[positions], 1, 2))
+        results = positions[np.argsort(tiers, kind="stable")][:limit].tolist()
+
+        if len(results) < limit:
+            seen = set(results)
+            fuzzy = self._trigrams.search(
+                query, limit=limit, prune_to=2 * limit, cutoff=FUZZY_CUTOFF
+            )
+            results += [i for i, _ in fuzzy if i not in seen][: limit - len(results)]
+
+        return [int(self.ids[i]) for i in results]
+
+    def options(
+        self, school_ids: Iterable[int], query: str = ""
+    ) -> List[Dict[str, Any]]:
+        """Dropdown options for schools
+
+        The dropdown also filters its options against what's been typed, by
+        label & `search`. Each option's `search` holds the school's locality &
+        the query as well as its name, so the dropdown doesn't hide schools
+        the server matched on their locality or despite a typo.
+
+        Args:
+            school_ids (Iterable[int]): Schools, in display order. Unknown IDs
+                are ignored.
+            query (str, optional): The typed text the schools matched.
+                Defaults to "".
+
+        Returns:
+            List[Dict[str, Any]]: Options labelled by name & valued by School ID
+        """
+        options = []
+        for school_id in school_ids:
+            i = self._positions.get(school_id)
+            if i is None:
+                continue
+            options.append(
+                {
+                    "label": self.names[i],
+                    "value": int(self.ids[i]),
+                    "search": f"{self.names[i]} {self.localities[i]} {query}".strip(),
+                }
+            )
+        return options
@@ -0,0 +1,243 @@
+"""Pre-rendered figures for every common input combination.
+
+The Top Schools and Schools Map tabs have a bounded set of common input
+combinations (see `app.snapshot_inputs`): with 11 results years that's about
+21,100 Top Schools figures (every statistic, year, sector combination, Top N
+mark & enrolment preset) plus about 560 maps (the initial view of every
+statistic, year & sector combination), roughly 130MB. So after the dataset is
+rebuilt every one of their figures can be rendered ahead of time:
+
+    poetry run python snapshots.py --out snapshots
+
+Figures are written across a process pool to `<out>/<dataset version>/`, one
+JSON file per figure, named by the same normalised-input hash the figure cache
+uses. With `SNAPSHOT_DIR` set, the app serves the directory matching its
+dataset version straight from disk, so peak traffic costs file reads rather
+than figure builds. Inputs outside the exported combinations (an unusual
+enrolment minimum, a zoomed map) are built live as usual.
+
+Snapshots depend on the code that draws the figures as well as the data, so
+re-export after changing either.
+"""
+
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Collection, Dict, Optional, Tuple
+
+from figure_cache import normalise_inputs
+
+DEFAULT_SNAPSHOT_DIR = "snapshots"
+EXPORT_CHUNK_SIZE = 64
+
+
+def snapshot_key(name: str, args, unordered: Collection[int] = ()) -> str:
+    """File name (relative to a version's directory) of a figure
+
+    Args:
+        name (str): Callback name
+        args: Figure builder inputs
+        unordered (Collection[int], optional): Positions of its multi-select
+            inputs. Defaults to none.
+
+    Returns:
+        str: Relative path
+    """
+    raw = json.dumps([name, normalise_inputs(args, unordered)], default=str)
+    return os.path.join(name, f"{hashlib.sha256(raw.encode()).hexdigest()}.json")
+
+
+class SnapshotStore:
+    """Read only, versioned directory of pre-rendered figures
+
+    Args:
+        root (Optional[str]): Directory holding one subdirectory per dataset
+            version. None to never serve snapshots.
+    """
+
+    def __init__(self, root: Optional[str]):
+        self.root = root
+        self.directory = None
+        # Positions of each figure's multi-select inputs, from `serve`
+        self.unordered: Dict[str, Tuple[int, ...]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    def set_version(self, version: str):
+        """Serve the snapshots exported for a dataset version, if there are any
+
+        Args:
+            version (str): Dataset version
+        """
+        if not self.enabled:
+            return
+
+        directory = os.path.join(self.root, version)
+        if os.path.isdir(directory):
+            self.directory = directory
+        else:
+            self.directory = None
+            print(f"No snapshots in {directory}, figures will be built live")
+
+    def get(self, name: str, args) -> Optional[Dict[str, Any]]:
+        if self.directory is None:
+            return None
+
+        try:
+            key = snapshot_key(name, args, self.unordered.get(name, ()))
+            with open(os.path.join(self.directory, key)) as f:
+                figure = json.load(f)
+        except FileNotFoundError:
+            figure = None
+
+        with self._lock:
+            if figure is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return figure
+
+    def stats(self) -> Dict[str, Any]:
+        return {"directory": self.directory, "hits": self.hits, "misses": self.misses}
+
+    def serve(self, name: str, unordered: Collection[int] = ()) -> Callable:
+        """Decorator returning a figure builder's snapshot when there is one
+
+        Args:
+            name (str): Unique name for the callback, as used by the export
+            unordered (Collection[int], optional): Positions of its multi-select
+                inputs, whose order doesn't matter. Defaults to none.
+
+        Returns:
+            Callable: Decorator
+        """
+        self.unordered[name] = tuple(unordered)
+
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                figure = self.get(name, args)
+                if figure is None:
+                    return func(*args)
+                return figure
+
+            return wrapper
+
+        return decorator
+
+
+def snapshot_store_from_env() -> SnapshotStore:
+    """Build the snapshot store configured by environment variables
+
+    - SNAPSHOT_DIR: Directory `snapshots.py` exported to. Unset to build
+      every figure live.
+
+    Returns:
+        SnapshotStore: The store
+    """
+    return SnapshotStore(os.getenv("SNAPSHOT_DIR"))
+
+
+def _init_worker():
+    import app
+
+    app.configure_figures()
+    app.get_app_data()
+
+
+def _render(directory: str, name: str, args: Tuple) -> int:
+    import plotly.io as pio
+
+    import app
+
+    # The undecorated builder, so neither the figure cache nor old snapshots
+    # are used
+    figure = inspect.unwrap(app.SNAPSHOT_FIGURES[name])(*args)
+    payload = pio.to_json(figure, validate=False).encode()
+
+    key = snapshot_key(name, args, app.snapshot_store.unordered.get(name, ()))
+    path = os.path.join(directory, key)
+    with open(path, "wb") as f:
+        f.write(payload)
+    return len(payload)
+
+
+def export_snapshots(out_dir: str = DEFAULT_SNAPSHOT_DIR, jobs: int = 1) -> str:
+    """Render every figure in `app.snapshot_inputs` for the current dataset
+
+    The figures are written to a temporary directory that replaces
+    `<out_dir>/<version>` once they're all done, so a running app never sees
+    a partial export.
+
+    Args:
+        out_dir (str, optional): Snapshot root. Defaults to DEFAULT_SNAPSHOT_DIR.
+        jobs (int, optional): Number of worker processes. Defaults to 1.
+
+    Returns:
+        str: Directory the snapshots were written to
+    """
+    # app imports this module
+    import app
+
+    _init_worker()
+    version = app.get_app_data().dataset.version
+    tasks = list(app.snapshot_inputs())
+
+    directory = os.path.join(out_dir, version)
+    tmp_directory = os.path.join(out_dir, f".{version}.{os.getpid()}.tmp")
+    for name in {name for name, _ in tasks}:
+        os.makedirs(os.path.join(tmp_directory, name), exist_ok=True)
+
+    print(f"Rendering {len(tasks)} figures for dataset version {version}")
+    start = time.perf_counter()
+    render = functools.partial(_render, tmp_directory)
+    names, args = zip(*tasks)
+    if jobs <= 1:
+        sizes = list(map(render, names, args))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            sizes = list(pool.map(render, names, args, chunksize=EXPORT_CHUNK_SIZE))
+
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_directory, directory)
+
+    print(
+        f"Wrote {len(sizes)} figures ({sum(sizes) / 2**20:.1f}MB) to {directory} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return directory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render the app's figures")
+    parser.add_argument(
+        "--out",
+        default=DEFAULT_SNAPSHOT_DIR,
+        help="Directory to export to. Point SNAPSHOT_DIR at it to serve them.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes. Defaults to one per CPU.",
+    )
+    args = parser.parse_args()
+
+    export_snapshots(args.out, args.jobs)
@@ -0,0 +1,514 @@
+"""Spatial index over school locations for the Schools Map.
+
+Locations are projected to Web Mercator (the map's own projection) and given a
+quadtree key: the interleaved bits of their cell at `MAX_LEVEL`. Rows are kept
+sorted by that key, so every cell at a coarser level is a contiguous run of
+rows. Clustering at a zoom level is then a shift of the keys & a `reduceat`,
+and the work (and payload) is bounded by what's in the viewport.
+
+"Schools near me" uses a KD-tree per results year instead, over the schools'
+positions on the unit sphere, answering nearest-k & radius queries in
+logarithmic time.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAX_LEVEL = 24
+# Mapbox GL renders the world as a 512px square at zoom 0
+TILE_SIZE = 512
+# Clusters are cells 2^CLUSTER_LEVEL_OFFSET times smaller than a tile, ~32px
+CLUSTER_LEVEL_OFFSET = 4
+MAX_LATITUDE = 85.0511287798
+
+
+def project(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitude/longitude to Web Mercator, scaled to [0, 1)
+
+    Args:
+        lat (np.ndarray): Latitudes
+        lon (np.ndarray): Longitudes
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: x (west to east) & y (north to south)
+    """
+    lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (np.asarray(lon) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return np.clip(x, 0.0, np.nextafter(1.0, 0)), np.clip(y, 0.0, np.nextafter(1.0, 0))
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    v = v.astype(np.uint64)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def quadkeys(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Quadtree (Morton) keys of projected points at MAX_LEVEL"""
+    cells = 1 << MAX_LEVEL
+    return _spread_bits(np.floor(x * cells)) | (
+        _spread_bits(np.floor(y * cells)) << np.uint64(1)
+    )
+
+
+@dataclass(frozen=True)
+class Viewport:
+    """Map bounds, snapped outwards to whole cells at `level`
+
+    `x0`..`x1` & `y0`..`y1` are inclusive cell ranges, so equal viewports
+    (and the figures built for them) can be cached.
+    """
+
+    zoom: int
+    level: int
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        cells = 1 << self.level
+        return (
+            self.x0 / cells,
+            self.y0 / cells,
+            (self.x1 + 1) / cells,
+            (self.y1 + 1) / cells,
+        )
+
+
+def viewport_from_relayout(
+    relayout_data: Optional[Dict[str, Any]],
+    center: Dict[str, float],
+    zoom: float,
+    width: int,
+    height: int,
+) -> Viewport:
+    """Work out what the map is showing from its `relayoutData`
+
+    Mapbox reports its corners under "mapbox._derived" after every pan or
+    zoom. Before the first one (or if they're missing) the bounds are estimated
+    from the centre, zoom & map size.
+
+    Args:
+        relayout_data (Optional[Dict[str, Any]]): The map's relayoutData
+        center (Dict[str, float]): Initial centre, with "lat" & "lon"
+        zoom (float): Initial zoom
+        width (int): Assumed map width in pixels
+        height (int): Map height in pixels
+
+    Returns:
+        Viewport: Snapped viewport
+    """
+    relayout_data = relayout_data or {}
+    zoom = relayout_data.get("mapbox.zoom", zoom)
+    center = relayout_data.get("mapbox.center", center)
+    corners = relayout_data.get("mapbox._derived", {}).get("coordinates")
+
+    if corners:
+        lon, lat = np.array(corners, dtype=float).T
+        x, y = project(lat, lon)
+    else:
+        cx, cy = project(np.array([center["lat"]]), np.array([center["lon"]]))
+        world_size = TILE_SIZE * 2.0**zoom
+        half_width, half_height = width / world_size / 2, height / world_size / 2
+        x = np.array([cx[0] - half_width, cx[0] + half_width])
+        y = np.array([cy[0] - half_height, cy[0] + half_height])
+
+    zoom_level = max(int(np.floor(zoom)), 0)
+    level = min(zoom_level + CLUSTER_LEVEL_OFFSET, MAX_LEVEL)
+    x0, x1, y0, y1 = np.clip(
+        np.floor(np.array([x.min(), x.max(), y.min(), y.max()]) * (1 << level)),
+        0,
+        (1 << level) - 1,
+    ).astype(int)
+    return Viewport(
+        zoom=zoom_level, level=level, x0=int(x0), y0=int(y0), x1=int(x1), y1=int(y1)
+    )
+
+
+class SpatialIndex:
+    """Quadtree-ordered index of every located row in the analysis dataset
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+    """
+
+    def __init__(self, analysis_df: pd.DataFrame):
+        lat = analysis_df["Latitude"].to_numpy(dtype="float64", na_value=np.nan)
+        lon = analysis_df["Longitude"].to_numpy(dtype="float64", na_value=np.nan)
+        located = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+
+        x, y = project(lat[located], lon[located])
+        keys = quadkeys(x, y)
+        order = np.argsort(keys, kind="stable")
+
+        self._positions = located[order]
+        self._keys = keys[order]
+        self._x = x[order]
+        self._y = y[order]
+        self._lat = lat[located][order]
+        self._lon = lon[located][order]
+
+    def query(self, viewport: Viewport, keep: np.ndarray) -> np.ndarray:
+        """Indexes (into the sorted index) of kept rows inside the viewport
+
+        Args:
+            viewport (Viewport): Map viewport
+            keep (np.ndarray): Boolean mask over the analysis dataset's rows
+
+        Returns:
+            np.ndarray: Matches, in quadtree order
+        """
+        west, north, east, south = viewport.bounds()
+        inside = (
+            keep[self._positions]
+            & (self._x >= west)
+            & (self._x < east)
+            & (self._y >= north)
+            & (self._y < south)
+        )
+        return np.flatnonzero(inside)
+
+    def within_bounds(
+        self, west: float, south: float, east: float, north: float, keep: np.ndarray
+    ) -> np.ndarray:
+        """Indexes (into the sorted index) of kept rows inside a lat/lon box
+
+        Unlike `query` the box isn't snapped to cells, so only schools inside
+        it (edges included) match.
+
+        Args:
+            west (float): Smallest longitude
+            south (float): Smallest latitude
+            east (float): Largest longitude
+            north (float): Largest latitude
+            keep (np.ndarray): Boolean mask over the analysis dataset's rows
+
+        Returns:
+            np.ndarray: Matches, in quadtree order
+        """
+        inside = (
+            keep[self._positions]
+            & (self._lon >= west)
+            & (self._lon <= east)
+            & (self._lat >= south)
+            & (self._lat <= north)
+        )
+        return np.flatnonzero(inside)
+
+    def rows(self, matches: np.ndarray) -> np.ndarray:
+        """Analysis dataset row positions of `query` matches, in dataset order"""
+        return np.sort(self._positions[matches])
+
+    def clusters(
+        self, matches: np.ndarray, values: np.ndarray, level: int, value_name: str
+    ) -> pd.DataFrame:
+        """Group `query` matches into the quadtree cells at `level`
+
+        Args:
+            matches (np.ndarray): Result of `query`
+            values (np.ndarray): A statistic for every row of the analysis dataset
+            level (int): Cell level to cluster at
+            value_name (str): Column name for the statistic's mean
+
+        Returns:
+            pd.DataFrame: One row per cell with its Latitude & Longitude (the
+                mean location of its schools), number of Schools & mean statistic
+        """
+        if len(matches) == 0:
+            return pd.DataFrame(
+                {"Latitude": [], "Longitude": [], "Schools": [], value_name: []}
+            )
+
+        cells = self._keys[matches] >> np.uint64(2 * (MAX_LEVEL - level))
+        starts = np.r_[0, np.flatnonzero(cells[1:] != cells[:-1]) + 1]
+        counts = np.diff(np.r_[starts, len(matches)])
+
+        columns = {
+            "Latitude": self._lat[matches],
+            "Longitude": self._lon[matches],
+            value_name: values[self._positions[matches]],
+        }
+        clusters = pd.DataFrame(
+            {col: np.add.reduceat(v, starts) / counts for col, v in columns.items()}
+        )
+        clusters.insert(2, "Schools", counts)
+        return clusters
+
+
+EARTH_RADIUS_KM = 6371.0088
+# Below this many points a node is scanned rather than split
+KD_LEAF_SIZE = 16
+
+
+def unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Latitude/longitude to points on the unit sphere
+
+    The straight line (chord) distance between two of these only grows with
+    the great circle distance, so nearest neighbours in 3D are the nearest on
+    the Earth's surface and a KD-tree needs no special handling of distances.
+
+    Args:
+        lat (np.ndarray): Latitudes
+        lon (np.ndarray): Longitudes
+
+    Returns:
+        np.ndarray: (n, 3) array of x, y, z
+    """
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
+    )
+
+
+def chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+
+def km_to_chord(km: float) -> float:
+    return 2 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+class KDTree:
+    """Static KD-tree, stored implicitly in a reordering of the points
+
+    The points of every node are the run `[lo, hi)` of `points`, with the
+    node's splitting point in the middle: everything before it is no further
+    along `split_dims[mid]` & everything after no nearer. Nodes with
+    KD_LEAF_SIZE points or fewer aren't split, and are scanned in one go.
+
+    Args:
+        points (np.ndarray): (n, d) coordinates
+    """
+
+    def __init__(self, points: np.ndarray):
+        n = len(points)
+        self.order = np.arange(n)
+        self.split_dims = np.full(n, -1, dtype=np.int8)
+        points = np.asarray(points, dtype="float64")
+
+        stack = [(0, n)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= KD_LEAF_SIZE:
+                continue
+            node = self.order[lo:hi]
+            dim = int(np.argmax(np.ptp(points[node], axis=0)))
+            mid = (lo + hi) // 2
+            self.order[lo:hi] = node[
+                np.argpartition(points[node, dim], mid - lo, kind="introselect")
+            ]
+            self.split_dims[mid] = dim
+            stack += [(lo, mid), (mid + 1, hi)]
+
+        self.points = points[self.order]
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def nearest(
+        self, point: np.ndarray, k: int, keep: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """The `k` points closest to `point`
+
+        Args:
+            point (np.ndarray): Query coordinates
+            k (int): Number of neighbours
+            keep (Optional[np.ndarray], optional): Boolean mask over the
+                original points. Points it excludes are never returned.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indexes of the original points &
+                their distances, nearest first
+        """
+        best_idx = np.empty(0, dtype=int)
+        best_dist = np.empty(0)
+        if k <= 0:
+            return best_idx, best_dist
+        kept = None if keep is None else keep[self.order]
+
+        def worst() -> float:
+            return best_dist[-1] if len(best_dist) == k else np.inf
+
+        def visit(lo: int, hi: int):
+            nonlocal best_idx, best_dist
+            if hi - lo <= KD_LEAF_SIZE:
+                candidates = np.arange(lo, hi)
+                if kept is not None:
+                    candidates = candidates[kept[lo:hi]]
+                dist = np.linalg.norm(self.points[candidates] - point, axis=1)
+                best_idx = np.r_[best_idx, candidates]
+                best_dist = np.r_[best_dist, dist]
+                nearest = np.argsort(best_dist, kind="stable")[:k]
+                best_idx, best_dist = best_idx[nearest], best_dist[nearest]
+                return
+
+            mid = (lo + hi) // 2
+            dim = self.split_dims[mid]
+            offset = point[dim] - self.points[mid, dim]
+            near, far = (
+                ((lo, mid), (mid + 1, hi)) if offset < 0 else ((mid + 1, hi), (lo, mid))
+            )
+
+            visit(*near)
+            visit(mid, mid + 1)
+            if abs(offset) < worst():
+                visit(*far)
+
+        visit(0, len(self))
+        return self.order[best_idx], best_dist
+
+    def within(
+        self, point: np.ndarray, radius: float, keep: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Every point no further than `radius` from `point`
+
+        Args:
+            point (np.ndarray): Query coordinates
+            radius (float): Distance
+            keep (Optional[np.ndarray], optional): Boolean mask over the
+                original points. Points it excludes are never returned.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indexes of the original points &
+                their distances, nearest first
+        """
+        kept = None if keep is None else keep[self.order]
+        found = []
+
+        def visit(lo: int, hi: int):
+            if hi - lo <= KD_LEAF_SIZE:
+                candidates = np.arange(lo, hi)
+                if kept is not None:
+                    candidates = candidates[kept[lo:hi]]
+                dist = np.linalg.norm(self.points[candidates] - point, axis=1)
+                found.append(candidates[dist <= radius])
+                return
+
+            mid = (lo + hi) // 2
+            dim = self.split_dims[mid]
+            offset = point[dim] - self.points[mid, dim]
+            visit(mid, mid + 1)
+            if offset - radius <= 0:
+                visit(lo, mid)
+            if offset + radius >= 0:
+                visit(mid + 1, hi)
+
+        visit(0, len(self))
+        matches = np.concatenate(found) if found else np.empty(0, dtype=int)
+        dist = np.linalg.norm(self.points[matches] - point, axis=1)
+        nearest = np.argsort(dist, kind="stable")
+        return self.order[matches[nearest]], dist[nearest]
+
+
+class NearbySchools:
+    """Per results year KD-trees of located schools, for "schools near me"
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+    """
+
+    def __init__(self, analysis_df: pd.DataFrame):
+        lat = analysis_df["Latitude"].to_numpy(dtype="float64", na_value=np.nan)
+        lon = analysis_df["Longitude"].to_numpy(dtype="float64", na_value=np.nan)
+        years = analysis_df["year"].to_numpy(dtype="float64", na_value=np.nan)
+        located = ~(np.isnan(lat) | np.isnan(lon) | np.isnan(years))
+
+        self._trees: Dict[int, Tuple[np.ndarray, KDTree]] = {}
+        for year in np.unique(years[located]):
+            positions = np.flatnonzero(located & (years == year))
+            tree = KDTree(unit_vectors(lat[positions], lon[positions]))
+            self._trees[int(year)] = (positions, tree)
+
+    def _query(self, year: int, keep: Optional[np.ndarray], search):
+        if year not in self._trees:
+            return np.empty(0, dtype=int), np.empty(0)
+        positions, tree = self._trees[year]
+        found, chords = search(tree, None if keep is None else keep[positions])
+        return positions[found], chord_to_km(chords)
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        year: int,
+        k: int,
+        keep: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """The `k` schools nearest a point in a results year
+
+        Args:
+            lat (float): Latitude
+            lon (float): Longitude
+            year (int): Results year
+            k (int): Number of schools
+            keep (Optional[np.ndarray], optional): Boolean mask over the
+                analysis dataset's rows. Defaults to every row.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Analysis dataset row positions &
+                distances in km, nearest first
+        """
+        point = unit_vectors(np.array([lat]), np.array([lon]))[0]
+        return self._query(year, keep, lambda tree, kept: tree.nearest(point, k, kept))
+
+    def within(
+        self,
+        lat: float,
+        lon: float,
+        year: int,
+        radius_km: float,
+        keep: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Every school within `radius_km` of a point in a results year
+
+        Args:
+            lat (float): Latitude
+            lon (float): Longitude
+            year (int): Results year
+            radius_km (float): Search radius
+            keep (Optional[np.ndarray], optional): Boolean mask over the
+                analysis dataset's rows. Defaults to every row.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Analysis dataset row positions &
+                distances in km, nearest first
+        """
+        point = unit_vectors(np.array([lat]), np.array([lon]))[0]
+        radius = km_to_chord(radius_km)
+        return self._query(
+            year, keep, lambda tree, kept: tree.within(point, radius, kept)
+        )
+
+
+def rank_nearby(
+    analysis_df: pd.DataFrame,
+    positions: np.ndarray,
+    distances_km: np.ndarray,
+    statistic: str,
+) -> pd.DataFrame:
+    """Rows found by `NearbySchools`, best `statistic` first
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset
+        positions (np.ndarray): Row positions from a `NearbySchools` query
+        distances_km (np.ndarray): Their distances
+        statistic (str): Column to rank by. Ties go to the nearer school.
+
+    Returns:
+        pd.DataFrame: The rows, with a "Distance (km)" column
+    """
+    nearby = analysis_df.iloc[positions].assign(
+        **{"Distance (km)": np.round(distances_km, 2)}
+    )
+    return nearby.sort_values(
+        by=[statistic, "Distance (km)"], ascending=[False, True], kind="stable"
+    )
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from dataset_artifact import (
+    NOT_YET_KNOWN,
+    NOT_YET_KNOWN_COLUMNS,
+    fill_not_yet_known,
+    read_artifact,
+    write_artifact,
+)
+from schema import apply_schema
+
+
+def analysis_frame() -> pd.DataFrame:
+    # 2024 has results but no ACARA profile data yet, so no sector or type
+    return apply_schema(
+        pd.DataFrame(
+            {
+                "School": ["Alpha College", "Beta High School", "Alpha College"],
+                "year": [2023, 2023, 2024],
+                "Median VCE study score": [30.0, 28.0, 31.0],
+                "School Sector": ["Independent", "Government", None],
+                "School Type": ["Secondary", "Secondary", None],
+                "ICSEA": [1100, 1000, None],
+            }
+        )
+    )
+
+
+def test_fill_not_yet_known_on_categoricals():
+    analysis_df = analysis_frame()
+    assert isinstance(analysis_df["School Sector"].dtype, pd.CategoricalDtype)
+
+    filled = fill_not_yet_known(analysis_df)
+
+    for col in NOT_YET_KNOWN_COLUMNS:
+        assert isinstance(filled[col].dtype, pd.CategoricalDtype)
+        assert filled[col].notna().all()
+    assert filled["School Sector"].tolist() == [
+        "Independent",
+        "Government",
+        NOT_YET_KNOWN,
+    ]
+
+
+def test_write_artifact_with_a_year_without_profile_data(tmp_path):
+    artifact_dir = str(tmp_path / "artifact")
+
+    write_artifact(analysis_frame(), artifact_dir)
+    analysis_df = read_artifact(artifact_dir)
+
+    assert analysis_df["School Sector"].tolist() == [
+        "Independent",
+        "Government",
+        NOT_YET_KNOWN,
+    ]
+    assert analysis_df["School Type"].tolist()[-1] == NOT_YET_KNOWN
+    assert analysis_df["Median VCE study score"].tolist() == [30.0, 28.0, 31.0]
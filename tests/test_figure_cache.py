@@ -0,0 +1,149 @@
+import os
+
+from figure_cache import FigureCache, normalise_inputs
+from snapshots import snapshot_key
+
+
+def top_n_inputs(sectors, weights):
+    return ("Composite score", sectors, "All", 5, 50, weights)
+
+
+def test_multi_select_order_does_not_change_the_key():
+    cache = FigureCache("v1")
+    cache.memoise("top-n-schools", unordered=[1])
+
+    assert cache.key(
+        "top-n-schools", top_n_inputs(["Government", "Catholic"], [1, 1, 1, 1, 1])
+    ) == cache.key(
+        "top-n-schools", top_n_inputs(["Catholic", "Government"], [1, 1, 1, 1, 1])
+    )
+    assert normalise_inputs(top_n_inputs(None, None), [1]) == list(
+        top_n_inputs(None, None)
+    )
+
+
+def test_weight_order_changes_the_key():
+    cache = FigureCache("v1")
+    cache.memoise("top-n-schools", unordered=[1])
+
+    assert cache.key(
+        "top-n-schools", top_n_inputs(["Government"], [5, 0, 0, 0, 1])
+    ) != cache.key("top-n-schools", top_n_inputs(["Government"], [1, 0, 0, 0, 5]))
+    assert snapshot_key(
+        "top-n-schools", top_n_inputs(["Government"], [5, 0, 0, 0, 1]), [1]
+    ) != snapshot_key(
+        "top-n-schools", top_n_inputs(["Government"], [1, 0, 0, 0, 5]), [1]
+    )
+    assert snapshot_key(
+        "top-n-schools", top_n_inputs(["Government", "Catholic"], None), [1]
+    ) == snapshot_key(
+        "top-n-schools", top_n_inputs(["Catholic", "Government"], None), [1]
+    )
+
+
+def test_key_depends_on_name_version_and_inputs():
+    cache = FigureCache("v1")
+    key = cache.key("movers", ("Median VCE study score", ["Government"], 2022, 10))
+
+    assert key == cache.key(
+        "movers", ["Median VCE study score", ["Government"], 2022, 10]
+    )
+    assert key != cache.key(
+        "schools-map", ("Median VCE study score", ["Government"], 2022, 10)
+    )
+    assert key != cache.key(
+        "movers", ("Median VCE study score", ["Government"], 2021, 10)
+    )
+    cache.set_version("v2")
+    assert key != cache.key(
+        "movers", ("Median VCE study score", ["Government"], 2022, 10)
+    )
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = FigureCache("v1", max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    assert cache.get("a") == b"1234"
+
+    cache.set("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == b"1234"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 8
+
+    cache.set("too big", b"12345678901")
+    assert cache.get("too big") is None
+
+
+def test_memory_cache_is_cleared_for_a_new_version():
+    cache = FigureCache("v1")
+    cache.set("a", b"{}")
+
+    cache.set_version("v2")
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_round_trip_and_version_invalidation(tmp_path):
+    cache = FigureCache("v1", backend="disk", cache_dir=str(tmp_path))
+    cache.set("a", b'{"data": []}')
+
+    # Another worker sharing the directory
+    other = FigureCache("v1", backend="disk", cache_dir=str(tmp_path))
+    assert other.get("a") == b'{"data": []}'
+    assert other.stats()["entries"] == 1
+
+    FigureCache("v2", backend="disk", cache_dir=str(tmp_path))
+    assert cache.get("a") is None
+    assert (tmp_path / "VERSION").read_text() == "v2"
+
+
+def test_disk_evicts_least_recently_used_files(tmp_path):
+    cache = FigureCache("v1", backend="disk", max_bytes=10, cache_dir=str(tmp_path))
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    os.utime(tmp_path / "a.json", (1, 1))
+    os.utime(tmp_path / "b.json", (2, 2))
+
+    cache.set("c", b"1234")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == cache.get("c") == b"1234"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memoise_serves_repeat_calls_from_the_cache():
+    cache = FigureCache(None)
+    calls = []
+
+    @cache.memoise("figure", unordered=[0])
+    def figure(sectors, n):
+        calls.append((sectors, n))
+        return {"data": [], "layout": {"title": {"text": f"{len(sectors)} {n}"}}}
+
+    # Nothing is cached until the dataset version is known
+    figure(["Government"], 1)
+    cache.set_version("v1")
+    figure(["Government", "Catholic"], 1)
+    cached = figure(["Catholic", "Government"], 1)
+    figure(["Government", "Catholic"], 2)
+
+    assert calls == [
+        (["Government"], 1),
+        (["Government", "Catholic"], 1),
+        (["Government", "Catholic"], 2),
+    ]
+    assert cached == {"data": [], "layout": {"title": {"text": "2 1"}}}
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_off_backend_doesnt_wrap():
+    cache = FigureCache("v1", backend="off")
+
+    def figure():
+        return {}
+
+    assert cache.memoise("figure")(figure) is figure
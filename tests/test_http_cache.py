@@ -0,0 +1,63 @@
+import gzip
+
+from flask import Flask, jsonify
+
+from http_cache import ResponseCaching, ResponseCompression
+
+
+def make_server() -> Flask:
+    server = Flask(__name__)
+    layout = {"props": {"children": ["x" * 1000]}}
+    server.add_url_rule("/_dash-layout", "layout", lambda: jsonify(layout))
+    server.add_url_rule(
+        "/_dash-update-component",
+        "update_component",
+        lambda: jsonify({"response": {}}),
+        methods=["POST"],
+    )
+    ResponseCompression().init_app(server)
+    ResponseCaching().init_app(server)
+    return server
+
+
+def test_layout_revalidates_against_its_etag():
+    client = make_server().test_client()
+
+    response = client.get("/_dash-layout")
+    etag, _ = response.get_etag()
+    assert response.status_code == 200
+    assert etag is not None
+    assert response.cache_control.no_cache
+
+    revalidated = client.get("/_dash-layout", headers={"If-None-Match": f'"{etag}"'})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b""
+
+    changed = client.get("/_dash-layout", headers={"If-None-Match": '"other"'})
+    assert changed.status_code == 200
+
+
+def test_callbacks_get_no_validators():
+    client = make_server().test_client()
+
+    response = client.post("/_dash-update-component", json={"output": "graph.figure"})
+
+    assert response.status_code == 200
+    assert response.get_etag() == (None, None)
+    assert response.cache_control.max_age is None
+
+
+def test_compression_weakens_the_etag():
+    client = make_server().test_client()
+
+    response = client.get("/_dash-layout", headers={"Accept-Encoding": "gzip"})
+    etag, weak = response.get_etag()
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert weak
+    assert b"props" in gzip.decompress(response.get_data())
+    revalidated = client.get(
+        "/_dash-layout",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": f'W/"{etag}"'},
+    )
+    assert revalidated.status_code == 304
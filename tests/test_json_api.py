@@ -0,0 +1,131 @@
+import pytest
+from flask import Flask
+
+from json_api import (
+    API_PREFIX,
+    MAX_LIMIT,
+    JsonApi,
+    NotFoundError,
+    QueryArgs,
+    QueryError,
+)
+
+
+def echo(query: QueryArgs):
+    return {
+        "year": query.choice("year", [2021, 2022], 2022),
+        "bbox": query.floats("bbox", 4),
+        "sector": query.choices("sector", ["Government", "Catholic"]),
+        **query.page(),
+    }
+
+
+def fail(query: QueryArgs):
+    raise QueryError("bbox must be west,south,east,north")
+
+
+def history(query: QueryArgs, school_id: int):
+    if school_id != 1:
+        raise NotFoundError(f"No school with School ID {school_id}")
+    return {"school_id": school_id}
+
+
+def make_client():
+    server = Flask(__name__)
+    JsonApi(
+        "v1",
+        {"/echo": echo, "/fail": fail, "/schools/<int:school_id>/history": history},
+    ).init_app(server)
+    return server.test_client()
+
+
+def test_parses_query_parameters():
+    response = make_client().get(
+        f"{API_PREFIX}/echo?year=2021&bbox=144.5,-38.2,145.5,-37.5"
+        "&sector=Catholic,Government,Catholic&offset=10&limit=5"
+    )
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "version": "v1",
+        "year": 2021,
+        "bbox": [144.5, -38.2, 145.5, -37.5],
+        "sector": ["Catholic", "Government"],
+        "offset": 10,
+        "limit": 5,
+    }
+
+
+def test_defaults():
+    body = make_client().get(f"{API_PREFIX}/echo").get_json()
+
+    assert body["year"] == 2022
+    assert body["bbox"] is None
+    assert body["sector"] == ["Government", "Catholic"]
+    assert (body["offset"], body["limit"]) == (0, 50)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "year=2020",
+        "year=latest",
+        "bbox=144.5,-38.2,145.5",
+        "bbox=144.5,-38.2,145.5,north",
+        "sector=Government,Private",
+        "offset=-1",
+        "offset=x",
+        "limit=0",
+        f"limit={MAX_LIMIT + 1}",
+    ],
+)
+def test_bad_parameters_get_a_400(query):
+    response = make_client().get(f"{API_PREFIX}/echo?{query}")
+
+    assert response.status_code == 400
+    assert response.get_json()["error"]
+
+
+def test_view_query_errors_get_a_400():
+    response = make_client().get(f"{API_PREFIX}/fail")
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "bbox must be west,south,east,north"}
+
+
+def test_matching_etag_gets_a_304():
+    client = make_client()
+    response = client.get(f"{API_PREFIX}/echo?year=2021")
+    etag, _ = response.get_etag()
+
+    assert response.cache_control.max_age == 60 * 60
+    revalidated = client.get(
+        f"{API_PREFIX}/echo?year=2021", headers={"If-None-Match": f'"{etag}"'}
+    )
+    assert revalidated.status_code == 304
+    other_query = client.get(
+        f"{API_PREFIX}/echo?year=2022", headers={"If-None-Match": f'"{etag}"'}
+    )
+    assert other_query.status_code == 200
+
+
+def test_unknown_schools_get_a_404():
+    client = make_client()
+
+    assert client.get(f"{API_PREFIX}/schools/1/history").status_code == 200
+    response = client.get(f"{API_PREFIX}/schools/999999/history")
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "No school with School ID 999999"}
+
+
+def test_app_school_history_of_an_unknown_school_is_a_404():
+    import app
+
+    client = app.create_app().server.test_client()
+    school_id = int(app.get_app_data().dataset.partition(2022)["School ID"].iloc[0])
+
+    history = client.get(f"{API_PREFIX}/schools/{school_id}/history").get_json()
+    assert history["results"]
+    assert {row["School ID"] for row in history["results"]} == {school_id}
+    response = client.get(f"{API_PREFIX}/schools/999999/history")
+    assert response.status_code == 404
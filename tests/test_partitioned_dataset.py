@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from partitioned_dataset import PartitionedDataset
+from school_index import SchoolRowIndex
+
+
+def make_dataset(memory_budget: int = 2**20) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    school_ids = np.repeat(np.arange(100, 140), 3)
+    analysis_df = pd.DataFrame(
+        {
+            "School": pd.Categorical([f"School {id_}" for id_ in school_ids]),
+            "School ID": school_ids,
+            "year": np.tile([2021, 2022, 2023], 40),
+            "Median VCE study score": rng.integers(20, 40, len(school_ids)),
+        }
+    )
+    # Some schools only have results in some years
+    analysis_df = analysis_df.drop(index=[4, 30, 31, 119]).reset_index(drop=True)
+    analysis_df.attrs["version"] = "test"
+    return analysis_df
+
+
+@pytest.mark.parametrize("memory_budget", [0, 2**20])
+@pytest.mark.parametrize(
+    "school_ids", [[], [101], [139, 100, 110], [110, 10, 999], list(range(100, 140))]
+)
+def test_rows_match_a_pandas_filter(memory_budget, school_ids):
+    analysis_df = make_dataset()
+    dataset = PartitionedDataset.from_frame(analysis_df, memory_budget)
+    dataset.partition(2022)
+
+    rows = dataset.rows(school_ids)
+
+    expected = analysis_df[analysis_df["School ID"].isin(school_ids)]
+    pd.testing.assert_frame_equal(rows, expected.reset_index(drop=True))
+
+
+def test_rows_reads_only_the_requested_columns():
+    dataset = PartitionedDataset.from_frame(make_dataset())
+
+    rows = dataset.rows([101, 102], ["Median VCE study score"])
+
+    assert list(rows.columns) == ["School ID", "year", "Median VCE study score"]
+    assert rows["School ID"].tolist() == [101, 101, 102, 102, 102]
+
+
+def test_school_row_index_finds_each_schools_rows():
+    analysis_df = make_dataset()
+    index = SchoolRowIndex(analysis_df)
+
+    positions = index.positions([103, 101, 5000])
+
+    assert analysis_df.iloc[positions]["School ID"].tolist() == [
+        101,
+        101,
+        103,
+        103,
+        103,
+    ]
+    assert len(SchoolRowIndex(analysis_df.iloc[:0]).positions([101])) == 0
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ranking import (
+    ALL_YEARS,
+    COMPOSITE_SCORE,
+    CompositeRanking,
+    normalise_within_years,
+    top_n_positions,
+)
+
+STATISTICS = ["Median VCE study score", "ICSEA"]
+# |z| of a school 5 from the mean of 20, 25 & 30 (or 10 from 30, 40 & 50)
+Z = np.sqrt(1.5)
+
+
+@pytest.fixture
+def analysis_df():
+    return pd.DataFrame(
+        [
+            ("A", 1, "Government", 2021, 30, 10, 100),
+            ("B", 2, "Catholic", 2021, 20, 40, 20),
+            ("C", 3, "Government", 2021, 25, np.nan, 60),
+            ("A", 1, "Government", 2022, 28, 50, 100),
+            ("B", 2, "Catholic", 2022, 28, 30, 20),
+            ("C", 3, "Government", 2022, 28, 40, 60),
+        ],
+        columns=[
+            "School",
+            "School ID",
+            "School Sector",
+            "year",
+            *STATISTICS,
+            "Total Enrolments",
+        ],
+    ).assign(**{"School Type": "Secondary"})
+
+
+def test_normalise_within_years(analysis_df):
+    normalised = normalise_within_years(analysis_df, STATISTICS)
+
+    np.testing.assert_allclose(
+        normalised,
+        [[Z, -1], [-Z, 1], [0, np.nan], [0, Z], [0, -Z], [0, 0]],
+    )
+
+
+@pytest.mark.parametrize(
+    "weights, result_year, expected",
+    [
+        # School means over the years: A (Z/2, (Z-1)/2), B (-Z/2, (1-Z)/2), C (0, 0)
+        ([1, 1], ALL_YEARS, [("A", (2 * Z - 1) / 4), ("C", 0), ("B", (1 - 2 * Z) / 4)]),
+        ([1, 0], ALL_YEARS, [("A", Z / 2), ("C", 0), ("B", -Z / 2)]),
+        ([1, 3], ALL_YEARS, [("A", (4 * Z - 3) / 8), ("C", 0), ("B", (3 - 4 * Z) / 8)]),
+        # C has no ICSEA in 2021, so it's ranked on its study score alone
+        ([1, 1], 2021, [("A", (Z - 1) / 2), ("C", 0), ("B", (1 - Z) / 2)]),
+        ([0, 1], 2022, [("A", Z), ("C", 0), ("B", -Z)]),
+    ],
+)
+def test_composite_ranking_matches_z_scores(
+    analysis_df, weights, result_year, expected
+):
+    ranking = CompositeRanking(analysis_df, STATISTICS)
+
+    top = ranking.top_n(weights, result_year, ["Government", "Catholic"], 10, 0)
+
+    assert top["School"].tolist() == [school for school, _ in expected]
+    np.testing.assert_allclose(
+        top[COMPOSITE_SCORE], [round(score, 3) for _, score in expected]
+    )
+
+
+def test_composite_ranking_filters(analysis_df):
+    ranking = CompositeRanking(analysis_df, STATISTICS)
+
+    government = ranking.top_n([1, 1], ALL_YEARS, ["Government"], 10, 0)
+    enrolled = ranking.top_n([1, 1], ALL_YEARS, ["Government", "Catholic"], 10, 50)
+    top_one = ranking.top_n([1, 1], ALL_YEARS, ["Government", "Catholic"], 1, 0)
+
+    assert government["School"].tolist() == ["A", "C"]
+    assert enrolled["School"].tolist() == ["A", "C"]
+    assert top_one["School"].tolist() == ["A"]
+    assert ranking.top_n([1, 1], 2030, ["Government"], 10, 0).empty
+
+
+def test_top_n_positions_breaks_ties_by_position():
+    scores = np.array([1.0, 3.0, np.nan, 3.0, 2.0, 3.0])
+    keep = np.array([True, True, True, True, True, False])
+
+    assert top_n_positions(scores, keep, 2).tolist() == [1, 3]
+    assert top_n_positions(scores, keep, 10).tolist() == [1, 3, 4, 0]
+    assert top_n_positions(scores, keep, 0).tolist() == []
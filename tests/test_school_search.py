@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from school_search import SchoolSearch
+
+
+@pytest.fixture
+def search():
+    schools_df = pd.DataFrame(
+        [
+            (1, "Melbourne High School", "South Yarra", 2022),
+            (2, "Mac.Robertson Girls' High School", "Melbourne", 2022),
+            (3, "Ballarat High School", "Ballarat", 2022),
+            (4, "Ballarat Grammar", "Wendouree", 2022),
+            (5, "Old Name College", "Geelong", 2020),
+            (5, "Geelong Grammar School", "Corio", 2022),
+            (6, "Highvale Secondary College", "Glen Waverley", 2022),
+        ],
+        columns=["School ID", "School", "Locality", "year"],
+    )
+    return SchoolSearch(schools_df)
+
+
+def test_prefix_matches_start_of_any_word(search):
+    assert search.search("ballarat") == [4, 3]
+    assert search.search("Ball gram") == [4]
+    assert search.search("mac.rob") == [2]
+
+
+def test_name_starts_then_name_matches_then_localities(search):
+    # Melbourne High starts with it, Mac.Robertson is in Melbourne
+    assert search.search("melb") == [1, 2]
+    # Highvale starts with "high", the others only have a word starting with it
+    assert search.search("high") == [6, 3, 2, 1]
+
+
+def test_schools_are_indexed_under_their_latest_name(search):
+    assert search.search("geelong grammar")[0] == 5
+    assert search.search("old name") == []
+
+
+def test_trigrams_catch_typos(search):
+    assert search.search("balarat high")[0] == 3
+    assert search.search("geelnog grammer")[0] == 5
+
+
+def test_limits(search):
+    assert search.search("high", limit=2) == [6, 3]
+    assert search.search("", limit=5) == []
+    assert search.search("high", limit=0) == []
+
+
+def test_options(search):
+    options = search.options([4, 999, 1], "melb")
+
+    assert options == [
+        {
+            "label": "Ballarat Grammar",
+            "value": 4,
+            "search": "Ballarat Grammar Wendouree melb",
+        },
+        {
+            "label": "Melbourne High School",
+            "value": 1,
+            "search": "Melbourne High School South Yarra melb",
+        },
+    ]
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from spatial import (
+    EARTH_RADIUS_KM,
+    KDTree,
+    NearbySchools,
+    SpatialIndex,
+    project,
+    unit_vectors,
+    viewport_from_relayout,
+)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(0).normal(size=(500, 3))
+
+
+@pytest.mark.parametrize("k", [1, 7, 40, 600])
+@pytest.mark.parametrize("masked", [False, True])
+def test_kd_tree_nearest_matches_brute_force(points, k, masked):
+    keep = np.random.default_rng(1).random(len(points)) < 0.5 if masked else None
+    tree = KDTree(points)
+
+    for point in np.random.default_rng(2).normal(size=(20, 3)):
+        found, dist = tree.nearest(point, k, keep)
+
+        candidates = np.arange(len(points)) if keep is None else np.flatnonzero(keep)
+        brute = np.linalg.norm(points[candidates] - point, axis=1)
+        order = np.argsort(brute, kind="stable")[:k]
+        np.testing.assert_array_equal(found, candidates[order])
+        np.testing.assert_allclose(dist, brute[order])
+
+
+@pytest.mark.parametrize("radius", [0.0, 0.3, 1.0, 10.0])
+def test_kd_tree_within_matches_brute_force(points, radius):
+    keep = np.random.default_rng(1).random(len(points)) < 0.5
+    tree = KDTree(points)
+
+    for point in np.random.default_rng(2).normal(size=(20, 3)):
+        found, dist = tree.within(point, radius, keep)
+
+        brute = np.linalg.norm(points - point, axis=1)
+        expected = np.flatnonzero((brute <= radius) & keep)
+        assert sorted(found) == sorted(expected)
+        np.testing.assert_allclose(dist, np.sort(brute[expected]))
+
+
+def test_kd_tree_of_no_points():
+    tree = KDTree(np.empty((0, 3)))
+
+    assert len(tree.nearest(np.zeros(3), 5)[0]) == 0
+    assert len(tree.within(np.zeros(3), 1.0)[0]) == 0
+
+
+@pytest.fixture
+def schools():
+    rng = np.random.default_rng(3)
+    n = 300
+    schools_df = pd.DataFrame(
+        {
+            "year": rng.choice([2021, 2022], n),
+            "Latitude": rng.uniform(-39, -34, n),
+            "Longitude": rng.uniform(141, 150, n),
+        }
+    )
+    schools_df.loc[::17, "Latitude"] = np.nan
+    return schools_df
+
+
+def test_nearby_schools_match_haversine_distances(schools):
+    nearby = NearbySchools(schools)
+    lat, lon = -37.81, 144.96
+    in_year = (schools["year"] == 2022) & schools["Latitude"].notna()
+    distances = haversine_km(lat, lon, schools["Latitude"], schools["Longitude"])
+
+    positions, distances_km = nearby.nearest(lat, lon, 2022, 10)
+    expected = distances[in_year].sort_values(kind="stable").iloc[:10]
+    np.testing.assert_array_equal(positions, expected.index)
+    np.testing.assert_allclose(distances_km, expected, rtol=1e-6)
+
+    positions, distances_km = nearby.within(lat, lon, 2022, 150)
+    expected = distances[in_year & (distances <= 150)].sort_values(kind="stable")
+    np.testing.assert_array_equal(positions, expected.index)
+    np.testing.assert_allclose(distances_km, expected, rtol=1e-6)
+
+
+def test_nearby_schools_keep_and_unknown_years(schools):
+    nearby = NearbySchools(schools)
+    keep = np.arange(len(schools)) % 2 == 0
+
+    positions, _ = nearby.nearest(-37.81, 144.96, 2021, 20, keep)
+
+    assert len(positions) == 20
+    assert keep[positions].all()
+    assert (schools["year"].iloc[positions] == 2021).all()
+    assert len(nearby.nearest(-37.81, 144.96, 2030, 5)[0]) == 0
+
+
+def test_unit_vectors_are_on_the_unit_sphere():
+    vectors = unit_vectors(np.array([-37.81, 0, 90]), np.array([144.96, 0, 0]))
+
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1)
+    np.testing.assert_allclose(vectors[1:], [[1, 0, 0], [0, 0, 1]], atol=1e-12)
+
+
+def test_spatial_index_within_bounds_matches_a_filter(schools):
+    index = SpatialIndex(schools)
+    keep = (schools["year"] == 2022).to_numpy()
+
+    rows = index.rows(index.within_bounds(143, -38.5, 146, -36, keep))
+
+    expected = np.flatnonzero(
+        keep
+        & schools["Longitude"].between(143, 146).to_numpy()
+        & schools["Latitude"].between(-38.5, -36).to_numpy()
+    )
+    np.testing.assert_array_equal(rows, expected)
+
+
+@pytest.mark.parametrize("zoom", [5, 7, 9])
+def test_spatial_index_query_and_clusters(schools, zoom):
+    index = SpatialIndex(schools)
+    keep = np.ones(len(schools), dtype=bool)
+    viewport = viewport_from_relayout(None, {"lat": -37, "lon": 145}, zoom, 800, 600)
+    values = np.arange(len(schools), dtype="float64")
+
+    matches = index.query(viewport, keep)
+    clusters = index.clusters(matches, values, viewport.level, "value")
+
+    west, north, east, south = viewport.bounds()
+    x, y = project(schools["Latitude"], schools["Longitude"])
+    expected = np.flatnonzero(
+        schools["Latitude"].notna().to_numpy()
+        & (x >= west)
+        & (x < east)
+        & (y >= north)
+        & (y < south)
+    )
+    np.testing.assert_array_equal(index.rows(matches), expected)
+    assert clusters["Schools"].sum() == len(expected)
+    np.testing.assert_allclose(
+        (clusters["value"] * clusters["Schools"]).sum(), values[expected].sum()
+    )
+    assert 0 < len(clusters) <= len(expected)
@@ -0,0 +1,93 @@
+"""Year-on-year change, rank & percentile of each school's results.
+
+These are derived once, when the analysis dataset is built, and stored as
+columns of the dataset (see `schema.TREND_STATISTICS`), so the app never has
+to group the whole dataset to answer "who improved the most in 2022?".
+
+- `<statistic> change`: change since the school's previous year of results.
+  Missing when the school has no results for the year before.
+- `<statistic> rank`: rank within the results year, 1 being the highest.
+  Tied schools share the best rank.
+- `<statistic> percentile`: percentage of that year's schools the school did
+  at least as well as.
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from schema import TREND_DTYPES, TREND_STATISTICS, trend_column, widen
+
+
+def add_trend_metrics(
+    analysis_df: pd.DataFrame, statistics: List[str] = TREND_STATISTICS
+) -> pd.DataFrame:
+    """Add the change, rank & percentile columns for each statistic
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset, sorted by school then year
+        statistics (List[str], optional): Statistics to derive metrics for.
+            Defaults to TREND_STATISTICS.
+
+    Returns:
+        pd.DataFrame: Copy of `analysis_df` with the trend columns added
+    """
+    # Work on the displayed values so a change of 0.1 isn't 0.0999999
+    values = pd.DataFrame(
+        {col: widen(analysis_df[col]) for col in [*statistics, "year"]},
+        index=analysis_df.index,
+    )
+
+    previous = values.groupby(analysis_df["School ID"].to_numpy(), sort=False).shift()
+    consecutive = (values["year"] - previous["year"] == 1).to_numpy()
+
+    by_year = values[statistics].groupby(values["year"].to_numpy(), sort=False)
+    ranks = by_year.rank(ascending=False, method="min")
+    percentiles = by_year.rank(pct=True, method="max") * 100
+
+    derived = {}
+    for statistic in statistics:
+        change = values[statistic] - previous[statistic]
+        derived[trend_column(statistic, "change")] = change.where(consecutive).round(1)
+        derived[trend_column(statistic, "rank")] = ranks[statistic]
+        derived[trend_column(statistic, "percentile")] = percentiles[statistic].round(1)
+
+    dtypes = {
+        trend_column(statistic, metric): dtype
+        for statistic in statistics
+        for metric, dtype in TREND_DTYPES.items()
+    }
+    return analysis_df.assign(**pd.DataFrame(derived).astype(dtypes))
+
+
+def movers(
+    analysis_df: pd.DataFrame,
+    statistic: str,
+    year: int,
+    school_sectors: List[str],
+    n: int,
+) -> pd.DataFrame:
+    """The `n` biggest risers & `n` biggest fallers in a results year
+
+    Args:
+        analysis_df (pd.DataFrame): Analysis dataset, with trend columns
+        statistic (str): One of TREND_STATISTICS
+        year (int): Results year
+        school_sectors (List[str]): Sectors to include
+        n (int): Number of risers, and of fallers
+
+    Returns:
+        pd.DataFrame: Rows of `analysis_df`, biggest rise first & biggest
+            fall last. Schools that didn't change are left out.
+    """
+    change_col = trend_column(statistic, "change")
+
+    keep = (analysis_df["year"] == year).to_numpy(dtype=bool, na_value=False)
+    keep &= analysis_df["School Sector"].isin(school_sectors).to_numpy()
+    year_df = analysis_df.iloc[np.flatnonzero(keep)]
+
+    change = year_df[change_col].reset_index(drop=True)
+    risers = change[change > 0].nlargest(n).index
+    fallers = change[change < 0].nsmallest(n).index[::-1]
+    return year_df.iloc[np.r_[risers, fallers]]